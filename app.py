@@ -14,6 +14,8 @@ from layout import build_layout
 # MODIFICADO: Importa de 'callbacks' (o pacote)
 from callbacks import register_all_callbacks
 from utils.logger import app_logger
+from utils.tile_proxy import register_tile_routes
+from utils.gee_governor import register_governor_routes
 
 # -----------------------------------------------------------
 # Inicialização da Aplicação Dash
@@ -32,6 +34,11 @@ app = dash.Dash(
 
 server = app.server
 
+# Proxy local (com cache em disco) para os tiles do GEE usados pelos mapas
+register_tile_routes(server)
+# Diagnóstico do governador de chamadas ao GEE (fila, throttles)
+register_governor_routes(server)
+
 # -----------------------------------------------------------
 # Configuração do BigQuery (Verificações removidas/simplificadas)
 # -----------------------------------------------------------
@@ -0,0 +1,101 @@
+// assets/grid_virtualization.js
+//
+// Grid de anos virtualizado da aba de Avaliação (ver build_maps_panel em
+// callbacks/grid_view_callbacks.py). Um IntersectionObserver acompanha as células
+// ".grid-lazy-cell" do painel ".grid-virtual", com uma margem de overscan (data-overscan):
+// - miniaturas: a imagem só recebe o src (data-src) quando a célula chega perto da tela;
+// - mapas interativos: os anos que entram/saem da área visível são enviados ao store
+//   "grid-visible-years", e o callback render_visible_year_maps monta/desmonta os dl.Map.
+// Quando o painel é renderizado de novo (outra amostra, modo ou recorte de anos), o
+// data-key muda e o observador recomeça.
+
+(function () {
+    var observer = null;
+    var currentKey = null;
+    var currentSample = null;
+    var mounted = new Set();
+    var entered = new Set();
+    var left = new Set();
+    var flushTimer = null;
+
+    function flush() {
+        flushTimer = null;
+        if (!entered.size && !left.size) {
+            return;
+        }
+        if (!window.dash_clientside || !window.dash_clientside.set_props) {
+            return;
+        }
+        window.dash_clientside.set_props("grid-visible-years", {
+            data: {
+                key: currentKey,
+                sample: currentSample,
+                entered: Array.from(entered),
+                left: Array.from(left)
+            }
+        });
+        entered.clear();
+        left.clear();
+    }
+
+    function scheduleFlush() {
+        // Agrupa as mudanças de uma rolagem em um único callback
+        if (flushTimer === null) {
+            flushTimer = setTimeout(flush, 100);
+        }
+    }
+
+    function onIntersect(entries) {
+        entries.forEach(function (entry) {
+            var cell = entry.target;
+            if (cell.dataset.mode === "chips") {
+                // Miniaturas ficam no cache do navegador: basta carregar uma vez
+                var img = cell.querySelector("img[data-src]");
+                if (entry.isIntersecting && img && !img.getAttribute("src")) {
+                    img.setAttribute("src", img.dataset.src);
+                }
+                return;
+            }
+            var year = Number(cell.dataset.year);
+            if (entry.isIntersecting && !mounted.has(year)) {
+                mounted.add(year);
+                entered.add(year);
+                left.delete(year);
+                scheduleFlush();
+            } else if (!entry.isIntersecting && mounted.has(year)) {
+                mounted.delete(year);
+                left.add(year);
+                entered.delete(year);
+                scheduleFlush();
+            }
+        });
+    }
+
+    function attach(grid) {
+        if (observer) {
+            observer.disconnect();
+        }
+        currentKey = grid.dataset.key;
+        currentSample = grid.dataset.sample;
+        mounted.clear();
+        entered.clear();
+        left.clear();
+        observer = new IntersectionObserver(onIntersect, {
+            root: null,
+            rootMargin: (grid.dataset.overscan || "300") + "px"
+        });
+        grid.querySelectorAll(".grid-lazy-cell").forEach(function (cell) {
+            observer.observe(cell);
+        });
+    }
+
+    function checkGrid() {
+        var grid = document.querySelector(".grid-virtual");
+        if (grid && grid.dataset.key !== currentKey) {
+            attach(grid);
+        }
+    }
+
+    // O Dash substitui o conteúdo do painel a cada amostra: observa o DOM para reconectar
+    new MutationObserver(checkGrid).observe(document.documentElement, { childList: true, subtree: true });
+})();
@@ -0,0 +1,130 @@
+// assets/sample_wire.js
+//
+// Decodificador do formato compacto da tabela de amostras (utils/wire_format.py) e callbacks
+// clientside que o consomem (namespace "samples"):
+// - rowData do AgGrid da aba Tabela;
+// - marcadores do mapa principal (mesma estrutura que dl.CircleMarker geraria no servidor);
+// - centro/zoom do mapa a partir do registro da amostra atual.
+// O servidor envia a tabela uma única vez por versão, por colunas e com dicionários; a
+// expansão em objetos acontece aqui, uma vez por versão recebida. Após validar/resetar, o
+// servidor manda só a linha alterada (rowTransaction do AgGrid, Patch do marcador e Patch da
+// linha no formato compacto): o decodificador refaz só essa linha e os callbacks não
+// reenviam rowData nem os marcadores, já atualizados pelo servidor.
+
+(function () {
+    var lastWire = null;
+    var lastRows = [];
+    var lastWasRowPatch = false; // lastWire só difere da versão anterior em uma linha
+
+    function component(namespace, type, props) {
+        return {namespace: namespace, type: type, props: props};
+    }
+
+    function decodeRow(wire, i) {
+        var columns = wire.columns;
+        var row = {
+            sample_id: columns.sample_id[i],
+            lat: columns.lat[i],
+            lon: columns.lon[i],
+            geometry: columns.geometry[i]
+        };
+        Object.keys(columns).forEach(function (name) {
+            var encoded = columns[name];
+            if (encoded && encoded.codes) {
+                row[name] = encoded.values[encoded.codes[i]];
+            }
+        });
+        return row;
+    }
+
+    // Patch de uma linha (encode_row_patch) sobre a última versão decodificada
+    function isRowPatch(wire) {
+        return lastWire !== null && typeof wire.updated === "number" && wire.base === lastWire.base
+            && wire.length === lastWire.length && wire.revision !== lastWire.revision;
+    }
+
+    // Expande o formato colunar em uma lista de linhas (objetos), com cache da última versão
+    function decodeRows(wire) {
+        if (!wire || !wire.columns) {
+            return [];
+        }
+        if (wire === lastWire) {
+            return lastRows;
+        }
+        if (isRowPatch(wire)) {
+            lastRows = lastRows.slice();
+            lastRows[wire.updated] = decodeRow(wire, wire.updated);
+            lastWasRowPatch = true;
+        } else {
+            var rows = new Array(wire.length);
+            for (var i = 0; i < wire.length; i++) {
+                rows[i] = decodeRow(wire, i);
+            }
+            lastRows = rows;
+            lastWasRowPatch = false;
+        }
+        lastWire = wire;
+        return lastRows;
+    }
+
+    function marker(row, colors) {
+        var status = row.status || "UNDEFINED";
+        var color = colors[status] || "#6c757d";
+        return component("dash_leaflet", "CircleMarker", {
+            id: {type: "map-marker", index: row.sample_id},
+            center: [row.lat, row.lon],
+            radius: 5,
+            color: color,
+            fillColor: color,
+            fillOpacity: 0.7,
+            children: [
+                component("dash_leaflet", "Tooltip", {children: "Amostra: " + row.sample_id + "<br>Status: " + status}),
+                component("dash_leaflet", "Popup", {
+                    children: component("dash_html_components", "Div", {children: [
+                        component("dash_html_components", "P", {children: "ID: " + row.sample_id}),
+                        component("dash_html_components", "P", {children: "Bioma: " + row.biome_name}),
+                        component("dash_html_components", "P", {children: "Classe: " + row.class_name}),
+                        component("dash_html_components", "P", {children: "Status: " + status}),
+                        component("dash_bootstrap_components", "Button", {
+                            children: "Selecionar Amostra",
+                            id: {type: "select-sample-marker", index: row.sample_id},
+                            className: "btn-sm mt-2"
+                        })
+                    ]})
+                })
+            ]
+        });
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        samples: {
+            table_rows: function (wire) {
+                var rows = decodeRows(wire);
+                // Linha já aplicada pela rowTransaction do AgGrid
+                return lastWasRowPatch ? window.dash_clientside.no_update : rows;
+            },
+
+            map_markers: function (wire, constants) {
+                var colors = constants.plotly_status_colors;
+                var rows = decodeRows(wire);
+                if (lastWasRowPatch) {
+                    return window.dash_clientside.no_update; // Marcador já trocado pelo Patch do servidor
+                }
+                return rows.filter(function (row) {
+                    return row.lat !== null && row.lat !== undefined && row.lon !== null && row.lon !== undefined;
+                }).map(function (row) {
+                    return marker(row, colors);
+                });
+            },
+
+            map_center: function (currentSample, activeTab) {
+                var noUpdate = window.dash_clientside.no_update;
+                if (!currentSample || currentSample.lat === null || currentSample.lat === undefined
+                        || currentSample.lon === null || currentSample.lon === undefined) {
+                    return [noUpdate, noUpdate];
+                }
+                return [[currentSample.lat, currentSample.lon], 14];
+            }
+        }
+    });
+})();
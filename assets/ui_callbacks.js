@@ -0,0 +1,135 @@
+// assets/ui_callbacks.js
+//
+// Callbacks clientside da interface (namespace "ui"), registrados com ClientsideFunction:
+// - roteamento URL <-> aba ativa e exibição do conteúdo da aba (callbacks/main_sync_callbacks.py);
+// - opções de motivo por definição e realce de Definição/Motivo alterados
+//   (callbacks/sample_data_callbacks.py);
+// - abertura/fechamento dos modais (callbacks/modal_callbacks.py);
+// - ID da sessão (aba do navegador), gerado aqui para já existir nos primeiros callbacks.
+// São regras puramente de interface: rodam no navegador, sem ida ao servidor. As tabelas de
+// apoio (motivos por status, cores de status, classe de realce, caminhos das abas) chegam uma
+// única vez, com o layout, no store "ui-constants-store".
+
+(function () {
+    function noUpdate() {
+        return window.dash_clientside.no_update;
+    }
+
+    function triggeredIds() {
+        var ctx = window.dash_clientside.callback_context;
+        return (ctx && ctx.triggered ? ctx.triggered : []).map(function (t) {
+            return t.prop_id.split(".")[0];
+        });
+    }
+
+    function isSet(value) {
+        return value !== null && value !== undefined;
+    }
+
+    function displayValue(value) {
+        return isSet(value) ? value : "N/A";
+    }
+
+    function randomHex() {
+        if (window.crypto && window.crypto.randomUUID) {
+            return window.crypto.randomUUID().replace(/-/g, "");
+        }
+        var bytes = new Uint8Array(16);
+        window.crypto.getRandomValues(bytes);
+        return Array.prototype.map.call(bytes, function (b) {
+            return ("0" + b.toString(16)).slice(-2);
+        }).join("");
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        ui: {
+            // Caminho da URL define a aba ativa e vice-versa; só reemite o que mudou
+            route_tabs: function (pathname, activeTab, constants) {
+                var tabPaths = constants.tab_paths;
+                var desiredTab;
+                if (triggeredIds().indexOf("tabs") !== -1) {
+                    desiredTab = tabPaths[activeTab] ? activeTab : constants.default_tab;
+                } else {
+                    desiredTab = constants.default_tab;
+                    Object.keys(tabPaths).forEach(function (tab) {
+                        if (tabPaths[tab] === pathname) {
+                            desiredTab = tab;
+                        }
+                    });
+                }
+                var desiredPath = tabPaths[desiredTab];
+                var styles = ["tab-grid", "tab-table", "tab-map"].map(function (tab) {
+                    return {display: tab === desiredTab ? "block" : "none"};
+                });
+                return styles.concat([
+                    desiredTab !== activeTab ? desiredTab : noUpdate(),
+                    desiredPath !== pathname ? desiredPath : noUpdate()
+                ]);
+            },
+
+            reason_options: function (definition, constants) {
+                if (!definition) {
+                    return [];
+                }
+                return constants.reasons_by_status[definition] || [];
+            },
+
+            // Textos de Definição/Motivo e realce quando diferem do estado original da amostra
+            definition_reason_display: function (definition, reason, originalState, constants) {
+                var original = originalState || {};
+                var baseClass = "d-flex flex-column";
+                var highlighted = baseClass + " " + constants.highlight_class;
+
+                if (triggeredIds().indexOf("original-sample-state-store") !== -1) {
+                    // Nova amostra carregada: mostra o estado original, sem realces
+                    return [
+                        "Definição: " + displayValue(original.definition),
+                        "Motivo: " + displayValue(original.reason),
+                        baseClass,
+                        baseClass
+                    ];
+                }
+                return [
+                    "Definição: " + displayValue(definition),
+                    "Motivo: " + displayValue(reason),
+                    isSet(definition) && definition !== original.definition ? highlighted : baseClass,
+                    isSet(reason) && reason !== original.reason ? highlighted : baseClass
+                ];
+            },
+
+            toggle_modal: function (nClicks, isOpen) {
+                return nClicks ? !isOpen : isOpen;
+            },
+
+            // Fecha o modal de validação, reset ou exclusão após confirmar/cancelar
+            close_modals: function () {
+                var triggered = triggeredIds();
+                function closedBy(confirmId, cancelId) {
+                    return triggered.indexOf(confirmId) !== -1 || triggered.indexOf(cancelId) !== -1;
+                }
+                return [
+                    closedBy("confirm-update-btn", "cancel-update-btn") ? false : noUpdate(),
+                    closedBy("confirm-reset-btn", "cancel-reset-btn") ? false : noUpdate(),
+                    closedBy("confirm-delete-btn", "cancel-delete-btn") ? false : noUpdate()
+                ];
+            },
+
+            toggle_create_new_version_modal: function (nOpen, nCancel, nConfirm, isOpen) {
+                var triggered = triggeredIds();
+                if (triggered.indexOf("create-new-validation-version-button") !== -1 && nOpen) {
+                    return true;
+                }
+                if ((triggered.indexOf("cancel-new-version-btn") !== -1 || triggered.indexOf("confirm-create-new-version-btn") !== -1)
+                        && (nCancel || nConfirm)) {
+                    return false;
+                }
+                return isOpen;
+            },
+
+            // ID da aba (storage_type="session"): mantido ao recarregar, novo em cada aba
+            session_id: function (pathname, sessionId) {
+                return sessionId ? noUpdate() : randomHex();
+            }
+        }
+    });
+})();
@@ -9,6 +9,7 @@ from .grid_view_callbacks import register_callbacks as register_grid_view_callba
 from .progress_graph_callbacks import register_callbacks as register_progress_graph_callbacks
 from .theme_callbacks import register_callbacks as register_theme_callbacks
 from .modal_callbacks import register_callbacks as register_modal_callbacks # NOVO: Para os modais
+from .prefetch_callbacks import register_callbacks as register_prefetch_callbacks
 
 def register_all_callbacks(app):
     """
@@ -22,4 +23,5 @@ def register_all_callbacks(app):
     register_grid_view_callbacks(app)
     register_progress_graph_callbacks(app)
     register_theme_callbacks(app)
-    register_modal_callbacks(app) # Registrar os callbacks dos modais
\ No newline at end of file
+    register_modal_callbacks(app) # Registrar os callbacks dos modais
+    register_prefetch_callbacks(app) # Prefetch das próximas amostras em segundo plano
\ No newline at end of file
@@ -1,24 +1,304 @@
 # callbacks/grid_view_callbacks.py
 
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import lru_cache
+
 import pandas as pd
-from dash import Output, Input, State, callback_context, no_update, html
+from dash import Output, Input, State, callback_context, no_update, html, ALL
 import dash_leaflet as dl 
 from shapely import wkt
 from datetime import datetime
 
 from utils.logger import app_logger
-from utils.constants import YEARS_RANGE, LULC_ASSET, CLASS_INFO, GRID_TILE_SIZE, GRID_STYLE, GRAPH_PANEL_HEIGHT
-from utils.gee import get_modis_ndvi, plot_ndvi_series, plot_land_use_history, get_mosaic_url
-from callbacks.sample_data_callbacks import extract_point # Importa a função auxiliar
+from utils.constants import (
+    YEARS_RANGE, LULC_ASSET, CLASS_INFO, GRID_TILE_SIZE, GRID_STYLE, GRAPH_PANEL_HEIGHT,
+    GRID_DEFAULT_VIEW_MODE, GRID_MAP_ZOOM, GRID_SPECTRAL_SENSORS, GRID_KNOWN_YEARS_CACHE_SIZE,
+    GRID_AVAILABILITY_TIMEOUT, GRID_DEFAULT_YEAR_SUBSET, GRID_YEAR_STEP, GRID_CHANGE_WINDOW,
+    GRID_LAZY_OVERSCAN_PX, TIMELAPSE_DIMENSIONS, TIMELAPSE_FPS, GEE_REQUEST_TIMEOUT,
+    NDVI_DEFAULT_PROCESSING, NDVI_SMOOTHING
+)
+from utils.gee import get_sample_payload
+from utils.figure_templates import ndvi_traces, lulc_traces, data_patch, theme_patch
+from utils.gee_governor import GEEGovernorError, begin_request, request_scope
+from utils.gee_tasks import Task, gather_tasks
+from utils.series_processing import process_series
+from utils.tile_proxy import tile_proxy_url, chip_proxy_url, timelapse_proxy_url
+
+# Payloads em andamento por ponto (um único pedido ao GEE por amostra entre os painéis) e
+# anos com mosaico dos pontos já resolvidos, consultados sem bloquear pelo painel de mapas
+_pending_payloads_lock = threading.Lock()
+_pending_payloads = {}
+_known_mosaic_years = OrderedDict()
 
 # --- FUNÇÕES AUXILIARES ---
-def build_maps_panel(sample, years_range=None):
+def build_year_chip(year, lat, lon):
+    """
+    Célula do modo "filmstrip": miniatura estática (servida e cacheada pelo proxy local)
+    do mosaico do ano, com a amostra marcada no centro. Clicar abre o mapa interativo.
+    A imagem só é baixada quando a célula chega perto da área visível (data-src, ver
+    assets/grid_virtualization.js).
+    """
+    return html.Div([
+        html.Div(f"{year}", style={"textAlign": "center", "fontWeight": "bold", "color": "#2a9fd6", "fontSize": "14px"}),
+        html.Div(
+            [
+                html.Img(
+                    alt=f"Mosaico {year}",
+                    style={"width": f"{GRID_TILE_SIZE}px", "height": f"{GRID_TILE_SIZE}px", "display": "block"},
+                    **{"data-src": chip_proxy_url(year, lat, lon)}
+                ),
+                html.Span(className="grid-chip-marker"),
+            ],
+            id={"type": "grid-year-chip", "index": year},
+            n_clicks=0,
+            title=f"{year} - clique para abrir o mapa interativo",
+            className="grid-chip grid-lazy-cell",
+            **{"data-year": year, "data-mode": "chips"}
+        )
+    ], style={"display": "inline-block", "margin": "2px"})
+
+def build_lazy_map_cell(year):
+    """
+    Célula do modo "mapas interativos": começa vazia e só recebe o dl.Map quando entra na
+    área visível (mais a margem de overscan); volta a ficar vazia quando sai dela.
+    """
+    return html.Div([
+        html.Div(f"{year}", style={"textAlign": "center", "fontWeight": "bold", "color": "#2a9fd6", "fontSize": "14px"}),
+        html.Div(
+            id={"type": "grid-year-cell", "index": year},
+            className="grid-lazy-cell grid-map-placeholder",
+            style={"width": f"{GRID_TILE_SIZE}px", "height": f"{GRID_TILE_SIZE}px"},
+            **{"data-year": year, "data-mode": "maps"}
+        )
+    ], style={"display": "inline-block", "margin": "2px"})
+
+def build_year_map(year, lat, lon):
+    """Mini-mapa Leaflet de um ano, montado quando a célula fica visível."""
+    return dl.Map(
+        [
+            dl.TileLayer(url=tile_proxy_url("mosaic", year), attribution=f"MapBiomas {year}"),
+            dl.CircleMarker(center=[lat, lon], radius=5, color="red", fillOpacity=0.8)
+        ],
+        center=(lat, lon),
+        zoom=GRID_MAP_ZOOM,
+        style={"width": f"{GRID_TILE_SIZE}px", "height": f"{GRID_TILE_SIZE}px", "margin": "0px", "borderRadius": "8px"},
+        zoomControl=False, scrollWheelZoom=False, dragging=False,
+        doubleClickZoom=False, attributionControl=False, preferCanvas=True,
+    )
+
+def build_timelapse_panel(years, lat, lon):
+    """
+    Modo "time-lapse": uma única animação (getVideoThumbURL, cacheada em disco pelo proxy)
+    com um quadro por ano com mosaico, no lugar de uma imagem ou mapa por ano.
+    """
+    if not years:
+        return html.Div("Nenhum ano com mosaico disponível para esta amostra.", className="text-center text-muted p-4")
+
+    return html.Div([
+        html.Div(
+            [
+                html.Img(
+                    src=timelapse_proxy_url(years, lat, lon),
+                    alt=f"Time-lapse {years[0]}-{years[-1]}",
+                    style={"width": f"{TIMELAPSE_DIMENSIONS}px", "height": f"{TIMELAPSE_DIMENSIONS}px", "display": "block"}
+                ),
+                html.Span(className="grid-chip-marker"),
+            ],
+            className="grid-chip",
+        ),
+        html.Div(
+            f"{len(years)} quadros ({years[0]} a {years[-1]}), {TIMELAPSE_FPS} por segundo: " + ", ".join(str(year) for year in years),
+            className="text-muted small text-center mt-1",
+            style={"maxWidth": f"{TIMELAPSE_DIMENSIONS * 2}px"}
+        ),
+    ], className="d-flex flex-column align-items-center p-2")
+
+def select_grid_years(years, year_subset=GRID_DEFAULT_YEAR_SUBSET, change_year=None):
+    """
+    Recorte de anos exibido no grid:
+    - "all": todos os anos;
+    - "step": um a cada GRID_YEAR_STEP anos, sempre incluindo o último;
+    - "change": GRID_CHANGE_WINDOW anos antes e depois do ano da mudança suspeita
+      (sem ano informado, exibe todos).
+    """
+    years = list(years)
+    if year_subset == "step" and years:
+        selected = years[::GRID_YEAR_STEP]
+        if selected[-1] != years[-1]:
+            selected.append(years[-1])
+        return selected
+    if year_subset == "change" and change_year is not None:
+        return [year for year in years if abs(year - int(change_year)) <= GRID_CHANGE_WINDOW]
+    return years
+
+def build_live_year_map(year, lat, lon):
+    """Mapa Leaflet interativo de um único ano, aberto sob demanda a partir do filmstrip."""
+    return dl.Map(
+        [
+            dl.TileLayer(url=tile_proxy_url("mosaic", year), attribution=f"MapBiomas {year}"),
+            dl.CircleMarker(center=[lat, lon], radius=6, color="red", fillOpacity=0.8)
+        ],
+        center=(lat, lon),
+        zoom=14,
+        style={"width": "100%", "height": "60vh", "borderRadius": "8px"},
+    )
+
+def fetch_sample_data(lat, lon, wait=True):
+    """
+    Payload combinado da amostra (índices espectrais, LULC e mosaicos disponíveis), buscado em uma
+    única ida ao GEE e compartilhado pelos painéis do grid. Centraliza os parâmetros usados pelo
+    grid para que o prefetch (callbacks/prefetch_callbacks.py) aqueça exatamente a mesma entrada
+    de cache. Como os painéis são resolvidos em callbacks separados e simultâneos, só o primeiro
+    pedido de um ponto vai ao GEE; os demais esperam por ele e leem o lru_cache. Com wait=False
+    (tarefas no pool GEE, que não pode ficar parado esperando outra requisição), quem não é o
+    primeiro retorna None na hora.
+    Levanta GEEGovernorError se o governador desistir da chamada e repassa os demais erros do GEE.
+    """
+    # Tuplas (e não listas/ranges): get_sample_payload usa lru_cache e exige argumentos hasheáveis
+    spectral_years = tuple(range(YEARS_RANGE.start, YEARS_RANGE.stop + 1))
+    lulc_years = tuple(range(YEARS_RANGE.start, YEARS_RANGE.stop + 1))
+    mosaic_years = tuple(YEARS_RANGE)
+
+    key = (lat, lon)
+    with _pending_payloads_lock:
+        pending = _pending_payloads.get(key)
+        is_leader = pending is None
+        if is_leader:
+            pending = _pending_payloads[key] = threading.Event()
+    if not is_leader:
+        if not wait:
+            return None
+        # Se o pedido em andamento falhar (ou for cancelado), este faz a própria tentativa
+        pending.wait(GEE_REQUEST_TIMEOUT)
+
+    try:
+        payload = get_sample_payload(lat, lon, LULC_ASSET, GRID_SPECTRAL_SENSORS, spectral_years, lulc_years, mosaic_years)
+        # Antes de liberar quem espera: wait_available_mosaic_years lê os anos logo ao acordar
+        with _pending_payloads_lock:
+            _known_mosaic_years[key] = payload["mosaic_years"]
+            _known_mosaic_years.move_to_end(key)
+            while len(_known_mosaic_years) > GRID_KNOWN_YEARS_CACHE_SIZE:
+                _known_mosaic_years.popitem(last=False)
+    finally:
+        if is_leader:
+            with _pending_payloads_lock:
+                _pending_payloads.pop(key, None)
+            pending.set()
+    return payload
+
+def get_sample_data(lat, lon):
+    """Como fetch_sample_data, mas retorna None (sem cache) quando o GEE está sobrecarregado ou falha."""
+    try:
+        return fetch_sample_data(lat, lon)
+    except GEEGovernorError as e:
+        # Não fica no cache: a próxima visita à amostra tenta de novo
+        app_logger.warning(f"GRID_MAPS_AND_GRAPHS: GEE sobrecarregado ao buscar dados de ({lat}, {lon}): {e}")
+        return None
+    except Exception as e:
+        app_logger.warning(f"GRID_MAPS_AND_GRAPHS: Erro ao buscar dados de ({lat}, {lon}): {e}")
+        return None
+
+def peek_available_mosaic_years(lat, lon):
+    """
+    Anos com mosaico no ponto, se o payload da amostra já foi resolvido; senão None.
+    Não bloqueia: o painel de mapas não espera pela série MODIS para aparecer.
+    """
+    with _pending_payloads_lock:
+        return _known_mosaic_years.get((lat, lon))
+
+def wait_available_mosaic_years(lat, lon, timeout):
+    """
+    Anos com mosaico no ponto, esperando o payload da amostra por no máximo timeout segundos;
+    None se ele não chegar no prazo. Se ninguém está buscando o payload, a busca é disparada no
+    pool GEE; se outro painel (ou o prefetch) já está, a espera acontece aqui, na thread do
+    callback, sem ocupar um worker do pool com o pedido alheio.
+    """
+    deadline = time.monotonic() + timeout
+    key = (lat, lon)
+    with _pending_payloads_lock:
+        pending = _pending_payloads.get(key)
+    if pending is None:
+        _results, errors = gather_tasks({"payload": Task(fetch_sample_data, (lat, lon, False), timeout)})
+        if errors:
+            app_logger.debug(f"UI_BUILD: Payload de ({lat}, {lon}) indisponível no prazo: {errors['payload']!r}.")
+        with _pending_payloads_lock:
+            pending = _pending_payloads.get(key) # Outro pedido assumiu a busca antes da tarefa
+    if pending is not None:
+        pending.wait(max(0, deadline - time.monotonic()))
+    return peek_available_mosaic_years(lat, lon)
+
+@lru_cache(maxsize=256)
+def get_ndvi_traces(lat, lon, processing=tuple(NDVI_DEFAULT_PROCESSING)):
+    """
+    Traces do gráfico NDVI da amostra (série reduzida por LTTB e, conforme as opções marcadas
+    pelo analista, sem ruído de nuvem e/ou suavizada), com cache próprio do painel.
+    processing é uma tupla ordenada de valores de NDVI_PROCESSING_OPTIONS. O layout vem do
+    modelo pronto (utils/figure_templates.py).
+    """
+    payload = fetch_sample_data(lat, lon)
+    ndvi_data = payload["ndvi"] if payload else pd.DataFrame(columns=['time', 'NDVI'])
+    app_logger.debug(f"GRID_NDVI: Dados NDVI obtidos para ({lat}, {lon}): {len(ndvi_data)} pontos.")
+    return ndvi_traces(process_series(
+        ndvi_data,
+        smoothing=NDVI_SMOOTHING if "smooth" in processing else None,
+        remove_outliers="outliers" in processing,
+    ))
+
+@lru_cache(maxsize=256)
+def get_lulc_traces(lat, lon):
+    """Traces do gráfico do histórico LULC da amostra, com cache próprio do painel."""
+    payload = fetch_sample_data(lat, lon)
+    years_for_lulc_history = range(YEARS_RANGE.start, YEARS_RANGE.stop + 1)
+    return lulc_traces(payload["lulc"] if payload else {}, years_for_lulc_history)
+
+def resolve_grid_sample(current_sample):
+    """
+    Coordenadas da amostra atual para os painéis do grid, a partir do registro publicado em
+    "current-sample-store" (ver resolve_current_sample em callbacks/sample_data_callbacks.py).
+    Retorna (amostra, lat, lon, mensagem); mensagem só é preenchida quando não dá para
+    montar os painéis (nenhuma amostra ou coordenadas inválidas).
+    """
+    if not current_sample:
+        return None, None, None, "Nenhuma amostra selecionada para visualização. Carregando dados..."
+
+    lat, lon = current_sample.get("lat"), current_sample.get("lon")
+    if lat is None or lon is None:
+        sample_id = current_sample.get("sample_id")
+        app_logger.error(f"GRID_MAPS_AND_GRAPHS: Coordenadas inválidas para amostra {sample_id}. Detalhes da amostra: {current_sample}")
+        return current_sample, None, None, f"Coordenadas inválidas para amostra {sample_id}."
+    return current_sample, lat, lon, None
+
+def skip_hidden_grid_update(active_tab_id, triggered_id):
+    """
+    Se a aba 'Avaliação' NÃO está ativa e o trigger NÃO veio da amostra atual
+    (current-sample-store), os painéis não são recalculados em abas ocultas.
+    """
+    return active_tab_id != 'tab-grid' and triggered_id != 'current-sample-store'
+
+def build_missing_year_cell(year):
+    """Célula do grid para um ano sem mosaico disponível no ponto da amostra."""
+    return html.Div([
+        html.Div(f"{year}", style={"textAlign": "center", "fontWeight": "bold", "color": "#6c757d", "fontSize": "14px"}),
+        html.Div(
+            "Sem mosaico",
+            className="text-muted small",
+            style={
+                "width": f"{GRID_TILE_SIZE}px", "height": f"{GRID_TILE_SIZE}px", "display": "flex",
+                "alignItems": "center", "justifyContent": "center", "border": "1px dashed #6c757d", "borderRadius": "8px"
+            }
+        )
+    ], style={"display": "inline-block", "margin": "2px"})
+
+def build_maps_panel(sample, years_range=None, view_mode=GRID_DEFAULT_VIEW_MODE, year_subset=GRID_DEFAULT_YEAR_SUBSET, change_year=None):
     app_logger.debug(f"UI_BUILD: Construindo painel de mapas para amostra {sample.get('sample_id', 'N/A')}.")
     if not sample:
         app_logger.warning("UI_BUILD: Nenhuma amostra fornecida para construir painel de mapas.")
         return html.Div("Nenhuma amostra selecionada para visualização de grid.", className="text-center text-muted p-4")
 
-    lat, lon = extract_point(sample)
+    lat, lon = sample.get("lat"), sample.get("lon")
     if lat is None or lon is None:
         app_logger.warning(f"UI_BUILD: Coordenadas inválidas para amostra {sample.get('sample_id', 'N/A')}, não é possível construir painel de mapas.")
         return html.Div("Coordenadas inválidas para esta amostra.", className="text-center text-danger p-4")
@@ -31,146 +311,210 @@ def build_maps_panel(sample, years_range=None):
     else: # Fallback para o caso de YEARS_RANGE não ser um range ou tupla/lista válida
         years_to_display = list(range(1985, datetime.now().year + 1)) # Default range
 
-    maps_html = []
-    for year in years_to_display:
-        try:
-            tile_url = get_mosaic_url(year)
-            maps_html.append(
-                html.Div([
-                    html.Div(f"{year}", style={"textAlign": "center", "fontWeight": "bold", "color": "#2a9fd6", "fontSize": "14px"}),
-                    dl.Map(
-                        [
-                            dl.TileLayer(url=tile_url, attribution=f"MapBiomas {year}"),
-                            dl.CircleMarker(center=[lat, lon], radius=5, color="red", fillOpacity=0.8)
-                        ],
-                        center=(lat, lon),
-                        zoom=14,
-                        style={"width": f"{GRID_TILE_SIZE}px", "height": f"{GRID_TILE_SIZE}px", "margin": "0px", "borderRadius": "8px"},
-                        zoomControl=False, scrollWheelZoom=False, dragging=False,
-                        doubleClickZoom=False, attributionControl=False, preferCanvas=True,
-                    )
-                ], style={"display": "inline-block", "margin": "2px"})
-            )
-        except Exception as e:
-            app_logger.error(f"UI_BUILD: Erro ao gerar mapa para ano {year} e amostra {sample.get('sample_id')}: {e}", exc_info=True)
-            maps_html.append(
-                html.Div([
-                    html.Div(f"{year}", style={"textAlign": "center", "fontWeight": "bold", "color": "#ff0000"}),
-                    html.Div("Erro ao carregar mapa", style={"color": "#ff0000", "fontSize": "12px", "textAlign": "center"})
-                ], style={"display": "inline-block", "margin": "2px"})
-            )
-
-    return html.Div(maps_html, style=GRID_STYLE)
+    years_to_display = select_grid_years(years_to_display, year_subset, change_year)
+
+    # Anos sem mosaico no ponto vêm do payload combinado. Se ele ainda não foi resolvido, a
+    # busca é disparada e esperada só até GRID_AVAILABILITY_TIMEOUT: uma série MODIS lenta
+    # não segura o painel, que então exibe todos os anos (a busca continua em segundo plano
+    # e alimenta os gráficos).
+    available_years = peek_available_mosaic_years(lat, lon)
+    if available_years is None:
+        available_years = wait_available_mosaic_years(lat, lon, GRID_AVAILABILITY_TIMEOUT)
+    if available_years is None:
+        app_logger.debug(f"UI_BUILD: Anos com mosaico indisponíveis para ({lat}, {lon}) no prazo. Exibindo todos os anos.")
+        available_years = set(years_to_display)
+
+    if view_mode == "timelapse":
+        return build_timelapse_panel([year for year in years_to_display if year in available_years], lat, lon)
+
+    # Grid virtualizado: as células são leves e só as visíveis (mais o overscan) baixam
+    # imagem (miniaturas) ou montam um dl.Map e resolvem a URL do mosaico (mapas).
+    build_cell = build_lazy_map_cell if view_mode == "maps" else (lambda year: build_year_chip(year, lat, lon))
+    cells = [build_cell(year) if year in available_years else build_missing_year_cell(year) for year in years_to_display]
+    return html.Div(
+        cells,
+        className="grid-virtual",
+        style=GRID_STYLE,
+        **{
+            "data-key": uuid.uuid4().hex, # Nova renderização: o observador de visibilidade recomeça
+            "data-sample": str(sample.get("sample_id")),
+            "data-overscan": GRID_LAZY_OVERSCAN_PX,
+        }
+    )
 
 def register_callbacks(app):
     """
     Registra callbacks para a aba de visualização em grade (mini-mapas, NDVI, LULC History).
     """
 
-    # Callback para atualizar o painel de mapas e gráfico NDVI/LULC History
+    # Os três painéis da aba são resolvidos por callbacks independentes (executados em
+    # paralelo pelo servidor): cada um aparece assim que fica pronto, com o próprio spinner,
+    # escopo de cancelamento e cache. O painel de mapas não espera a série MODIS além de
+    # GRID_AVAILABILITY_TIMEOUT e costuma ser o primeiro a chegar.
     @app.callback(
         Output("grid-maps-panel", "children"),
+        Input("current-sample-store", "data"),
+        Input('tabs', 'active_tab'), # Dispara quando a aba muda
+        Input("grid-view-mode", "value"),
+        Input("grid-year-subset", "value"),
+        Input("grid-change-year", "value"),
+        State("session-id-store", "data"),
+        prevent_initial_call=True
+    )
+    def update_grid_maps_panel(current_sample, active_tab_id, grid_view_mode, year_subset, change_year, session_id):
+        sample_id = current_sample.get("sample_id") if current_sample else None
+        triggered_id = callback_context.triggered_id or 'initial_load'
+        app_logger.info(f"GRID_MAPS: Callback acionado por '{triggered_id}'. Sample ID: {sample_id}. Aba Ativa: {active_tab_id}")
+        if skip_hidden_grid_update(active_tab_id, triggered_id):
+            app_logger.debug(f"GRID_MAPS: Aba 'Avaliação' oculta e trigger '{triggered_id}' não requer atualização. Retornando no_update.")
+            return no_update
+
+        sample, lat, lon, message = resolve_grid_sample(current_sample)
+        if message:
+            app_logger.warning(f"GRID_MAPS: {message}")
+            return html.Div(message, className="text-center text-muted p-4")
+
+        # Cada nova amostra (ou troca de modo) da sessão torna obsoleto o trabalho GEE do
+        # painel anterior: as chamadas restantes dele são puladas e o resultado é descartado.
+        request_token = begin_request(session_id, "grid-maps")
+        with request_scope(request_token):
+            try:
+                maps_panel_children = build_maps_panel(
+                    sample, years_range=YEARS_RANGE, view_mode=grid_view_mode,
+                    year_subset=year_subset, change_year=change_year
+                )
+            except Exception as e:
+                app_logger.error(f"GRID_MAPS: Erro ao construir painel de mapas para amostra {sample_id}. Erro: {e}", exc_info=True)
+                maps_panel_children = html.Div(f"Erro ao carregar mapas para amostra {sample_id}.", className="text-center text-danger p-4")
+            superseded = request_token.superseded
+
+        if superseded:
+            app_logger.info(f"GRID_MAPS: Amostra {sample_id} substituída por outra requisição da sessão. Descartando resultado.")
+            return no_update
+        app_logger.info(f"GRID_MAPS: Painel de mapas da amostra {sample_id} construído (modo '{grid_view_mode}').")
+        return maps_panel_children
+
+    # Grid virtualizado (modo mapas): assets/grid_virtualization.js informa quais células
+    # entraram/saíram da área visível; só as que entraram montam um dl.Map.
+    @app.callback(
+        Output({"type": "grid-year-cell", "index": ALL}, "children"),
+        Input("grid-visible-years", "data"),
+        State({"type": "grid-year-cell", "index": ALL}, "id"),
+        State("current-sample-store", "data"),
+        prevent_initial_call=True
+    )
+    def render_visible_year_maps(visible, cell_ids, current_sample):
+        sample_id = current_sample.get("sample_id") if current_sample else None
+        if not visible or not cell_ids or str(visible.get("sample")) != str(sample_id):
+            # Evento de um painel que já foi substituído por outra amostra
+            return [no_update] * len(cell_ids)
+
+        sample, lat, lon, message = resolve_grid_sample(current_sample)
+        if message:
+            return [no_update] * len(cell_ids)
+
+        entered = set(visible.get("entered") or [])
+        left = set(visible.get("left") or []) - entered
+        cell_years = [cell_id["index"] for cell_id in cell_ids]
+        # Os tiles apontam para o proxy, que resolve o mapid do ano (getMapId, em cache) no
+        # primeiro tile pedido: montar o mapa não espera o GEE
+        app_logger.debug(f"GRID_MAPS: Amostra {sample_id}: montando mapas de {sorted(entered)}, desmontando {sorted(left)}.")
+
+        children = []
+        for year in cell_years:
+            if year in entered:
+                children.append(build_year_map(year, lat, lon))
+            elif year in left:
+                children.append(None)
+            else:
+                children.append(no_update)
+        return children
+
+    # Os gráficos já nascem no layout com o modelo pronto (utils/figure_templates.py):
+    # os callbacks enviam só um Patch com os dados da amostra, ou com as cores do tema.
+    def update_grid_graph(panel, traces_getter, current_sample, active_tab_id, theme, session_id):
+        """Corpo comum dos callbacks dos gráficos NDVI e LULC."""
+        sample_id = current_sample.get("sample_id") if current_sample else None
+        triggered_id = callback_context.triggered_id or 'initial_load'
+        app_logger.info(f"GRID_{panel}: Callback acionado por '{triggered_id}'. Sample ID: {sample_id}. Aba Ativa: {active_tab_id}")
+        if triggered_id == 'theme-toggle':
+            return theme_patch(theme)
+        if skip_hidden_grid_update(active_tab_id, triggered_id):
+            return no_update
+
+        kind = panel.lower()
+        sample, lat, lon, message = resolve_grid_sample(current_sample)
+        if message:
+            app_logger.warning(f"GRID_{panel}: {message}")
+            return data_patch(kind, []) # Gráfico vazio
+
+        request_token = begin_request(session_id, f"grid-{kind}")
+        with request_scope(request_token):
+            try:
+                traces = traces_getter(lat, lon)
+            except GEEGovernorError as e:
+                # Não fica no cache do painel: a próxima visita à amostra tenta de novo
+                app_logger.warning(f"GRID_{panel}: GEE sobrecarregado ao gerar o gráfico da amostra {sample_id}: {e}")
+                traces = []
+            except Exception as e:
+                app_logger.error(f"GRID_{panel}: Erro ao gerar o gráfico da amostra {sample_id}. Erro: {e}", exc_info=True)
+                traces = []
+            superseded = request_token.superseded
+
+        if superseded:
+            app_logger.info(f"GRID_{panel}: Amostra {sample_id} substituída por outra requisição da sessão. Descartando resultado.")
+            return no_update
+        app_logger.debug(f"GRID_{panel}: Gráfico da amostra {sample_id} gerado: {'Sim' if traces else 'Não'}")
+        return data_patch(kind, traces)
+
+    @app.callback(
         Output("ndvi-graph", "figure"),
+        Input("current-sample-store", "data"),
+        Input('tabs', 'active_tab'),
+        Input("theme-toggle", "value"),
+        Input("ndvi-processing-options", "value"),
+        State("session-id-store", "data"),
+        prevent_initial_call=True
+    )
+    def update_ndvi_graph(current_sample, active_tab_id, theme, processing, session_id):
+        processing = tuple(sorted(processing or ()))
+        return update_grid_graph(
+            "NDVI", lambda lat, lon: get_ndvi_traces(lat, lon, processing),
+            current_sample, active_tab_id, theme, session_id
+        )
+
+    @app.callback(
         Output("lulc-history-graph", "figure"),
-        Input("filter-id", "value"),
-        Input("sample-table-store", "data"),
-        State("dataset-selector", "value"),
-        Input('tabs', 'active_tab'), # NOVO INPUT: Dispara quando a aba muda
+        Input("current-sample-store", "data"),
+        Input('tabs', 'active_tab'),
+        Input("theme-toggle", "value"),
+        State("session-id-store", "data"),
         prevent_initial_call=True
     )
-    def update_maps_and_graphs(sample_id, table_data, current_dataset_key, active_tab_id):
-        app_logger.info(f"GRID_MAPS_AND_GRAPHS: Callback acionado. Sample ID: {sample_id}. Aba Ativa: {active_tab_id}")
-        app_logger.debug(f"GRID_MAPS_AND_GRAPHS: table_data tipo: {type(table_data)}, len: {len(table_data) if table_data is not None else 0}")
+    def update_lulc_history_graph(current_sample, active_tab_id, theme, session_id):
+        return update_grid_graph("LULC", get_lulc_traces, current_sample, active_tab_id, theme, session_id)
 
+    # Callback para abrir o mapa interativo de um ano ao clicar na miniatura do filmstrip
+    @app.callback(
+        Output("grid-live-map-modal", "is_open"),
+        Output("grid-live-map-title", "children"),
+        Output("grid-live-map-body", "children"),
+        Input({"type": "grid-year-chip", "index": ALL}, "n_clicks"),
+        State("current-sample-store", "data"),
+        prevent_initial_call=True
+    )
+    def open_live_year_map(chip_clicks, current_sample):
         ctx = callback_context
-        triggered_id = ctx.triggered[0]['prop_id'].split(".")[0] if ctx.triggered else 'initial_load'
-
-        # MODIFICADO: Lógica de saída antecipada. Se a aba 'Avaliação' NÃO está ativa
-        # E o trigger NÃO veio de filter-id ou sample-table-store (indicando mudança de dados),
-        # então retorna no_update para evitar recalculos em abas ocultas.
-        if active_tab_id != 'tab-grid' and triggered_id not in ['filter-id', 'sample-table-store']:
-            app_logger.debug(f"GRID_MAPS_AND_GRAPHS: Aba 'Avaliação' oculta e trigger '{triggered_id}' não requer atualização. Retornando no_update.")
+        # O grid é recriado a cada amostra (n_clicks=0); só abre em clique real
+        if not ctx.triggered or not ctx.triggered[0]["value"]:
             return no_update, no_update, no_update
 
-        # Inicializar variáveis de saída com valores padrão (vazios/neutros)
-        maps_panel_children = html.Div("Nenhum mapa disponível. Selecione uma amostra válida.", className="text-center text-muted p-4")
-        ndvi_graph_figure = {} # Figura Plotly vazia
-        lulc_history_graph_figure = {} # Figura Plotly vazia
-
-        # Condição de saída antecipada se não há dados de amostra ou ID
-        if (triggered_id == 'sample-table-store' and not table_data) or not sample_id:
-            app_logger.warning("GRID_MAPS_AND_GRAPHS: Nenhuma amostra ou dados da tabela para construir mapas/gráficos (ainda não carregado). Retornando vazios.")
-            return (
-                html.Div("Nenhuma amostra selecionada para visualização. Carregando dados...", className="text-center text-muted p-4"),
-                ndvi_graph_figure,
-                lulc_history_graph_figure
-            )
-
-        # Garante que table_data é uma lista de dicionários
-        if isinstance(table_data, pd.DataFrame):
-            app_logger.debug("GRID_MAPS_AND_GRAPHS: Convertendo table_data de DataFrame para lista de dicts.")
-            table_data = table_data.to_dict("records")
-
-        # Encontra a amostra pelo ID
-        sample = next((row for row in table_data if row.get("sample_id") == sample_id), None)
-        if not sample:
-            app_logger.warning(f"GRID_MAPS_AND_GRAPHS: Amostra {sample_id} não encontrada na tabela de dados. Retornando vazios.")
-            return (
-                html.Div(f"Amostra {sample_id} não encontrada na tabela.", className="text-center text-danger p-4"),
-                ndvi_graph_figure,
-                lulc_history_graph_figure
-            )
-
-        # Extrai coordenadas e verifica validade.
-        lat, lon = extract_point(sample)
+        year = ctx.triggered_id["index"]
+        sample, lat, lon, _message = resolve_grid_sample(current_sample)
+        sample_id = current_sample.get("sample_id") if current_sample else None
         if lat is None or lon is None:
-            app_logger.error(f"GRID_MAPS_AND_GRAPHS: Coordenadas inválidas para amostra {sample_id}. Não é possível gerar os gráficos. Detalhes da amostra: {sample}")
-            return (
-                html.Div(f"Coordenadas inválidas para amostra {sample_id}.", className="text-center text-danger p-4"),
-                ndvi_graph_figure,
-                lulc_history_graph_figure
-            )
-
-        app_logger.debug(f"GRID_MAPS_AND_GRAPHS: Coordenadas da amostra {sample_id}: Lat={lat}, Lon={lon}.")
-        app_logger.debug(f"GRID_MAPS_AND_GRAPHS: Preparando para buscar e plotar dados de gráficos.")
-
-        # Lógica de geração dos mapas (grid)
-        try:
-            app_logger.debug(f"GRID_MAPS_AND_GRAPHS: Início da construção do painel de mapas para amostra {sample_id}.")
-            years_range_for_dataset = YEARS_RANGE # Assumindo que YEARS_RANGE está definido em constants.py
-            maps_panel_children = build_maps_panel(sample, years_range=years_range_for_dataset)
-            app_logger.debug(f"GRID_MAPS_AND_GRAPHS: build_maps_panel retornado: {len(maps_panel_children.children) if maps_panel_children and hasattr(maps_panel_children, 'children') else 'Vazio'}")
-        except Exception as e:
-            app_logger.error(f"ERROR: Erro ao construir painel de mapas para amostra {sample_id}. Erro: {e}", exc_info=True)
-            maps_panel_children = html.Div(f"Erro ao carregar mapas para amostra {sample_id}.", className="text-center text-danger p-4")
-
-
-        # Lógica de geração dos gráficos (NDVI e LULC History)
-        try:
-            # Garante que start_year e end_year para o MODIS são consistentes com a coleção
-            # MODIS está disponível a partir de 2000/2001. A função get_modis_ndvi já tem um max(2000, start_year).
-            start_year_modis = YEARS_RANGE.start if hasattr(YEARS_RANGE, 'start') else YEARS_RANGE[0]
-            end_year_modis = YEARS_RANGE.stop if hasattr(YEARS_RANGE, 'stop') else datetime.now().year # Usar ano atual para o máximo
-
-            app_logger.debug(f"GRID_MAPS_AND_GRAPHS: Buscando dados MODIS NDVI para {sample_id} de {start_year_modis} a {end_year_modis}.")
-            ndvi_data = get_modis_ndvi(start_year_modis, end_year_modis, (lat, lon))
-            app_logger.debug(f"GRID_MAPS_AND_GRAPHS: Dados NDVI obtidos: {len(ndvi_data)} pontos.")
-            ndvi_graph_figure = plot_ndvi_series(ndvi_data)
-            app_logger.debug(f"GRID_MAPS_AND_GRAPHS: Gráfico NDVI gerado: {'Sim' if ndvi_graph_figure else 'Não'}")
-
-            app_logger.debug(f"GRID_MAPS_AND_GRAPHS: Buscando e plotando histórico LULC para {sample_id}.")
-            lulc_asset_path = LULC_ASSET # Assumindo que LULC_ASSET está definido em constants.py
-            years_for_lulc_history = list(range(YEARS_RANGE.start, YEARS_RANGE.stop + 1))
-            lulc_history_graph_figure = plot_land_use_history(lulc_asset_path, lat, lon, years_for_lulc_history) # MODIFICADO: CLASS_INFO removido
-            app_logger.debug(f"GRID_MAPS_AND_GRAPHS: Gráfico LULC Histórico gerado: {'Sim' if lulc_history_graph_figure else 'Não'}")
-
-
-        except Exception as e:
-            app_logger.error(f"ERROR: Erro ao gerar um dos gráficos (NDVI ou LULC History) para amostra {sample_id}. Erro: {e}", exc_info=True)
-            # Retorna figuras vazias para os gráficos em caso de erro na geração
-            ndvi_graph_figure = {}
-            lulc_history_graph_figure = {}
-
-
-        app_logger.info(f"GRID_MAPS_AND_GRAPHS: Mapas e gráficos NDVI/LULC para amostra {sample_id} construídos. Retornando.")
-        return maps_panel_children, ndvi_graph_figure, lulc_history_graph_figure
\ No newline at end of file
+            app_logger.warning(f"GRID_LIVE_MAP: Amostra {sample_id} sem coordenadas para abrir o mapa do ano {year}.")
+            return no_update, no_update, no_update
+
+        app_logger.info(f"GRID_LIVE_MAP: Abrindo mapa interativo do ano {year} para amostra {sample_id}.")
+        return True, f"Mosaico {year} - Amostra {sample_id}", build_live_year_map(year, lat, lon)
@@ -0,0 +1,187 @@
+# callbacks/prefetch_callbacks.py
+#
+# Prefetch em segundo plano: sempre que a amostra atual muda, prevê as próximas amostras
+# da fila de navegação (mesma ordem do botão "Próximo" e do avanço automático após validar)
+# e aquece os caches delas — série NDVI, histórico LULC e as imagens do grid
+# (miniaturas, tiles ou a animação do time-lapse, conforme o modo do grid). Quando o validador chega na amostra,
+# tudo já está em memória (lru_cache, inclusive os traces prontos dos gráficos) ou no cache
+# em disco do proxy de tiles. As chamadas ao GEE do prefetch rodam em prioridade de segundo
+# plano no governador (background_scope): poucas vagas e só com taxa sobrando, para não atrasar
+# a amostra atual.
+#
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from dash import Output, Input, State
+
+from utils.logger import app_logger
+from utils.constants import (
+    YEARS_RANGE, GRID_DEFAULT_VIEW_MODE, GRID_DEFAULT_YEAR_SUBSET, GRID_MAP_ZOOM, GRID_TILE_SIZE,
+    PREFETCH_AHEAD, PREFETCH_MAX_WORKERS
+)
+from utils.tile_proxy import fetch_chip, fetch_tile, fetch_timelapse, tiles_around_point
+from callbacks.sample_data_callbacks import extract_point
+from utils.gee_governor import GEEGovernorError, background_scope
+from utils.sample_store import get_sample, get_navigation
+from callbacks.grid_view_callbacks import get_sample_data, get_ndvi_traces, get_lulc_traces, select_grid_years
+
+# Pool próprio e pequeno: o prefetch não ocupa as threads dos callbacks nem o pool GEE do grid;
+# a cota de GEE dele é limitada pelo governador (GEE_BACKGROUND_MAX_CONCURRENT/MIN_TOKENS)
+_prefetch_executor = ThreadPoolExecutor(max_workers=PREFETCH_MAX_WORKERS, thread_name_prefix="prefetch")
+
+# Amostras que ainda interessam, por sessão ({session_id: set de sample_id}). Jobs de amostras
+# que saíram da previsão da sessão (o validador pulou para outro lugar) são descartados antes
+# de começar ou entre um ano e outro; a previsão de uma sessão não mexe na das outras.
+# A entrada da sessão sai dos dois dicts quando os jobs dela terminam.
+_wanted_lock = threading.Lock()
+_wanted = {}
+_in_flight = {}
+
+def predict_next_samples(current_id, table_handle, n=PREFETCH_AHEAD, only_unvalidated=False):
+    """
+    Retorna até n registros (dicts) das amostras que provavelmente serão abertas em seguida:
+    a próxima amostra PENDING (destino do avanço automático após validar) e as seguintes
+    na ordem de navegação, com wrap-around. A amostra atual nunca é incluída.
+    """
+    if current_id is None:
+        return []
+
+    navigation = get_navigation(table_handle)
+    predicted = []
+    # Avanço automático de load_and_update_table_data: próxima PENDING com ID maior
+    next_pending_id = navigation.next_pending(current_id)
+    if next_pending_id is not None and next_pending_id > current_id:
+        predicted.append(next_pending_id)
+
+    for sample_id in navigation.following(current_id, n + 1, only_unvalidated):
+        if len(predicted) >= n:
+            break
+        if sample_id not in predicted:
+            predicted.append(sample_id)
+
+    return [get_sample(table_handle, sample_id) for sample_id in predicted]
+
+def _still_wanted(session_id, sample_id):
+    with _wanted_lock:
+        return sample_id in _wanted.get(session_id, ())
+
+def _prefetch_sample(session_id, sample, view_mode, years):
+    sample_id = sample.get("sample_id")
+    try:
+        with background_scope():
+            _warm_sample(session_id, sample, view_mode, years)
+    except GEEGovernorError as e:
+        app_logger.debug(f"PREFETCH: Prefetch da amostra {sample_id} interrompido pelo governador do GEE: {e}")
+    except Exception as e:
+        app_logger.error(f"PREFETCH: Erro inesperado no prefetch da amostra {sample_id}: {e}", exc_info=True)
+    finally:
+        with _wanted_lock:
+            in_flight = _in_flight.get(session_id)
+            if in_flight is not None:
+                in_flight.discard(sample_id)
+                if not in_flight:
+                    _in_flight.pop(session_id, None)
+                    _wanted.pop(session_id, None)
+
+def _warm_sample(session_id, sample, view_mode, years):
+    sample_id = sample.get("sample_id")
+    if not _still_wanted(session_id, sample_id):
+        app_logger.debug(f"PREFETCH: Amostra {sample_id} saiu da fila antes de iniciar. Descartando.")
+        return
+
+    lat, lon = extract_point(sample)
+    if lat is None or lon is None:
+        return
+
+    # Payload combinado NDVI/LULC/mosaicos (lru_cache em utils/gee.py) e as figuras dos
+    # traces dos gráficos do grid (cache próprio de cada painel)
+    payload = get_sample_data(lat, lon)
+    if not payload:
+        # GEE ocupado (chamada adiada pelo governador) ou com erro: as imagens ficam para a visita
+        app_logger.debug(f"PREFETCH: Payload da amostra {sample_id} indisponível. Prefetch encerrado.")
+        return
+    try:
+        get_ndvi_traces(lat, lon)
+        get_lulc_traces(lat, lon)
+    except GEEGovernorError as e:
+        app_logger.debug(f"PREFETCH: GEE sobrecarregado ao aquecer gráficos da amostra {sample_id}: {e}")
+    available_years = payload["mosaic_years"]
+
+    if view_mode == "timelapse":
+        # Uma única animação com os anos disponíveis (cache em disco do proxy)
+        fetch_timelapse([year for year in years if year in available_years], lat, lon)
+        app_logger.debug(f"PREFETCH: Amostra {sample_id} aquecida (modo '{view_mode}').")
+        return
+
+    # Imagens por ano (cache em disco do proxy de tiles)
+    tiles = tiles_around_point(lat, lon, GRID_MAP_ZOOM, GRID_TILE_SIZE)
+    for year in years:
+        if year not in available_years:
+            continue
+        if not _still_wanted(session_id, sample_id):
+            app_logger.debug(f"PREFETCH: Amostra {sample_id} saiu da fila no ano {year}. Interrompendo.")
+            return
+        if view_mode == "chips":
+            fetch_chip(year, lat, lon)
+        else:
+            for x, y in tiles:
+                fetch_tile("mosaic", year, GRID_MAP_ZOOM, x, y)
+
+    app_logger.debug(f"PREFETCH: Amostra {sample_id} aquecida (modo '{view_mode}').")
+
+def schedule_prefetch(session_id, samples, view_mode=GRID_DEFAULT_VIEW_MODE, years=YEARS_RANGE):
+    """
+    Substitui a fila de prefetch da sessão pelas amostras informadas. Amostras já em andamento
+    na sessão não são reenviadas; as que deixaram de ser previstas são descartadas pelos
+    próprios jobs. A fila das demais sessões não é alterada.
+    Só os anos do recorte exibido no grid (years) são aquecidos.
+    Retorna a lista de IDs efetivamente enfileirados. Sem session_id (store ainda não
+    preenchido) nada é enfileirado: a fila seria compartilhada por todas as abas nessa situação.
+    """
+    if session_id is None:
+        return []
+    queued = []
+    with _wanted_lock:
+        in_flight = _in_flight.get(session_id, set())
+        if not samples and not in_flight:
+            _wanted.pop(session_id, None)
+            return []
+        _wanted[session_id] = {s["sample_id"] for s in samples}
+        for sample in samples:
+            if sample["sample_id"] in in_flight:
+                continue
+            in_flight.add(sample["sample_id"])
+            queued.append(sample)
+        if in_flight:
+            _in_flight[session_id] = in_flight
+
+    for sample in queued:
+        _prefetch_executor.submit(_prefetch_sample, session_id, sample, view_mode, list(years))
+    return [s["sample_id"] for s in queued]
+
+def register_callbacks(app):
+    """
+    Registra o callback que dispara o prefetch das próximas amostras.
+    """
+    @app.callback(
+        Output("prefetch-store", "data"),
+        Input("filter-id", "value"),
+        State("sample-table-store", "data"),
+        State("toggle-unvalidated-nav", "value"),
+        State("grid-view-mode", "value"),
+        State("grid-year-subset", "value"),
+        State("grid-change-year", "value"),
+        State("session-id-store", "data"),
+    )
+    def prefetch_upcoming_samples(sample_id, table_handle, unvalidated_nav_value, grid_view_mode, year_subset, change_year, session_id):
+        if sample_id is None or not table_handle:
+            return {"current": sample_id, "queued": []}
+
+        only_unvalidated = "unvalidated_only" in (unvalidated_nav_value or [])
+        upcoming = predict_next_samples(sample_id, table_handle, PREFETCH_AHEAD, only_unvalidated)
+        years = select_grid_years(YEARS_RANGE, year_subset or GRID_DEFAULT_YEAR_SUBSET, change_year)
+        queued_ids = schedule_prefetch(session_id, upcoming, grid_view_mode or GRID_DEFAULT_VIEW_MODE, years)
+
+        app_logger.debug(f"PREFETCH: Amostra atual {sample_id}. Previstas: {[s['sample_id'] for s in upcoming]}. Enfileiradas: {queued_ids}")
+        return {"current": sample_id, "queued": queued_ids}
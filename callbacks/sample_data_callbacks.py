@@ -1,38 +1,81 @@
 # callbacks/sample_data_callbacks.py
 
-import pandas as pd
-from dash import Output, Input, State, callback_context, no_update, html # ADICIONADO: html
+from dash import Output, Input, State, ClientsideFunction, callback_context, no_update, html # ADICIONADO: html
 import dash_bootstrap_components as dbc
 from shapely import wkt
 
-from utils.constants import REASONS_BY_STATUS, STATUS_COLORS, HIGHLIGHT_CLASS
+from utils.constants import STATUS_COLORS
 from utils.logger import app_logger
+from utils.sample_store import get_table, get_sample, get_navigation
 
 # --- FUNÇÕES AUXILIARES ---
 def extract_point(sample):
-    app_logger.debug(f"GEOM: Extraindo ponto para sample ID: {sample.get('sample_id', 'N/A')}")
-    if not sample or "geometry" not in sample or not sample["geometry"]:
+    """
+    (lat, lon) da amostra. Lê as colunas "lat"/"lon", decodificadas da geometria uma única vez
+    na carga da tabela (utils/sample_store.py); linhas sem elas caem no parse do WKT.
+    """
+    if not sample:
+        return None, None
+    if "lat" in sample and "lon" in sample:
+        return sample["lat"], sample["lon"]
+
+    if "geometry" not in sample or not sample["geometry"]:
         app_logger.warning(f"GEOM: Amostra {sample.get('sample_id', 'N/A')} sem geometria válida (sample ou geometry ausente/vazio).")
         return None, None
 
     geometry_wkt = sample["geometry"]
-    app_logger.debug(f"GEOM: Geometry WKT para sample {sample.get('sample_id')}: '{geometry_wkt}'")
-
     try:
         point = wkt.loads(geometry_wkt)
-        app_logger.debug(f"GEOM: WKT parseado para ponto: ({point.y}, {point.x})")
         return point.y, point.x # (lat, lon)
     except Exception as e:
         app_logger.error(f"GEOM: Erro ao parsear WKT para amostra {sample.get('sample_id', 'N/A')}. WKT: '{geometry_wkt}'. Erro: {e}", exc_info=True)
         return None, None
 
+def build_current_sample_record(table_handle, sample_id):
+    """
+    Registro compacto da amostra atual, publicado em "current-sample-store" e consumido por
+    todos os painéis: ID, lat/lon, bioma, classe, status, definição e motivo.
+    Retorna None se não houver tabela ou a amostra não estiver nela.
+    """
+    sample = get_sample(table_handle, sample_id)
+    if not sample:
+        return None
+
+    lat, lon = extract_point(sample)
+    return {
+        "sample_id": sample["sample_id"],
+        "lat": lat,
+        "lon": lon,
+        "biome_name": sample.get("biome_name"),
+        "class_name": sample.get("class_name"),
+        "status": sample.get("status"),
+        "definition": sample.get("definition"),
+        "reason": sample.get("reason"),
+    }
+
+def build_sample_neighbors(table_handle, sample_id, only_unvalidated=False):
+    """
+    Amostras vizinhas da atual na ordem de navegação, publicadas em "current-sample-neighbors-store"
+    (só a navegação Anterior/Próximo as usa; ficam fora do registro para que mudanças nos
+    vizinhos não redisparem os painéis). Retorna None se a amostra não estiver na tabela.
+    """
+    if get_sample(table_handle, sample_id) is None:
+        return None
+    navigation = get_navigation(table_handle)
+    return {
+        "sample_id": sample_id,
+        "previous": navigation.previous_id(sample_id, only_unvalidated),
+        "next": navigation.next_id(sample_id, only_unvalidated),
+    }
+
 def build_info_text(sample_data):
     """
-    Constrói o texto informativo sobre a amostra atual com um formato de métricas.
+    Constrói o texto informativo sobre a amostra atual (registro de "current-sample-store")
+    com um formato de métricas.
     """
     app_logger.debug("UI_BUILD: Construindo texto de informações da amostra como métricas.")
 
-    if not sample_data or "geometry" not in sample_data or not sample_data["geometry"]:
+    if not sample_data or sample_data.get("lat") is None or sample_data.get("lon") is None:
         app_logger.warning("UI_BUILD: Dados de amostra incompletos ou inválidos para info text.", extra={"details": {"sample_data_keys": list(sample_data.keys()) if sample_data else "None"}})
         return html.Div(
             [
@@ -43,8 +86,7 @@ def build_info_text(sample_data):
         )
 
     try:
-        point = wkt.loads(sample_data["geometry"])
-        lat, lon = point.y, point.x
+        lat, lon = sample_data["lat"], sample_data["lon"]
 
         status_value = sample_data.get('status', 'UNDEFINED')
         status_color = STATUS_COLORS.get(status_value, "secondary")
@@ -98,7 +140,7 @@ def build_info_text(sample_data):
         return html.Div(metrics_content, className="p-2 border rounded shadow-sm bg-light")
 
     except Exception as e:
-        app_logger.error(f"UI_BUILD: Erro ao parsear geometria ou construir info text. Sample ID: {sample_data.get('sample_id', 'N/A')}. Erro: {e}", exc_info=True)
+        app_logger.error(f"UI_BUILD: Erro ao construir info text. Sample ID: {sample_data.get('sample_id', 'N/A')}. Erro: {e}", exc_info=True)
         return html.Div(
             [
                 html.H6("Erro na Amostra", className="text-center text-danger my-3"),
@@ -112,46 +154,69 @@ def register_callbacks(app):
     Registra callbacks para exibição e atualização de dados de amostra.
     """
 
-    # Callback para atualizar opções de motivo conforme definição selecionada
-    @app.callback(
+    # Opções de motivo conforme a definição selecionada (clientside, assets/ui_callbacks.js)
+    app.clientside_callback(
+        ClientsideFunction(namespace="ui", function_name="reason_options"),
         Output("reason-select", "options"),
-        Input("definition-select", "value")
+        Input("definition-select", "value"),
+        State("ui-constants-store", "data"),
     )
-    def update_reason_options(definition):
-        app_logger.debug(f"DROPDOWN: Callback update_reason_options acionado. Definição: {definition}")
-        if not definition:
-            app_logger.warning("DROPDOWN: Definição vazia, retornando opções vazias de motivo.")
-            return []
-        options = REASONS_BY_STATUS.get(definition, [])
-        app_logger.debug(f"DROPDOWN: Retornando {len(options)} opções de motivo para definição: {definition}.")
-        return options
+
+    # Estágio único de resolução da amostra atual: uma vez por navegação (ou nova versão da
+    # tabela), busca a linha pelo índice, lê o WKT e calcula os vizinhos. Os painéis (campos
+    # de validação, informações, grid, mapa) consomem o registro em vez da tabela inteira;
+    # os vizinhos vão num store próprio, lido só pela navegação Anterior/Próximo.
+    @app.callback(
+        Output("current-sample-store", "data"),
+        Output("current-sample-neighbors-store", "data"),
+        Input("filter-id", "value"),
+        Input("sample-table-store", "data"),
+        Input("toggle-unvalidated-nav", "value"),
+        State("current-sample-store", "data"),
+        State("current-sample-neighbors-store", "data"),
+    )
+    def resolve_current_sample(sample_id, table_handle, unvalidated_nav_value, previous_record, previous_neighbors):
+        only_unvalidated = "unvalidated_only" in (unvalidated_nav_value or [])
+        record = build_current_sample_record(table_handle, sample_id) if sample_id else None
+        neighbors = build_sample_neighbors(table_handle, sample_id, only_unvalidated) if record else None
+        if sample_id and table_handle and record is None:
+            app_logger.warning(f"CURRENT_SAMPLE: Amostra {sample_id} não encontrada na tabela de dados.")
+        app_logger.debug(f"CURRENT_SAMPLE: Registro da amostra atual: {record}. Vizinhos: {neighbors}")
+        if not callback_context.triggered:
+            return record, neighbors
+        # Nova versão da tabela ou troca do toggle sem mudança nesta amostra: os painéis não
+        # precisam refazer nada; o mesmo vale para os vizinhos
+        return (
+            record if record != previous_record else no_update,
+            neighbors if neighbors != previous_neighbors else no_update,
+        )
+
+    # Callback para atualizar o painel de informações da amostra
+    @app.callback(
+        Output("sample-info", "children"),
+        Input("current-sample-store", "data"),
+    )
+    def update_sample_info(current_sample):
+        app_logger.debug(f"SAMPLE_INFO: Callback update_sample_info acionado. Amostra: {current_sample.get('sample_id') if current_sample else None}")
+        return build_info_text(current_sample)
 
     # Callback para atualizar os campos de definição e motivo da amostra selecionada
     @app.callback(
         Output("definition-select", "value"),
         Output("reason-select", "value"),
         Output("original-sample-state-store", "data"),
-        Input("filter-id", "value"),
-        Input("sample-table-store", "data"),
+        Input("current-sample-store", "data"),
     )
-    def update_sample_fields(sample_id, table_data):
+    def update_sample_fields(sample_data):
+        sample_id = sample_data.get("sample_id") if sample_data else None
         app_logger.info(f"SAMPLE_FIELDS: Callback update_sample_fields acionado. Sample ID: {sample_id}")
-        app_logger.debug(f"SAMPLE_FIELDS: table_data tipo: {type(table_data)}, len: {len(table_data) if table_data is not None else 0}")
 
         ctx = callback_context
         if not ctx.triggered:
             return no_update, no_update, {}
 
-        if (ctx.triggered[0]['prop_id'] == 'sample-table-store.data' and not table_data) or not sample_id:
-            app_logger.warning("SAMPLE_FIELDS: Nenhuma amostra ou dados da tabela para atualizar campos (ainda não carregado). Retornando None.")
-            return None, None, {}
-
-        if isinstance(table_data, pd.DataFrame):
-            table_data = table_data.to_dict("records")
-
-        sample_data = next((row for row in table_data if row.get("sample_id") == sample_id), None)
         if not sample_data:
-            app_logger.warning(f"SAMPLE_FIELDS: Amostra {sample_id} não encontrada na tabela de dados. Retornando None.")
+            app_logger.warning("SAMPLE_FIELDS: Nenhuma amostra para atualizar campos (ainda não carregada ou não encontrada). Retornando None.")
             return None, None, {}
 
         definition = sample_data.get("definition")
@@ -165,27 +230,28 @@ def register_callbacks(app):
         Output("validation-counter", "children"),
         Input("sample-table-store", "data"),
     )
-    def update_validation_counter(table_data):
+    def update_validation_counter(table_handle):
         app_logger.debug("COUNTER: Callback update_validation_counter acionado.")
-        app_logger.debug(f"COUNTER: table_data tipo: {type(table_data)}, len: {len(table_data) if table_data is not None else 0}")
 
-        if table_data is None:
-            app_logger.warning("COUNTER: Dados da tabela são None, retornando no_update.")
+        if table_handle is None:
+            app_logger.warning("COUNTER: Nenhuma tabela carregada, retornando no_update.")
             return no_update
 
-        if isinstance(table_data, pd.DataFrame):
-            table_data = table_data.to_dict("records")
+        table = get_table(table_handle)
+        app_logger.debug(f"COUNTER: {len(table)} registros na tabela.")
 
-        validation_count = sum(1 for row in table_data if isinstance(row, dict) and row.get("definition") and row.get("definition") != "UNDEFINED")
-        total_count = len(table_data)
+        # Máscara sobre os códigos da coluna definition, sem percorrer linhas
+        total_count = len(table)
+        validation_count = total_count - int(table.mask("definition", None, "", "UNDEFINED").sum())
 
         counter_text = html.P(f"Progresso: {validation_count}/{total_count} amostras validadas")
 
         app_logger.info(f"COUNTER: Contador atualizado: {validation_count}/{total_count}. Retornando.")
         return counter_text
 
-    # Callback para atualizar os textos de Definição/Motivo exibidos e adiciona highlight
-    @app.callback(
+    # Textos de Definição/Motivo exibidos e realce das escolhas alteradas (clientside, assets/ui_callbacks.js)
+    app.clientside_callback(
+        ClientsideFunction(namespace="ui", function_name="definition_reason_display"),
         Output("definition-output", "children"),
         Output("reason-output", "children"),
         Output("definition-radio-container", "className"),
@@ -193,45 +259,5 @@ def register_callbacks(app):
         Input("definition-select", "value"),
         Input("reason-select", "value"),
         Input("original-sample-state-store", "data"),
-        prevent_initial_call=False
+        State("ui-constants-store", "data"),
     )
-    def update_definition_reason_display_and_highlight(
-        current_selected_definition, current_selected_reason, original_sample_state
-    ):
-        ctx = callback_context
-        triggered_id = ctx.triggered[0]['prop_id'].split('.')[0] if ctx.triggered else 'initial_load'
-
-        app_logger.debug(f"DISPLAY_UPDATE: Callback de display de Definição/Motivo acionado. Trigger: {triggered_id}")
-        app_logger.debug(f"DISPLAY_UPDATE: Selecionado Def='{current_selected_definition}', Motivo='{current_selected_reason}'")
-        app_logger.debug(f"DISPLAY_UPDATE: Original Sample State: {original_sample_state}")
-
-        original_definition = original_sample_state.get('definition') if original_sample_state else None
-        original_reason = original_sample_state.get('reason') if original_sample_state else None
-
-        display_definition = current_selected_definition if current_selected_definition is not None else "N/A"
-        display_reason = current_selected_reason if current_selected_reason is not None else "N/A"
-
-        definition_display_text = f"Definição: {display_definition}"
-        reason_display_text = f"Motivo: {display_reason}"
-
-        base_class = "d-flex flex-column"
-        def_container_class = base_class
-        reason_container_class = base_class
-
-        if current_selected_definition != original_definition and current_selected_definition is not None:
-            def_container_class += " " + HIGHLIGHT_CLASS
-            app_logger.debug("HIGHLIGHT: Definição selecionada diferente da original. Adicionando realce.")
-
-        if current_selected_reason != original_reason and current_selected_reason is not None:
-            reason_container_class += " " + HIGHLIGHT_CLASS
-            app_logger.debug("HIGHLIGHT: Motivo selecionado diferente do original. Adicionando realce.")
-
-        if triggered_id == 'original-sample-state-store':
-            app_logger.debug("HIGHLIGHT: Estado original da amostra mudou. Removendo realces.")
-            def_container_class = base_class
-            reason_container_class = base_class
-            definition_display_text = f"Definição: {original_definition if original_definition is not None else 'N/A'}"
-            reason_display_text = f"Motivo: {original_reason if original_reason is not None else 'N/A'}"
-
-        app_logger.debug("DISPLAY_UPDATE: Textos de display e classes de highlight retornados.")
-        return definition_display_text, reason_display_text, def_container_class, reason_container_class
\ No newline at end of file
@@ -1,12 +1,13 @@
 # callbacks/table_callbacks.py
 
-import pandas as pd
-from dash import Output, Input, State, callback_context, no_update
+from dash import Output, Input, State, ClientsideFunction, callback_context, no_update
 import dash_bootstrap_components as dbc
 
-from utils.bigquery import get_dataset_table, update_sample
-from utils.constants import VISIBLE_COLUMNS
+from utils.bigquery import get_dataset_table, get_table_modified, update_sample
 from utils.logger import app_logger
+from utils.sample_store import publish_table, apply_sample_update, get_table, get_navigation
+from utils.wire_format import encode_table, encode_row, encode_row_patch
+from callbacks.map_callbacks import build_marker_patch
 
 def register_callbacks(app):
     """
@@ -16,14 +17,15 @@ def register_callbacks(app):
     # Callback para selecionar a linha da tabela ao carregar E sincronizar com filter-id
     @app.callback(
         Output("sample-table", "selectedRows"),
-        Input("sample-table", "rowData"),
+        Input("sample-table-store", "data"), # Identificador da tabela (as linhas ficam no servidor)
         Input("filter-id", "value"),
         Input("tabs", "active_tab"), # ADICIONADO: Input da aba ativa para controlar execução
         prevent_initial_call=False
     )
-    def select_row_on_table_data_or_id_change(rowData, filter_id_value, active_tab_id):
+    def select_row_on_table_data_or_id_change(table_handle, filter_id_value, active_tab_id):
+        table = get_table(table_handle)
         app_logger.debug(f"TBL_SEL: Callback select_row_on_table_data_or_id_change acionado. filter_id_value: {filter_id_value}. Aba ativa: {active_tab_id}")
-        app_logger.debug(f"TBL_SEL: rowData tipo: {type(rowData)}, len: {len(rowData) if rowData is not None else 0}")
+        app_logger.debug(f"TBL_SEL: Tabela com {len(table)} registros.")
 
         ctx = callback_context
         # MODIFICADO: Lógica de saída antecipada. Se a aba não é a da tabela E o trigger não é o filter-id.
@@ -31,35 +33,34 @@ def register_callbacks(app):
              app_logger.debug("TBL_SEL: Aba da tabela oculta e não disparado por filter-id. Retornando no_update.")
              return no_update
 
-        if not rowData:
-            app_logger.warning("TBL_SEL: rowData é None ou vazio. Não é possível selecionar uma linha.")
+        if not len(table):
+            app_logger.warning("TBL_SEL: Tabela vazia. Não é possível selecionar uma linha.")
             return []
 
-        if isinstance(rowData, pd.DataFrame):
-            rowData = rowData.to_dict("records")
-
-        selected_row_data = []
-        if filter_id_value is not None:
-            for row in rowData:
-                if row.get("sample_id") == filter_id_value:
-                    app_logger.info(f"TBL_SEL: Selecionando linha para ID: {filter_id_value} com base no filter-id.")
-                    selected_row_data = [row]
-                    break
-
-        if not selected_row_data and rowData:
+        selected_row = table.get(filter_id_value)
+        if selected_row is not None:
+            app_logger.info(f"TBL_SEL: Selecionando linha para ID: {filter_id_value} com base no filter-id.")
+        else:
             app_logger.info("TBL_SEL: Nenhuma filter_id ou ID não encontrado, ou filter_id é None. Selecionando a primeira linha da tabela.")
-            selected_row_data = [rowData[0]]
-        elif not selected_row_data and not rowData:
-            app_logger.warning("TBL_SEL: Nenhuma dado na tabela para selecionar linha.")
-            selected_row_data = []
+            selected_row = table.row(0)
+        selected_row_data = [selected_row]
 
         app_logger.debug(f"TBL_SEL: Retornando selectedRows: {selected_row_data[0].get('sample_id') if selected_row_data else 'Nenhum'}")
         return selected_row_data
 
+    # rowData do AgGrid decodificado no navegador a partir do formato compacto (assets/sample_wire.js)
+    app.clientside_callback(
+        ClientsideFunction(namespace="samples", function_name="table_rows"),
+        Output("sample-table", "rowData"),
+        Input("sample-table-wire-store", "data"),
+    )
+
     # Callback para carregar/atualizar dados da tabela (AgGrid)
     @app.callback(
         Output("sample-table-store", "data"),
-        Output("sample-table", "rowData"),
+        Output("sample-table-wire-store", "data"), # Tabela no formato compacto (rowData do AgGrid e marcadores do mapa)
+        Output("sample-table", "rowTransaction"), # Após validar/resetar: só a linha alterada
+        Output("points-layer", "children", allow_duplicate=True), # Após validar/resetar: Patch só do marcador alterado
         Output('user-feedback-alert', 'is_open', allow_duplicate=True),
         Output('user-feedback-alert', 'children', allow_duplicate=True),
         Output('user-feedback-alert', 'color', allow_duplicate=True),
@@ -68,19 +69,20 @@ def register_callbacks(app):
         Input("current-validation-table-id-store", "data"),
         Input("confirm-update-btn", "n_clicks"),
         Input("confirm-reset-btn", "n_clicks"),
+        Input("table-refresh-interval", "n_intervals"), # Verifica se outro validador alterou a tabela
         State("filter-id", "value"),
         State("definition-select", "value"),
         State("reason-select", "value"),
         State("user-id-store", "data"),
         State("team-id-store", "data"),
         State("dataset-selector", "value"),
-        State("sample-table-store", "data"), # Renomeado de current_table_data_for_next para consistência
+        State("sample-table-store", "data"), # Identificador da versão carregada da tabela
         prevent_initial_call='initial_duplicate'
     )
     def load_and_update_table_data(
-        current_full_table_id, update_clicks, reset_clicks, sample_id,
+        current_full_table_id, update_clicks, reset_clicks, refresh_intervals, sample_id,
         definition, reason, user_id, team_id, dataset_key,
-        current_table_data_stored # MODIFICADO: Nome do argumento
+        current_table_handle
     ):
         ctx = callback_context
         triggered_id = ctx.triggered[0]["prop_id"].split(".")[0] if ctx.triggered else 'initial_load_or_table_switch'
@@ -95,11 +97,23 @@ def register_callbacks(app):
 
         if not current_full_table_id and triggered_id == 'initial_load_or_table_switch':
             app_logger.warning("TABLE_DATA: Nenhum ID de tabela de validação ativa no carregamento inicial. Retornando vazios para tabela.")
-            return [], [], False, "", "secondary", no_update
-
-        should_reload_table = False 
-
-        if triggered_id == "confirm-update-btn" and update_clicks and update_clicks > 0:
+            return None, None, no_update, no_update, False, "", "secondary", no_update
+
+        should_reload_table = False
+        updated_table_handle = None # Nova versão derivada da atual após validar/resetar (sem recarregar do BigQuery)
+
+        if triggered_id == "table-refresh-interval":
+            # Só a data de modificação da tabela (metadado, sem consulta); recarrega se ela mudou
+            # desde a última carga ou gravação desta sessão
+            if not current_full_table_id or not current_table_handle:
+                return (no_update,) * 8
+            modified = get_table_modified(current_full_table_id)
+            if modified is None or modified == current_table_handle.get("modified"):
+                return (no_update,) * 8
+            app_logger.info(f"TABLE_DATA: Tabela '{current_full_table_id}' alterada no BigQuery ({current_table_handle.get('modified')} -> {modified}). Recarregando.")
+            should_reload_table = True
+
+        elif triggered_id == "confirm-update-btn" and update_clicks and update_clicks > 0:
             app_logger.info(f"TABLE_DATA: Botão 'Validar Amostra' clicado para amostra {sample_id}.")
             try:
                 if sample_id is None:
@@ -112,35 +126,30 @@ def register_callbacks(app):
                 output_alert_is_open = True
                 output_alert_children = f"✔️ Amostra {sample_id} validada!"
                 output_alert_color = "success"
-                should_reload_table = True
 
-                if current_table_data_stored:
-                    df_temp = pd.DataFrame(current_table_data_stored) 
-                    next_pending_sample_df = df_temp[
-                        (df_temp["status"] == "PENDING") & 
-                        (df_temp["sample_id"] > sample_id)
-                    ].sort_values("sample_id")
+                # Modificação após a própria gravação: a verificação periódica não recarrega por causa dela
+                modified = get_table_modified(current_full_table_id)
+                updated_table_handle = apply_sample_update(current_table_handle, sample_id, definition_str, reason_str, "VALIDATED", modified)
+                should_reload_table = updated_table_handle is None # Amostra fora da versão atual: recarrega tudo
 
-                    if not next_pending_sample_df.empty:
-                        output_go_to_next_sample_trigger = next_pending_sample_df.iloc[0]["sample_id"]
+                if current_table_handle:
+                    # Próxima PENDING com ID maior (ou a primeira restante), pelo índice de navegação
+                    next_pending_id = get_navigation(updated_table_handle or current_table_handle).next_pending(sample_id)
+                    if next_pending_id is not None:
+                        output_go_to_next_sample_trigger = next_pending_id
                         app_logger.info(f"NAV_LOGIC: Pulando para próxima amostra pendente: {output_go_to_next_sample_trigger}")
                     else:
-                        next_pending_sample_df = df_temp[df_temp["status"] == "PENDING"].sort_values("sample_id")
-                        if not next_pending_sample_df.empty:
-                            output_go_to_next_sample_trigger = next_pending_sample_df.iloc[0]["sample_id"]
-                            app_logger.info(f"NAV_LOGIC: Pulando para a primeira amostra pendente restante: {output_go_to_next_sample_trigger}")
-                        else:
-                            app_logger.info("NAV_LOGIC: Nenhuma próxima amostra pendente encontrada.")
-                            output_alert_is_open = True
-                            output_alert_children = "✅ Todas as amostras validadas!"
-                            output_alert_color = "info"
+                        app_logger.info("NAV_LOGIC: Nenhuma próxima amostra pendente encontrada.")
+                        output_alert_is_open = True
+                        output_alert_children = "✅ Todas as amostras validadas!"
+                        output_alert_color = "info"
             except Exception as e:
                 error_msg = str(e).split('message: ')[-1].split(';')[0] if 'message:' in str(e) else str(e)
                 app_logger.error(f"ERROR: Erro ao validar amostra {sample_id}. Erro: {e}", exc_info=True)
                 output_alert_is_open = True
                 output_alert_children = f"❌ Erro ao validar: {error_msg}"
                 output_alert_color = "danger"
-                return no_update, no_update, output_alert_is_open, output_alert_children, output_alert_color, no_update
+                return no_update, no_update, no_update, no_update, output_alert_is_open, output_alert_children, output_alert_color, no_update
 
         elif triggered_id == "confirm-reset-btn" and reset_clicks and reset_clicks > 0:
             app_logger.info(f"TABLE_DATA: Botão 'Resetar ID' clicado para amostra {sample_id}.")
@@ -152,38 +161,56 @@ def register_callbacks(app):
                 output_alert_is_open = True
                 output_alert_children = f"🔄 Amostra {sample_id} resetada!"
                 output_alert_color = "warning"
-                should_reload_table = True
+
+                modified = get_table_modified(current_full_table_id)
+                updated_table_handle = apply_sample_update(current_table_handle, sample_id, None, None, "PENDING", modified)
+                should_reload_table = updated_table_handle is None
             except Exception as e:
                 error_msg = str(e).split('message: ')[-1].split(';')[0] if 'message:' in str(e) else str(e)
                 app_logger.error(f"ERROR: Erro ao resetar amostra {sample_id}. Erro: {e}", exc_info=True)
                 output_alert_is_open = True
                 output_alert_children = f"❌ Erro ao resetar: {error_msg}"
                 output_alert_color = "danger"
-                return no_update, no_update, output_alert_is_open, output_alert_children, output_alert_color, no_update
+                return no_update, no_update, no_update, no_update, output_alert_is_open, output_alert_children, output_alert_color, no_update
+
+        if updated_table_handle is not None:
+            # Só a linha alterada vai ao navegador: transação do AgGrid (getRowId = sample_id),
+            # Patch do marcador no mapa e Patch da linha no formato compacto (que os
+            # decodificadores do navegador atualizam sem refazer a tabela inteira).
+            updated_table = get_table(updated_table_handle)
+            position = updated_table.position(sample_id)
+            wire_patch = encode_row_patch(get_table(current_table_handle), updated_table, position, updated_table_handle["version"])
+            row_transaction = {"update": [encode_row(updated_table, position)]}
+            markers_patch = build_marker_patch(updated_table, position)
+            app_logger.info(f"TABLE_DATA: Amostra {sample_id} atualizada na tabela do servidor (versão {updated_table_handle['version']}). Enviando só a linha alterada.")
+            return updated_table_handle, wire_patch, row_transaction, markers_patch, output_alert_is_open, output_alert_children, output_alert_color, output_go_to_next_sample_trigger
 
         if current_full_table_id and (should_reload_table or triggered_id == "current-validation-table-id-store" or triggered_id == 'initial_load_or_table_switch'):
             try:
                 app_logger.debug(f"TABLE_DATA: Buscando dados da tabela '{current_full_table_id}' do BigQuery (recarregando).")
+                modified = get_table_modified(current_full_table_id) # Antes da consulta: alterações durante ela disparam nova carga
                 df = get_dataset_table(current_full_table_id)
 
                 app_logger.debug(f"TABLE_DATA: DataFrame do BigQuery carregado. Linhas: {len(df)}. Colunas: {df.columns.tolist()}")
 
-                missing_cols = [col for col in VISIBLE_COLUMNS if col not in df.columns]
-                if missing_cols:
-                    raise ValueError(f"Colunas esperadas ausentes no DataFrame do BigQuery: {missing_cols}. Verifique VISIBLE_COLUMNS e o esquema da tabela.")
-                
-                data = df[VISIBLE_COLUMNS].to_dict("records")
+                # As linhas ficam no servidor; o store recebe só o identificador da nova versão
+                table_handle = publish_table(current_full_table_id, df, modified)
+                table = get_table(table_handle)
+
+                # Troca de tabela: se a amostra atual não está na nova versão, vai para a primeira
+                if len(table) and table.position(sample_id) is None:
+                    output_go_to_next_sample_trigger = table.first_id()
+                    app_logger.info(f"NAV_LOGIC: Amostra {sample_id} ausente da tabela '{current_full_table_id}'. Selecionando a primeira: {output_go_to_next_sample_trigger}")
 
-                app_logger.debug(f"TABLE_DATA: Dados para AgGrid formatados. Primeiro registro: {data[0] if data else 'Nenhum'}")
-                app_logger.info(f"TABLE_DATA: Dados da tabela '{current_full_table_id}' carregados/recarregados ({len(data)} registros). Retornando.")
+                app_logger.info(f"TABLE_DATA: Dados da tabela '{current_full_table_id}' carregados/recarregados ({len(table)} registros). Retornando.")
 
-                return data, data, output_alert_is_open, output_alert_children, output_alert_color, output_go_to_next_sample_trigger
+                return table_handle, encode_table(table, table_handle["version"]), no_update, no_update, output_alert_is_open, output_alert_children, output_alert_color, output_go_to_next_sample_trigger
             except Exception as e:
                 error_msg = str(e).split('message: ')[-1].split(';')[0] if 'message:' in str(e) else str(e)
                 app_logger.error(f"ERROR: Erro ao recarregar a tabela '{current_full_table_id}'. Erro: {e}", exc_info=True)
                 output_alert_is_open = True
                 output_alert_children = f"❌ Erro ao carregar tabela: {error_msg}"
                 output_alert_color = "danger"
-                return no_update, no_update, output_alert_is_open, output_alert_children, output_alert_color, no_update
+                return no_update, no_update, no_update, no_update, output_alert_is_open, output_alert_children, output_alert_color, no_update
         
-        return no_update, no_update, output_alert_is_open, output_alert_children, output_alert_color, no_update
\ No newline at end of file
+        return no_update, no_update, no_update, no_update, output_alert_is_open, output_alert_children, output_alert_color, no_update
\ No newline at end of file
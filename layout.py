@@ -5,12 +5,14 @@ from dash_ag_grid import AgGrid
 
 from utils.constants import (
     BIOMES, CLASSES, DEFINITION, VISIBLE_COLUMNS,
-    GRAPH_PANEL_HEIGHT,
-    AUXILIARY_DATASETS, YEARS_RANGE
+    GRAPH_PANEL_HEIGHT, NDVI_PROCESSING_OPTIONS, NDVI_DEFAULT_PROCESSING, GRID_VIEW_MODES, GRID_DEFAULT_VIEW_MODE, GRID_YEAR_SUBSETS, GRID_DEFAULT_YEAR_SUBSET,
+    AUXILIARY_DATASETS, MAP_LAYER_DATASET_TYPES, YEARS_RANGE, REASONS_BY_STATUS, PLOTLY_STATUS_COLORS,
+    HIGHLIGHT_CLASS, TAB_PATHS, DEFAULT_TAB, TABLE_REFRESH_INTERVAL
 )
 # Importa discover_datasets de utils.bigquery para popular o dataset-selector na inicialização
 from utils.bigquery import discover_datasets, bq_client, get_unique_column_values
 from utils.logger import app_logger
+from utils.figure_templates import build_figure
 
 # Função auxiliar para construir o texto de informações da amostra
 def build_sample_control_panel():
@@ -133,7 +135,39 @@ def build_grid_tab_content():
     """Retorna o conteúdo da aba de Avaliação (mapas de grid e gráficos)."""
     return html.Div([
         html.H3("Visualização da Amostra por grid de imagens", className="text-center mb-3"),
-        dbc.Spinner(
+        html.Div([
+            html.Label("Exibir anos como:", className="form-label fw-bold small me-2 mb-0"),
+            dbc.RadioItems(
+                id="grid-view-mode",
+                options=GRID_VIEW_MODES,
+                value=GRID_DEFAULT_VIEW_MODE,
+                inline=True,
+                className="small"
+            ),
+            html.Label("Anos:", className="form-label fw-bold small ms-3 me-2 mb-0"),
+            dbc.RadioItems(
+                id="grid-year-subset",
+                options=GRID_YEAR_SUBSETS,
+                value=GRID_DEFAULT_YEAR_SUBSET,
+                inline=True,
+                className="small"
+            ),
+            dcc.Dropdown(
+                id="grid-change-year",
+                options=[{"label": str(year), "value": year} for year in YEARS_RANGE],
+                placeholder="Ano da mudança",
+                clearable=True,
+                style={"width": "150px"},
+                className="small ms-2"
+            ),
+        ], className="d-flex align-items-center justify-content-center flex-wrap mb-2"),
+        dbc.Modal([ # Mapa interativo de um ano, aberto ao clicar numa miniatura
+            dbc.ModalHeader(dbc.ModalTitle(id="grid-live-map-title")),
+            dbc.ModalBody(id="grid-live-map-body"),
+        ], id="grid-live-map-modal", size="xl", centered=True),
+        # dcc.Loading restrito ao próprio painel: as células do grid virtualizado carregam
+        # sob demanda ao rolar a página e não devem cobrir o grid inteiro com o spinner
+        dcc.Loading(
             html.Div(id="grid-maps-panel", style={
                 "minHeight": "100px",
                 # Removido maxHeight e overflowY para evitar scrollbar interna
@@ -145,14 +179,31 @@ def build_grid_tab_content():
                 "justifyContent": "center",
                 "alignItems": "flex-start"
             }, className="border rounded p-1 mb-3"),
-            color="primary",
-            spinner_style={"width": "3rem", "height": "3rem"}
+            target_components={"grid-maps-panel": "children"},
+            color="#007bff",
+            type="circle"
         ),
+        # Cada gráfico tem o próprio spinner: é preenchido por um callback independente, que
+        # envia só os dados sobre o modelo pronto da figura
         html.Div([
-            dcc.Graph(id="ndvi-graph", style={"height": GRAPH_PANEL_HEIGHT, "width": "100%"}, config={'displayModeBar': False})
+            dbc.Checklist( # Série bruta por padrão; limpeza e suavização sob demanda
+                id="ndvi-processing-options",
+                options=NDVI_PROCESSING_OPTIONS,
+                value=NDVI_DEFAULT_PROCESSING,
+                inline=True,
+                switch=True,
+                className="small d-flex justify-content-end"
+            ),
+            dbc.Spinner(
+                dcc.Graph(id="ndvi-graph", figure=build_figure("ndvi", []), style={"height": GRAPH_PANEL_HEIGHT, "width": "100%"}, config={'displayModeBar': False}),
+                color="primary"
+            )
         ], className="card p-2 shadow-sm mb-2"), # Reduzido padding e mb-2
         html.Div([
-            dcc.Graph(id="lulc-history-graph", style={"height": GRAPH_PANEL_HEIGHT, "width": "100%"}, config={'displayModeBar': False})
+            dbc.Spinner(
+                dcc.Graph(id="lulc-history-graph", figure=build_figure("lulc", []), style={"height": GRAPH_PANEL_HEIGHT, "width": "100%"}, config={'displayModeBar': False}),
+                color="primary"
+            )
         ], className="card p-2 shadow-sm") # Reduzido padding
     ], className="grid-tab-container p-2") # Reduzido padding do container da aba
 
@@ -186,7 +237,8 @@ def build_map_tab_content():
     else:
         year_options = [{"label": "Anos Indisponíveis", "value": None}]
 
-    aux_dataset_options = [{"label": d["label"], "value": d["id"]} for d in AUXILIARY_DATASETS]
+    # Só os datasets que viram camada no mapa (os de índices espectrais são séries do grid)
+    aux_dataset_options = [{"label": d["label"], "value": d["id"]} for d in AUXILIARY_DATASETS if d["type"] in MAP_LAYER_DATASET_TYPES]
 
     return html.Div([
         html.H3("Visualização no Mapa", className="text-center mb-4"),
@@ -207,7 +259,7 @@ def build_map_tab_content():
                 dcc.Dropdown(
                     id="aux-gee-dataset-dropdown",
                     options=aux_dataset_options,
-                    value=AUXILIARY_DATASETS[0]["id"] if AUXILIARY_DATASETS else None,
+                    value=None, # Sem camada auxiliar até o analista escolher uma
                     clearable=True,
                     className="mb-2"
                 )
@@ -333,13 +385,28 @@ def build_layout(app):
     return dbc.Container(fluid=True, id="app-background", className="p-2 app-wrapper", children=[
         dcc.Location(id='url', refresh=False),
 
-        dcc.Store(id="sample-table-store", data=[]),
+        dcc.Store(id="sample-table-store", data=None), # Só o identificador da tabela; as linhas ficam no servidor (utils/sample_store.py)
+        dcc.Store(id="sample-table-wire-store", data=None), # Tabela no formato compacto do navegador (utils/wire_format.py)
+        dcc.Store(id="current-sample-store", data=None), # Registro compacto da amostra atual (resolve_current_sample)
+        dcc.Store(id="current-sample-neighbors-store", data=None), # Amostras anterior/próxima da atual (navegação)
         dcc.Store(id="current-validation-table-id-store", data=None),
+        dcc.Interval(id="table-refresh-interval", interval=TABLE_REFRESH_INTERVAL * 1000, n_intervals=0), # Verificação de alterações de outros validadores na tabela
         dcc.Store(id="user-id-store", data="usuario_teste"),
         dcc.Store(id="team-id-store", data="equipe_teste"),
         dcc.Store(id='refresh-trigger-store', data=0),
         dcc.Store(id='go-to-next-sample-trigger', data=None),
         dcc.Store(id='original-sample-state-store', data={}),
+        dcc.Store(id='prefetch-store', data=None), # Status do prefetch das próximas amostras
+        dcc.Store(id='session-id-store', storage_type='session'), # ID da aba do navegador (cancelamento de trabalho GEE obsoleto)
+        dcc.Store(id='grid-visible-years', data=None), # Células do grid que entraram/saíram da área visível (assets/grid_virtualization.js)
+        # Tabelas de apoio dos callbacks clientside (assets/ui_callbacks.js), enviadas uma única vez com o layout
+        dcc.Store(id='ui-constants-store', data={
+            "reasons_by_status": REASONS_BY_STATUS,
+            "plotly_status_colors": PLOTLY_STATUS_COLORS,
+            "highlight_class": HIGHLIGHT_CLASS,
+            "tab_paths": TAB_PATHS,
+            "default_tab": DEFAULT_TAB,
+        }),
 
 
         # Modais de Confirmação (mantidos como estão, são funcionais)
@@ -0,0 +1,67 @@
+import pandas as pd
+
+from utils.sample_navigation import NavigationIndex
+from utils.sample_table import SampleTable
+
+def _index(statuses):
+    """Índice de uma tabela com sample_id 1..n e os status informados."""
+    n = len(statuses)
+    table = SampleTable.from_dataframe(pd.DataFrame({
+        "sample_id": list(range(1, n + 1)),
+        "biome_name": ["Cerrado"] * n,
+        "class_name": ["Pasto"] * n,
+        "status": statuses,
+        "definition": [None] * n,
+        "reason": [None] * n,
+        "geometry": [f"POINT({-50 + i} -10)" for i in range(n)],
+    }))
+    return NavigationIndex.from_table(table)
+
+def test_next_and_previous_wrap_around():
+    index = _index(["PENDING", "VALIDATED", "PENDING", "VALIDATED"])
+    assert index.next_id(1) == 2
+    assert index.next_id(4) == 1
+    assert index.previous_id(2) == 1
+    assert index.previous_id(1) == 4
+
+def test_only_unvalidated_mode():
+    index = _index(["PENDING", "VALIDATED", "PENDING", "VALIDATED", "UNDEFINED"])
+    assert index.next_id(1, only_unvalidated=True) == 3
+    assert index.next_id(5, only_unvalidated=True) == 1
+    assert index.previous_id(1, only_unvalidated=True) == 5
+    assert index.previous_id(3, only_unvalidated=True) == 1
+    # Amostra fora da lista (acabou de ser validada): vai para a primeira/última
+    assert index.next_id(2, only_unvalidated=True) == 1
+    assert index.previous_id(2, only_unvalidated=True) == 5
+
+def test_empty_lists_return_current():
+    index = _index(["VALIDATED", "VALIDATED"])
+    assert index.next_id(1, only_unvalidated=True) == 1
+    assert index.previous_id(2, only_unvalidated=True) == 2
+    assert index.next_pending(1) is None
+
+def test_next_pending_wraps_around():
+    index = _index(["PENDING", "VALIDATED", "PENDING", "VALIDATED", "UNDEFINED"])
+    assert index.next_pending(None) == 1
+    assert index.next_pending(1) == 3
+    assert index.next_pending(2) == 3
+    assert index.next_pending(3) == 1
+    assert index.next_pending(5) == 1
+
+def test_with_status_moves_only_the_changed_sample():
+    index = _index(["PENDING", "VALIDATED", "PENDING"])
+    updated = index.with_status(3, "PENDING", "VALIDATED")
+    assert updated.unvalidated == [1]
+    assert updated.pending == [1]
+    assert updated.ids is index.ids
+    assert index.pending == [1, 3] # O índice de origem não muda
+
+    reset = updated.with_status(2, "VALIDATED", "PENDING")
+    assert reset.unvalidated == [1, 2]
+    assert reset.pending == [1, 2]
+    assert reset.next_pending(1) == 2
+
+def test_following_skips_current():
+    index = _index(["PENDING", "VALIDATED", "PENDING", "PENDING"])
+    assert index.following(3, 2) == [4, 1]
+    assert index.following(4, 5, only_unvalidated=True) == [1, 3]
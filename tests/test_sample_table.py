@@ -0,0 +1,78 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from utils.sample_table import SampleTable
+
+def _dataframe():
+    return pd.DataFrame({
+        "sample_id": [30, 10, 20],
+        "biome_name": ["Cerrado", "Amazônia", None],
+        "class_name": ["Pasto", "Floresta", "Pasto"],
+        "status": ["PENDING", "VALIDATED", "PENDING"],
+        "definition": [None, "Floresta", None],
+        "reason": [None, "Mudança", None],
+        "geometry": ["POINT(-47.5 -15.25)", None, "POINT (-60 -3)"],
+    })
+
+def test_from_dataframe_keeps_wkt_and_decodes_points():
+    table = SampleTable.from_dataframe(_dataframe())
+    assert len(table) == 3
+    assert table.get(30) == {
+        "sample_id": 30, "biome_name": "Cerrado", "class_name": "Pasto", "status": "PENDING",
+        "definition": None, "reason": None, "lat": -15.25, "lon": -47.5, "geometry": "POINT(-47.5 -15.25)",
+    }
+    missing = table.get(10)
+    assert missing["lat"] is None and missing["lon"] is None and missing["geometry"] is None
+    assert table.get(20)["geometry"] == "POINT (-60 -3)"
+
+def test_position_uses_table_order():
+    table = SampleTable.from_dataframe(_dataframe())
+    assert table.position(30) == 0
+    assert table.position(10) == 1
+    assert table.position("20") == 2
+    assert table.position(99) is None
+    assert table.position(None) is None
+    assert table.position("abc") is None
+    assert SampleTable.empty().position(1) is None
+
+def test_with_values_copies_only_changed_row():
+    table = SampleTable.from_dataframe(_dataframe())
+    position = table.position(20)
+    updated = table.with_values(position, status="VALIDATED", definition="Nova classe", reason=None)
+
+    assert updated.get(20)["status"] == "VALIDATED"
+    assert updated.get(20)["definition"] == "Nova classe" # Categoria que não existia
+    assert updated.get(20)["reason"] is None
+    assert updated.get(30) == table.get(30)
+    # A versão de origem não muda
+    assert table.get(20)["status"] == "PENDING"
+    assert table.get(20)["definition"] is None
+    # Colunas não alteradas e índice de busca são compartilhados
+    assert updated.sample_ids is table.sample_ids
+    assert updated.geometry is table.geometry
+    assert updated.categoricals["biome_name"] is table.categoricals["biome_name"]
+
+def test_save_load_round_trip():
+    table = SampleTable.from_dataframe(_dataframe())
+    table = table.with_values(table.position(30), status="VALIDATED", definition="Categoria nova", reason="Outra")
+
+    buffer = io.BytesIO()
+    table.save(buffer)
+    buffer.seek(0)
+    loaded = SampleTable.load(buffer)
+
+    assert len(loaded) == len(table)
+    for sample_id in (10, 20, 30):
+        assert loaded.get(sample_id) == table.get(sample_id)
+    assert loaded.get(10)["geometry"] is None
+    for column, categorical in table.categoricals.items():
+        assert loaded.categoricals[column].categories.tolist() == categorical.categories.tolist()
+        np.testing.assert_array_equal(loaded.categoricals[column].codes, categorical.codes)
+
+def test_save_load_empty_table():
+    buffer = io.BytesIO()
+    SampleTable.empty().save(buffer)
+    buffer.seek(0)
+    assert len(SampleTable.load(buffer)) == 0
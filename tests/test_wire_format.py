@@ -0,0 +1,80 @@
+import copy
+
+import pandas as pd
+
+from utils.sample_table import SampleTable
+from utils.wire_format import encode_row, encode_row_patch, encode_table
+
+def _table():
+    return SampleTable.from_dataframe(pd.DataFrame({
+        "sample_id": [1, 2, 3, 4],
+        "biome_name": ["Cerrado", "Amazônia", "Cerrado", None],
+        "class_name": ["Pasto"] * 4,
+        "status": ["PENDING", "VALIDATED", "PENDING", "PENDING"],
+        "definition": [None, "Floresta", None, None],
+        "reason": [None, None, None, None],
+        "geometry": ["POINT(-47 -15)", "POINT(-60 -3)", None, "POINT(-50.5 -10.25)"],
+    }))
+
+def _apply_patch(data, patch):
+    """Aplica as operações de um dash.Patch (as usadas por encode_row_patch) como o navegador."""
+    data = copy.deepcopy(data)
+    for operation in patch.to_plotly_json()["operations"]:
+        *path, last = operation["location"]
+        target = data
+        for key in path:
+            target = target[key]
+        value = operation["params"]["value"]
+        if operation["operation"] == "Assign":
+            target[last] = value
+        elif operation["operation"] == "Extend":
+            target[last].extend(value)
+        else:
+            raise AssertionError(f"Operação inesperada: {operation['operation']}")
+    return data
+
+def _decode(wire):
+    """Linhas do formato compacto, como assets/sample_wire.js."""
+    columns = wire["columns"]
+    rows = []
+    for i in range(wire["length"]):
+        row = {name: columns[name][i] for name in ("sample_id", "lat", "lon", "geometry")}
+        for name, encoded in columns.items():
+            if isinstance(encoded, dict):
+                row[name] = encoded["values"][encoded["codes"][i]]
+        rows.append(row)
+    return rows
+
+def test_encode_table_round_trips_rows():
+    table = _table()
+    wire = encode_table(table, "v1")
+    assert wire["base"] == wire["revision"] == "v1"
+    assert wire["columns"]["geometry"] == ["POINT(-47 -15)", "POINT(-60 -3)", None, "POINT(-50.5 -10.25)"]
+    assert _decode(wire) == [table.row(position) for position in range(len(table))]
+
+def test_encode_row_sends_original_wkt():
+    table = _table()
+    assert encode_row(table, 3)["geometry"] == "POINT(-50.5 -10.25)"
+    assert encode_row(table, 2)["geometry"] is None
+
+def test_row_patch_matches_full_encoding():
+    previous = _table()
+    wire = encode_table(previous, "v1")
+
+    # Valores já existentes, categoria nova e volta para null, em versões encadeadas
+    updates = [
+        (0, {"status": "VALIDATED", "definition": "Floresta", "reason": None}),
+        (2, {"status": "VALIDATED", "definition": "Classe nova", "reason": "Motivo novo"}),
+        (1, {"status": "PENDING", "definition": None, "reason": None}),
+    ]
+    for revision, (position, values) in enumerate(updates, start=2):
+        updated = previous.with_values(position, **values)
+        patch = encode_row_patch(previous, updated, position, f"v{revision}")
+        wire = _apply_patch(wire, patch)
+
+        expected = encode_table(updated, "v1")
+        assert wire["columns"] == expected["columns"]
+        assert wire["updated"] == position
+        assert wire["revision"] == f"v{revision}"
+        assert wire["base"] == "v1"
+        previous = updated
@@ -62,6 +62,19 @@ def get_dataset_table(full_table_id):
         app_logger.error(f"DB_FETCH: Erro ao consultar tabela '{full_table_id}': {str(e)}", exc_info=True)
         raise
 
+def get_table_modified(full_table_id):
+    """
+    Retorna o instante da última modificação da tabela (metadado do BigQuery, em ISO 8601),
+    sem consultar as linhas. Usado para saber se outra sessão alterou a tabela carregada.
+    Retorna None se o metadado não puder ser lido.
+    """
+    try:
+        modified = bq_client.get_table(full_table_id).modified
+        return modified.isoformat() if modified else None
+    except Exception as e:
+        app_logger.warning(f"DB_FETCH: Não foi possível ler a data de modificação da tabela '{full_table_id}': {e}")
+        return None
+
 def get_validation_timestamps(full_table_id):
     """
     Busca apenas os timestamps de validação de uma tabela BigQuery.
@@ -1,18 +1,99 @@
 # utils/constants.py
 
 import datetime
+import os
 
 YEARS_RANGE = range(1985, 2023)
 
 # Colunas visíveis padrão para exibição em tabelas AgGrid
 VISIBLE_COLUMNS = ["sample_id", "biome_name", "class_name", "status", "definition", "reason", "geometry"]
+# Colunas categóricas da tabela de amostras: códigos em memória (utils/sample_table.py) e
+# dicionário no formato enviado ao navegador (utils/wire_format.py)
+SAMPLE_CATEGORICAL_COLUMNS = ["biome_name", "class_name", "status", "definition", "reason"]
 
 HIGHLIGHT_CLASS = "radio-selection-changed"
 
+# Abas da aplicação e caminho da URL de cada uma (roteamento clientside, assets/ui_callbacks.js)
+TAB_PATHS = {"tab-grid": "/avaliacao", "tab-table": "/tabela", "tab-map": "/mapa"}
+DEFAULT_TAB = "tab-grid"
+
 # Configurações para o grid de mini-mapas na aba de Avaliação
 GRID_DEFAULT_COLS = 5 # Aumentado para 5 para aproveitar o espaço lateral
 GRID_TILE_SIZE = 150   # Pixels, tamanho de cada tile/mini-mapa (DIMINUÍDO AINDA MAIS)
 GRAPH_PANEL_HEIGHT = "25vh" # Altura do painel do gráfico (Mais compacto)
+GRID_MAP_ZOOM = 14 # Zoom dos mini-mapas do grid (também usado para aquecer o cache de tiles)
+GRID_KNOWN_YEARS_CACHE_SIZE = 512 # Pontos cujos anos com mosaico ficam disponíveis sem bloquear o painel de mapas
+GRID_AVAILABILITY_TIMEOUT = 2 # Segundos que o painel de mapas espera pelo payload (anos com mosaico) antes de exibir todos os anos
+
+# Mosaicos anuais do MapBiomas (grid e mapa principal)
+MOSAIC_COLLECTION = "projects/nexgenmap/MapBiomas2/LANDSAT/BRAZIL/mosaics-2"
+MOSAIC_VIS_BANDS = ("swir1_median", "nir_median", "red_median")
+MOSAIC_VIS_GAIN = (0.08, 0.06, 0.2)
+MOSAIC_VIS_GAMMA = 0.85
+
+# Modo "filmstrip" do grid: uma miniatura estática (getThumbURL) por ano
+GRID_VIEW_MODES = [
+    {"label": "Miniaturas", "value": "chips"},
+    {"label": "Mapas interativos", "value": "maps"},
+    {"label": "Time-lapse", "value": "timelapse"},
+]
+GRID_DEFAULT_VIEW_MODE = "chips"
+GRID_CHIP_BUFFER_M = 750 # Raio (m) em torno da amostra coberto por cada miniatura (~zoom 14)
+GRID_YEAR_SUBSETS = [
+    {"label": "Todos", "value": "all"},
+    {"label": "A cada 5 anos", "value": "step"},
+    {"label": "Em torno da mudança", "value": "change"},
+]
+GRID_DEFAULT_YEAR_SUBSET = "all"
+GRID_YEAR_STEP = 5 # Intervalo do recorte "A cada 5 anos"
+GRID_CHANGE_WINDOW = 3 # Anos antes/depois do ano da mudança suspeita
+GRID_LAZY_OVERSCAN_PX = 300 # Margem (px) além da área visível em que as células do grid já carregam
+TIMELAPSE_DIMENSIONS = 360 # Pixels do maior lado da animação do modo time-lapse
+TIMELAPSE_FPS = 2 # Quadros (anos) por segundo da animação
+TIMELAPSE_FETCH_TIMEOUT = 90 # Segundos para o GEE gerar e entregar a animação
+TIMELAPSE_MAX_FRAMES = 40 # Anos aceitos por animação na rota /timelapse (acima disso: HTTP 400)
+
+# Proxy local de tiles GEE (cache LRU em disco, ver utils/tile_cache.py)
+TILE_CACHE_DIR = os.environ.get("TILE_CACHE_DIR", "tile_cache")
+TILE_CACHE_MAX_BYTES = int(os.environ.get("TILE_CACHE_MAX_BYTES", 1024 * 1024 * 1024)) # 1 GB
+TILE_CACHE_MAX_AGE = 7 * 24 * 3600 # Segundos para o header Cache-Control dos tiles servidos
+TILE_FETCH_TIMEOUT = 15 # Segundos para baixar um tile do GEE
+
+# Resolução paralela de URLs de mosaico (getMapId) no GEE
+GEE_MAX_WORKERS = 8 # Máximo de chamadas simultâneas ao GEE por fan-out
+GEE_CALL_TIMEOUT = 20 # Segundos de espera por cada chamada antes de desistir do ano
+
+# Governador das chamadas ao GEE (utils/gee_governor.py), compartilhado por todo o processo
+GEE_MAX_CONCURRENT = int(os.environ.get("GEE_MAX_CONCURRENT", 10)) # Chamadas simultâneas no processo
+GEE_RATE_PER_SEC = float(os.environ.get("GEE_RATE_PER_SEC", 10)) # Taxa sustentada (token bucket)
+GEE_RATE_BURST = 20 # Rajada máxima acima da taxa sustentada
+GEE_MAX_RETRIES = 4 # Novas tentativas após 429/cota excedida
+GEE_BACKOFF_BASE = 0.5 # Segundos; dobra a cada tentativa (com jitter)
+GEE_BACKOFF_MAX = 8 # Teto (s) de cada espera de backoff
+GEE_REQUEST_TIMEOUT = 60 # Prazo (s) de todo o trabalho GEE de uma requisição (ex: uma amostra no grid)
+GEE_BACKGROUND_MAX_CONCURRENT = 2 # Das vagas globais, quantas o trabalho em segundo plano (prefetch) pode ocupar
+GEE_BACKGROUND_MIN_TOKENS = GEE_RATE_BURST // 2 # Tokens de taxa que o segundo plano deixa para a amostra atual
+
+# Gravação/reprodução offline das respostas do GEE (utils/gee_replay.py)
+GEE_MODE = os.environ.get("GEE_MODE", "live").lower() # "live", "record" ou "replay"
+GEE_FIXTURES_DIR = os.environ.get("GEE_FIXTURES_DIR", "gee_fixtures")
+GEE_REPLAY_LATENCY_MS = float(os.environ.get("GEE_REPLAY_LATENCY_MS", 0)) # Latência sintética por chamada em replay
+GEE_REPLAY_JITTER_MS = float(os.environ.get("GEE_REPLAY_JITTER_MS", 0)) # Variação (±) da latência sintética
+
+# Prefetch em segundo plano das próximas amostras da fila de navegação
+PREFETCH_AHEAD = 3 # Quantas amostras à frente aquecer
+PREFETCH_MAX_WORKERS = 4 # Threads dedicadas ao prefetch; no GEE usam a cota de segundo plano do governador
+
+# Descoberta de datasets/versões no BigQuery (callbacks/main_sync_callbacks.py)
+DISCOVERY_CACHE_TTL = 300 # Segundos em que as listas de datasets e de versões ficam em cache
+DISCOVERY_CACHE_DIR = os.environ.get("DISCOVERY_CACHE_DIR", "discovery_cache") # Geração compartilhada pelos workers (invalidação)
+
+# Tabela de amostras no servidor (utils/sample_store.py); o navegador guarda só um identificador
+SAMPLE_STORE_MEMORY_VERSIONS = 8 # Versões de tabela mantidas em memória por processo
+SAMPLE_STORE_DIR = os.environ.get("SAMPLE_STORE_DIR", "sample_store") # Compartilhado pelos workers, fora do cache de tiles
+SAMPLE_STORE_DISK_VERSIONS = 256 # Arquivos de versão mantidos em disco por tabela (os mais antigos são apagados)
+SAMPLE_STORE_MAX_DELTAS = 32 # Versões derivadas gravadas só como a linha alterada antes de uma nova cópia completa
+TABLE_REFRESH_INTERVAL = 60 # Segundos entre verificações de alterações de outras sessões na tabela (metadado do BigQuery)
 
 # Estilo CSS inline para o contêiner do grid de mini-mapas
 GRID_STYLE = {
@@ -160,6 +241,55 @@ PLOTLY_STATUS_COLORS = {
     "UNDEFINED": "#6c757d" # Cor secondary do Bootstrap
 }
 
+# Cores de texto dos gráficos do grid por tema (utils/figure_templates.py)
+FIGURE_THEME_COLORS = {
+    "light": {"font": "black"},
+    "dark": {"font": "#e9ecef"},
+}
+
+# Motor de séries temporais espectrais (utils/gee_timeseries.py)
+SPECTRAL_INDICES = ["NDVI", "EVI", "NBR"]
+SPECTRAL_SENSORS = {
+    "modis": {
+        "label": "MODIS (MOD13Q1)",
+        "collections": ["MODIS/061/MOD13Q1"],
+        "scale": 250,
+        "first_year": 2000,
+    },
+    "landsat": {
+        "label": "Landsat 5/7/8/9 (C2 L2)",
+        "collections": [
+            "LANDSAT/LT05/C02/T1_L2", "LANDSAT/LE07/C02/T1_L2",
+            "LANDSAT/LC08/C02/T1_L2", "LANDSAT/LC09/C02/T1_L2",
+        ],
+        "scale": 30,
+        "first_year": 1985,
+    },
+    "sentinel2": {
+        "label": "Sentinel-2 (L2A)",
+        "collections": ["COPERNICUS/S2_SR_HARMONIZED"],
+        "scale": 10,
+        "first_year": 2017,
+    },
+}
+GRID_SPECTRAL_SENSORS = ("modis",) # Sensores buscados junto com o payload da amostra no grid
+
+# Processamento das séries antes do gráfico (utils/series_processing.py)
+# O gráfico NDVI mostra por padrão a série bruta (só reduzida por LTTB); a remoção de ruído
+# de nuvem e a suavização são opções do analista (checklist "ndvi-processing-options")
+NDVI_PROCESSING_OPTIONS = [
+    {"label": "Remover ruído de nuvem", "value": "outliers"},
+    {"label": "Suavizar", "value": "smooth"},
+]
+NDVI_DEFAULT_PROCESSING = [] # Série bruta
+NDVI_SMOOTHING = "savgol" # Suavização aplicada com a opção "smooth": "savgol" ou "whittaker"
+NDVI_SG_WINDOW = 7 # Observações na janela Savitzky–Golay (~3,5 meses no MOD13Q1)
+NDVI_SG_ORDER = 2
+NDVI_WHITTAKER_LAMBDA = 10
+NDVI_OUTLIER_WINDOW = 5 # Janela da mediana móvel para detectar ruído de nuvem
+NDVI_OUTLIER_K = 3.0 # Desvios robustos (MAD) acima dos quais a observação é descartada
+NDVI_MAX_POINTS = 300 # Pontos enviados ao navegador (LTTB)
+
 # Caminho do asset LULC padrão no GEE
 LULC_ASSET = "projects/mapbiomas-public/assets/brazil/lulc/collection9/mapbiomas_collection90_integration_v1"
 
@@ -171,7 +301,27 @@ AUXILIARY_DATASETS = [
         "label": "NDVI MODIS",
         "type": "index",
         "years": list(range(2000, 2024)),
-        "get_data_function": "get_modis_ndvi",
+        "sensor": "modis",
+        "indices": ["NDVI", "EVI", "NBR"],
+        "get_data_function": "get_spectral_series",
+    },
+    {
+        "id": "landsat_indices",
+        "label": "Índices Landsat (NDVI/EVI/NBR)",
+        "type": "index",
+        "years": list(range(1985, 2024)),
+        "sensor": "landsat",
+        "indices": ["NDVI", "EVI", "NBR"],
+        "get_data_function": "get_spectral_series",
+    },
+    {
+        "id": "sentinel2_indices",
+        "label": "Índices Sentinel-2 (NDVI/EVI/NBR)",
+        "type": "index",
+        "years": list(range(2017, 2024)),
+        "sensor": "sentinel2",
+        "indices": ["NDVI", "EVI", "NBR"],
+        "get_data_function": "get_spectral_series",
     },
     {
         "id": "lulc",
@@ -181,4 +331,8 @@ AUXILIARY_DATASETS = [
         "years": list(range(1985, 2024)),
         "get_data_function": "get_lulc_mapbiomas",
     }
-]
\ No newline at end of file
+]
+
+# Tipos de dataset auxiliar com camada de tiles no mapa principal (update_gee_layers).
+# Os de tipo "index" são séries temporais de um ponto (gráficos do grid), sem camada no mapa.
+MAP_LAYER_DATASET_TYPES = ("lulc",)
@@ -0,0 +1,123 @@
+# figure_templates.py
+#
+# Modelos prontos dos gráficos NDVI e histórico LULC do grid.
+# O layout (eixos, margens, títulos, cores) é montado uma única vez por tema e fica em
+# cache; por amostra só mudam os traces. As figuras são dicts simples (sem plotly.express
+# nem validação de graph_objects), e os callbacks do grid enviam ao navegador apenas um
+# Patch com os dados e o título (data_patch), ou só as cores na troca de tema (theme_patch).
+#
+
+import copy
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from dash import Patch
+
+from utils.constants import CLASS_INFO, FIGURE_THEME_COLORS
+
+NDVI_TITLE = "NDVI Temporal"
+LULC_TITLE = "Histórico de Uso e Cobertura da Terra"
+MISSING_DATA_SUFFIX = " (Dados Ausentes)"
+
+_CLASS_BY_ID = {c["id"]: c for c in CLASS_INFO}
+
+@lru_cache(maxsize=None)
+def _ndvi_layout(theme):
+    colors = FIGURE_THEME_COLORS[theme]
+    return {
+        "title": {"text": NDVI_TITLE, "font": {"color": colors["font"]}, "x": 0.5, "xanchor": "center"},
+        "xaxis": {"title": {"text": "Data"}, "type": "date", "showgrid": False},
+        "yaxis": {"title": {"text": "NDVI"}, "range": [-1, 1], "showgrid": False},
+        "showlegend": False,
+        "plot_bgcolor": "rgba(0,0,0,0)",
+        "paper_bgcolor": "rgba(0,0,0,0)",
+        "font": {"color": colors["font"]},
+        "autosize": True,
+        "height": 300,
+        "margin": {"l": 40, "r": 10, "t": 40, "b": 40},
+    }
+
+@lru_cache(maxsize=None)
+def _lulc_layout(theme):
+    colors = FIGURE_THEME_COLORS[theme]
+    return {
+        "title": {"text": LULC_TITLE, "font": {"color": colors["font"]}, "x": 0.5, "xanchor": "center", "y": 0.95, "yanchor": "top"},
+        "xaxis": {"title": {"text": "Ano"}, "showticklabels": True, "showgrid": False, "dtick": 1},
+        "yaxis": {"showticklabels": False, "showgrid": False, "range": [0.5, 1.5]},
+        "showlegend": False,
+        "plot_bgcolor": "rgba(0,0,0,0)",
+        "paper_bgcolor": "rgba(0,0,0,0)",
+        "font": {"color": colors["font"]},
+        "autosize": True,
+        "height": 180,
+        "margin": {"l": 10, "r": 10, "t": 40, "b": 10},
+    }
+
+_LAYOUTS = {"ndvi": (_ndvi_layout, NDVI_TITLE), "lulc": (_lulc_layout, LULC_TITLE)}
+
+def ndvi_traces(df):
+    """Trace da série NDVI (DataFrame ['time', 'NDVI']); lista vazia se não houver dados."""
+    if df is None or df.empty or 'time' not in df.columns or 'NDVI' not in df.columns:
+        return []
+    return [{
+        "type": "scatter",
+        "mode": "lines",
+        # Datas como "AAAA-MM-DD" e valores com 4 casas: o JSON enviado fica bem menor
+        "x": np.datetime_as_string(pd.to_datetime(df["time"]).to_numpy(), unit="D"),
+        "y": np.round(df["NDVI"].to_numpy(dtype=np.float64), 4),
+        "line": {"color": "#2a9fd6"},
+        "hovertemplate": "<b>%{x|%Y-%m-%d}</b><br>NDVI: %{y:.2f}<extra></extra>",
+    }]
+
+def lulc_traces(pixel_values, years):
+    """
+    Trace do histórico LULC: um quadrado por ano, na cor da classe MapBiomas.
+    pixel_values vem do reduceRegion ({'classification_<ano>': id_da_classe}).
+    """
+    xs, colors, names = [], [], []
+    for year in years:
+        class_value = pixel_values.get(f'classification_{year}', None)
+        if class_value is None:
+            continue
+        class_info = _CLASS_BY_ID.get(class_value)
+        xs.append(year)
+        colors.append(class_info["color"] if class_info else "#808080")
+        names.append(f"{class_info['name'] if class_info else 'Desconhecido'} ({class_value})")
+    if not xs:
+        return []
+    return [{
+        "type": "scatter",
+        "mode": "markers",
+        "x": xs,
+        "y": [1] * len(xs),
+        "marker": {"size": 12, "symbol": "square", "color": colors},
+        "hovertext": names,
+        "hovertemplate": "<b>%{hovertext}</b><br>Ano: %{x}<extra></extra>",
+    }]
+
+def _title_for(kind, traces):
+    title = _LAYOUTS[kind][1]
+    return title if traces else title + MISSING_DATA_SUFFIX
+
+def build_figure(kind, traces, theme="light"):
+    """Figura completa (dict) de um gráfico ("ndvi" ou "lulc"), a partir do modelo do tema."""
+    layout_builder = _LAYOUTS[kind][0]
+    layout = copy.deepcopy(layout_builder(theme)) # O modelo em cache nunca é alterado
+    layout["title"]["text"] = _title_for(kind, traces)
+    return {"data": traces, "layout": layout}
+
+def data_patch(kind, traces):
+    """Patch que troca só os dados e o título de um gráfico já montado no navegador."""
+    patch = Patch()
+    patch["data"] = traces
+    patch["layout"]["title"]["text"] = _title_for(kind, traces)
+    return patch
+
+def theme_patch(theme):
+    """Patch que troca só as cores do tema de um gráfico já montado no navegador."""
+    colors = FIGURE_THEME_COLORS.get(theme, FIGURE_THEME_COLORS["light"])
+    patch = Patch()
+    patch["layout"]["font"]["color"] = colors["font"]
+    patch["layout"]["title"]["font"]["color"] = colors["font"]
+    return patch
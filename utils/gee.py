@@ -7,168 +7,131 @@
 #
 
 import ee
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from utils.constants import AUXILIARY_DATASETS, CLASS_INFO
+from utils.constants import (
+    AUXILIARY_DATASETS, CLASS_INFO, GEE_CALL_TIMEOUT,
+    MOSAIC_COLLECTION, MOSAIC_VIS_BANDS, MOSAIC_VIS_GAIN, MOSAIC_VIS_GAMMA,
+    GRID_TILE_SIZE, GRID_CHIP_BUFFER_M, TIMELAPSE_DIMENSIONS, TIMELAPSE_FPS
+)
 from utils.logger import app_logger
+from utils.gee_governor import evaluate, GEEGovernorError
+from utils.figure_templates import build_figure, ndvi_traces, lulc_traces
+from utils.gee_replay import is_replay_mode
+from utils.gee_timeseries import (
+    build_spectral_regions, decode_spectral_region, get_spectral_series, spectral_series_to_dataframe
+)
 import traceback
 import functools # ADICIONADO: Importar functools para caching
+import threading
+from collections import OrderedDict
 
 # Inicializa a API do Google Earth Engine
-try:
-    ee.Initialize(project='mapbiomas-brazil')
-    app_logger.info("GEE_INIT: Google Earth Engine inicializado com sucesso.")
-except Exception as e:
-    app_logger.critical(f"GEE_INIT: Erro ao inicializar Google Earth Engine: {str(e)}", exc_info=True)
-    # Se a inicialização do GEE falhar, a aplicação não pode funcionar corretamente.
-    # É melhor levantar o erro para que a aplicação falhe e o problema seja investigado.
-    raise RuntimeError(f"Falha ao inicializar GEE: {e}")
-
-@functools.lru_cache(maxsize=512) # ADICIONADO: Cache para resultados do NDVI
-def get_modis_ndvi(start_year, end_year, coordinates):
-    """
-    Tenta obter uma série temporal de NDVI de forma mais robusta e depurável.
-    """
-    # MODIFICADO: Garante que o start_year para MODIS não seja anterior a 2000
-    modis_start_year = max(2000, start_year)
-    modis_end_year = end_year # Mantém o end_year recebido
-
-    app_logger.info(f"GEE_FETCH: Iniciando busca de NDVI MODIS para {coordinates} de {modis_start_year} a {modis_end_year}.")
+if is_replay_mode():
+    # Respostas vêm das fixtures gravadas (utils/gee_replay.py): sem credenciais nem rede
+    app_logger.info("GEE_INIT: GEE_MODE=replay. ee.Initialize ignorado; respostas servidas das fixtures.")
+else:
     try:
-        # 1. Definir o ponto GEE
-        point = ee.Geometry.Point(coordinates)
-
-        # 2. Definir o intervalo de datas
-        start_date = f'{modis_start_year}-01-01'
-        end_date = f'{(modis_end_year)}-12-31' # Para incluir o ano final completo
-
-        # 3. Carregar e filtrar a coleção MODIS (MOD13Q1)
-        modis_collection = ee.ImageCollection("MODIS/061/MOD13Q1")
-        filtered_collection = modis_collection.filterDate(start_date, end_date).filterBounds(point) # Adicionado filterBounds
-        app_logger.debug("GEE_FETCH: ee.ImageCollection MODIS/061/MOD13Q1 obtida e filtrada.")
-
-        # Opcional: Contar quantas imagens existem na coleção filtrada
-        num_images = filtered_collection.size().getInfo()
-        app_logger.debug(f"GEE_FETCH: Número de imagens na coleção filtrada: {num_images}")
-        if num_images == 0:
-            app_logger.warning(f"GEE_FETCH: Nenhuma imagem MODIS encontrada para {coordinates} no período {modis_start_year}-{modis_end_year}. Retornando DataFrame vazio.") # MODIFICADO: Log mais específico
-            return pd.DataFrame(columns=['time', 'NDVI'])
-
-
-        # 4. Amostrar a coleção sem máscaras ou processamentos complexos no início, apenas selecionar a banda NDVI
-
-        def get_single_ndvi_value(image):
-            # Obtém o NDVI e aplica o fator de escala (0.0001)
-            ndvi_value = image.select('NDVI').multiply(0.0001)
-            # Adiciona propriedades de tempo para o getRegion
-            return ndvi_value.set('system:time_start', image.get('system:time_start'))
-
-
-        # Processa a coleção e amostra
-        processed_col = filtered_collection.map(get_single_ndvi_value).select('NDVI')
-        app_logger.debug("GEE_FETCH: Coleção processada (apenas escala NDVI) e pronta para getRegion.")
-
-
-        # 5. Obter a série temporal do ponto
-        # Aumentar o scale para 250m é razoável (resolução nativa do MODIS/MOD13Q1)
-        app_logger.debug("GEE_FETCH: Chamando getRegion para GEE. Isso pode demorar.")
-        ndvi_time_series_raw = processed_col.getRegion(point, 250).getInfo()
-        app_logger.debug(f"GEE_FETCH: getRegion executado. Dados GEE brutos (primeiras 5 linhas): {ndvi_time_series_raw[:5] if ndvi_time_series_raw else 'Vazio'}")
-        if ndvi_time_series_raw and len(ndvi_time_series_raw) > 1:
-            app_logger.debug(f"GEE_FETCH: Dados GEE brutos COMPLETO (primeira e última linha): {ndvi_time_series_raw[0]} ... {ndvi_time_series_raw[-1]}")
-        else:
-            app_logger.debug(f"GEE_FETCH: Dados GEE brutos COMPLETO: {ndvi_time_series_raw}")
-        
-        if not ndvi_time_series_raw or len(ndvi_time_series_raw) <= 1:
-            app_logger.warning("GEE_FETCH: NDVI MODIS obteve dados vazios ou apenas cabeçalho do GEE após getRegion. Retornando DataFrame vazio.")
-            return pd.DataFrame(columns=['time', 'NDVI'])
-
-        # 6. Converter para DataFrame
-        headers = ndvi_time_series_raw[0]
-        data = ndvi_time_series_raw[1:]
-        df = pd.DataFrame(data, columns=headers)
-
-        # Remover colunas desnecessárias e renomear 'time'
-        if 'time' in df.columns:
-            df['time'] = pd.to_datetime(df['time'], unit='ms')
-        if 'NDVI' in df.columns:
-            # Forçar a conversão para numérico antes de dropna
-            df['NDVI'] = pd.to_numeric(df['NDVI'], errors='coerce')
-
-        # Filtrar apenas as colunas necessárias e remover NaNs
-        df = df[['time', 'NDVI']].dropna(subset=['NDVI'])
+        ee.Initialize(project='mapbiomas-brazil')
+        app_logger.info("GEE_INIT: Google Earth Engine inicializado com sucesso.")
+    except Exception as e:
+        app_logger.critical(f"GEE_INIT: Erro ao inicializar Google Earth Engine: {str(e)}", exc_info=True)
+        # Se a inicialização do GEE falhar, a aplicação não pode funcionar corretamente.
+        # É melhor levantar o erro para que a aplicação falhe e o problema seja investigado.
+        raise RuntimeError(f"Falha ao inicializar GEE: {e}")
 
-        app_logger.debug(f"GEE_FETCH: DataFrame final de NDVI criado. Linhas: {len(df)}. Primeiras 5: \n{df.head()}")
+    # Prazo HTTP de cada requisição e sem novas tentativas internas do cliente ee:
+    # as novas tentativas (com backoff) ficam a cargo do governador (utils/gee_governor.py).
+    ee.data.setDeadline(GEE_CALL_TIMEOUT * 1000)
+    ee.data.setMaxRetries(0)
 
-        if df.empty:
-            app_logger.warning("GEE_FETCH: DataFrame de NDVI está vazio após conversão e dropna (todos os valores foram None/NaN).")
-            return pd.DataFrame(columns=['time', 'NDVI'])
+def _url_cache(maxsize):
+    """
+    Cache LRU das URLs geradas no GEE. Como functools.lru_cache, memoriza só resultados
+    (exceções nunca ficam no cache), mas expõe evict(*args) para descartar uma única entrada,
+    ex: quando o proxy descobre que a URL daquele ano/ponto expirou.
+    """
+    def decorator(func):
+        lock = threading.Lock()
+        entries = OrderedDict()
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            with lock:
+                if args in entries:
+                    entries.move_to_end(args)
+                    return entries[args]
+            value = func(*args)
+            with lock:
+                entries[args] = value
+                entries.move_to_end(args)
+                while len(entries) > maxsize:
+                    entries.popitem(last=False)
+            return value
+
+        def evict(*args):
+            with lock:
+                entries.pop(args, None)
+
+        wrapper.evict = evict
+        return wrapper
+    return decorator
 
+def get_modis_ndvi(start_year, end_year, coordinates):
+    """
+    Série temporal de NDVI MODIS (MOD13Q1, mascarada por SummaryQA) de um ponto.
+    Mantida por compatibilidade: usa o motor de séries espectrais (utils/gee_timeseries.py),
+    cujo cache também atende EVI/NBR do mesmo ponto.
 
-        app_logger.info(f"GEE_FETCH: NDVI MODIS obtido com {len(df)} pontos.")
-        return df
+    Parâmetros:
+    - start_year, end_year (int): Período desejado (MODIS começa em 2000).
+    - coordinates (tuple): (latitude, longitude) do ponto.
 
-    except Exception as e:
-        app_logger.error(f"GEE_FETCH: Erro crítico em get_modis_ndvi: {str(e)}.", exc_info=True)
-        return pd.DataFrame(columns=['time', 'NDVI'])
+    Retorno:
+    - DataFrame com as colunas 'time' e 'NDVI'.
+    """
+    latitude, longitude = coordinates
+    series = get_spectral_series(latitude, longitude, ("modis",), max(2000, start_year), end_year)
+    df = spectral_series_to_dataframe(series.get("modis"), "NDVI")
+    app_logger.info(f"GEE_FETCH: NDVI MODIS obtido com {len(df)} pontos para {coordinates}.")
+    return df
 
-def plot_ndvi_series(df):
+def plot_ndvi_series(df, theme="light"):
     """
-        Plota uma série temporal do NDVI. Cores de fundo serão controladas pelo CSS.
+        Plota uma série temporal do NDVI a partir do modelo pronto do tema
+        (utils/figure_templates.py): só o trace é montado a cada chamada.
 
         Parâmetros:
         - df (DataFrame): DataFrame com as colunas 'time' e 'NDVI'.
+        - theme (str): "light" ou "dark".
 
         Retorno:
-        - fig (Figure): Gráfico interativo Plotly.
+        - fig (dict): Figura Plotly.
     """
-    app_logger.debug("PLOT_NDVI: Gerando gráfico NDVI.")
-    if df.empty or 'time' not in df.columns or 'NDVI' not in df.columns:
+    traces = ndvi_traces(df)
+    if not traces:
         app_logger.warning("PLOT_NDVI: DataFrame vazio ou inválido para plotar NDVI.")
-        return {
-            "data": [],
-            "layout": {
-                "title": {"text": "NDVI Temporal (Dados Ausentes)", "font": {"color": "gray"}},
-                "xaxis": {"title": "Data", "showgrid": False},
-                "yaxis": {"title": "NDVI", "showgrid": False, "range": [-1, 1]},
-                "height": 300,
-                "autosize": True,
-                "margin": {"l": 40, "r": 20, "t": 50, "b": 50},
-                # Cores de fundo para tema claro (serão sobrescritas pelo CSS para dark)
-                "plot_bgcolor": "white",
-                "paper_bgcolor": "white",
-                "font": {"color": "black"}
-            }
-        }
-
-    fig = px.line(df, x="time", y="NDVI", labels={"time": "Data", "NDVI": "NDVI"})
-    fig.update_yaxes(range=[-1, 1])
-
-    fig.update_layout(
-        xaxis_title="Data",
-        yaxis_title="NDVI",
-        showlegend=False,
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        font=dict(color="black"),
-        autosize=True,
-        height=300,
-        margin=dict(l=40, r=10, t=40, b=40),
-        transition_duration=300,
-        title=dict(
-            font=dict(color="black"),
-            x=0.5, xanchor="center",
-        )
+    return build_figure("ndvi", traces, theme)
+
+def _get_mosaic_image(year, bands=MOSAIC_VIS_BANDS, gain=MOSAIC_VIS_GAIN, gamma=MOSAIC_VIS_GAMMA):
+    """Mosaico anual do MapBiomas já visualizado (RGB) com os parâmetros padrão do app."""
+    mosaic = (
+        ee.ImageCollection(MOSAIC_COLLECTION)
+        .filterMetadata("year", "equals", year)
+        .median()
     )
-    fig.update_traces(line=dict(color="#2a9fd6"))
-    fig.update_traces(hovertemplate="<b>%{x|%Y-%m-%d}</b><br>NDVI: %{y:.2f}")
 
-    app_logger.info("PLOT_NDVI: Gráfico NDVI gerado com sucesso.")
-    return fig
+    vis_params = {
+        "bands": list(bands),
+        "gain": list(gain),
+        "gamma": gamma,
+    }
+    return mosaic.visualize(**vis_params)
+
+def _request_mosaic_tile_url(year, bands, gain, gamma):
+    map_id_dict = ee.data.getMapId({"image": _get_mosaic_image(year, bands, gain, gamma)})
+    return map_id_dict["tile_fetcher"].url_format
 
-@functools.lru_cache(maxsize=128) # ADICIONADO: Cache para URLs de mosaicos
-def get_mosaic_url(year, bands=["swir1_median", "nir_median", "red_median"], gain=[0.08, 0.06, 0.2], gamma=0.85):
+@_url_cache(maxsize=128) # ADICIONADO: Cache para URLs de mosaicos
+def get_mosaic_url(year, bands=MOSAIC_VIS_BANDS, gain=MOSAIC_VIS_GAIN, gamma=MOSAIC_VIS_GAMMA):
     """
     Gera a URL dos tiles para visualizar mosaicos do MapBiomas com base no ano e parâmetros de visualização.
 
@@ -180,64 +143,153 @@ def get_mosaic_url(year, bands=["swir1_median", "nir_median", "red_median"], gai
 
     Retorno:
     - tile_url (str): URL do mosaico em formato de tiles para visualização.
+
+    Erros são repassados (e não memorizados no cache): a próxima chamada tenta de novo.
     """
     try:
-        mosaic = (
-            ee.ImageCollection("projects/nexgenmap/MapBiomas2/LANDSAT/BRAZIL/mosaics-2")
-            .filterMetadata("year", "equals", year)
-            .median()
-        )
-
-        vis_params = {
-            "bands": bands,
-            "gain": gain,
-            "gamma": gamma,
-        }
-
-        mosaic_vis = mosaic.visualize(**vis_params)
-        map_id_dict = ee.data.getMapId({"image": mosaic_vis})
-        tile_url = map_id_dict["tile_fetcher"].url_format
+        tile_url = evaluate("mosaic.getMapId", _request_mosaic_tile_url, year, bands, gain, gamma)
 
         app_logger.debug(f"GEE_MOSAIC_URL: URL do mosaico para ano {year} gerada: {tile_url[:60]}...") # ADICIONADO: Log de depuração
         return tile_url
+    except GEEGovernorError:
+        raise # Falha transitória: não pode ficar memorizada no cache
     except Exception as e:
         app_logger.error(f"GEE_MOSAIC_URL: Erro ao gerar URL do mosaico para ano {year}: {str(e)}", exc_info=True)
-        return ""
+        raise
+
+def _request_mosaic_chip_url(year, latitude, longitude):
+    point = ee.Geometry.Point([longitude, latitude])
+    region = point.buffer(GRID_CHIP_BUFFER_M).bounds()
+    return _get_mosaic_image(year).getThumbURL({
+        "region": region,
+        "dimensions": GRID_TILE_SIZE,
+        "format": "png",
+    })
+
+@_url_cache(maxsize=1024)
+def get_mosaic_chip_url(year, latitude, longitude):
+    """
+    Gera a URL de uma miniatura (getThumbURL) do mosaico de um ano, centrada no ponto.
+    Usada pelo modo "filmstrip" do grid: uma única imagem PNG por ano em vez de um mapa Leaflet.
 
-@functools.lru_cache(maxsize=128) # ADICIONADO: Cache para URLs de LULC MapBiomas
-def get_lulc_mapbiomas_url(year):
+    Parâmetros:
+    - year (int): Ano do mosaico.
+    - latitude, longitude (float): Centro da miniatura.
+
+    Retorno:
+    - thumb_url (str): URL da imagem PNG. Erros são repassados (sem ficar no cache).
     """
-    Gera a URL dos tiles para visualizar o mapa de Uso e Cobertura da Terra do MapBiomas.
+    try:
+        thumb_url = evaluate("chip.getThumbURL", _request_mosaic_chip_url, year, latitude, longitude)
+        app_logger.debug(f"GEE_MOSAIC_CHIP: URL da miniatura do mosaico {year} para ({latitude}, {longitude}) gerada.")
+        return thumb_url
+    except GEEGovernorError:
+        raise # Falha transitória: não pode ficar memorizada no cache
+    except Exception as e:
+        app_logger.error(f"GEE_MOSAIC_CHIP: Erro ao gerar miniatura do mosaico {year} para ({latitude}, {longitude}): {str(e)}", exc_info=True)
+        raise
+
+def _request_mosaic_timelapse_url(years, latitude, longitude):
+    point = ee.Geometry.Point([longitude, latitude])
+    region = point.buffer(GRID_CHIP_BUFFER_M).bounds()
+    # Um quadro por ano, na ordem pedida, com a mesma visualização dos mapas e miniaturas
+    frames = ee.ImageCollection([_get_mosaic_image(year) for year in years])
+    return frames.getVideoThumbURL({
+        "region": region,
+        "dimensions": TIMELAPSE_DIMENSIONS,
+        "framesPerSecond": TIMELAPSE_FPS,
+        "format": "gif",
+    })
+
+@_url_cache(maxsize=256)
+def get_mosaic_timelapse_url(years, latitude, longitude):
+    """
+    Gera a URL de uma animação GIF (getVideoThumbURL) dos mosaicos de vários anos, centrada
+    no ponto. Usada pelo modo "time-lapse" do grid: um único download no lugar de uma
+    imagem ou mapa por ano.
+
+    Parâmetros:
+    - years (tuple): Anos, na ordem dos quadros.
+    - latitude, longitude (float): Centro da animação.
+
+    Retorno:
+    - video_url (str): URL do GIF. Erros são repassados (sem ficar no cache).
     """
     try:
-        lulc_asset_path = next((d["gee_lulc_asset"] for d in AUXILIARY_DATASETS if d["id"] == "lulc"), None)
+        video_url = evaluate("timelapse.getVideoThumbURL", _request_mosaic_timelapse_url, years, latitude, longitude)
+        app_logger.debug(f"GEE_MOSAIC_TIMELAPSE: URL do time-lapse ({len(years)} quadros) para ({latitude}, {longitude}) gerada.")
+        return video_url
+    except GEEGovernorError:
+        raise # Falha transitória: não pode ficar memorizada no cache
+    except Exception as e:
+        app_logger.error(f"GEE_MOSAIC_TIMELAPSE: Erro ao gerar time-lapse para ({latitude}, {longitude}): {str(e)}", exc_info=True)
+        raise
 
-        if not lulc_asset_path:
-            app_logger.error("GEE_LULC_URL: Caminho do asset LULC não encontrado em AUXILIARY_DATASETS.")
-            return ""
+def _request_lulc_tile_url(lulc_asset_path, year):
+    lulc_image = ee.Image(lulc_asset_path).select(f'classification_{year}')
+
+    palette = [c["color"] for c in CLASS_INFO]
+
+    class_ids = [c["id"] for c in CLASS_INFO]
+    min_class_id = min(class_ids) if class_ids else 0
+    max_class_id = max(class_ids) if class_ids else 100
 
-        lulc_image = ee.Image(lulc_asset_path).select(f'classification_{year}')
+    vis_params = {
+        'min': min_class_id,
+        'max': max_class_id,
+        'palette': palette
+    }
 
-        palette = [c["color"] for c in CLASS_INFO]
+    map_id_dict = ee.data.getMapId({"image": lulc_image, 'vis_params': vis_params})
+    return map_id_dict['tile_fetcher'].url_format
 
-        class_ids = [c["id"] for c in CLASS_INFO]
-        min_class_id = min(class_ids) if class_ids else 0
-        max_class_id = max(class_ids) if class_ids else 100
+@_url_cache(maxsize=128) # ADICIONADO: Cache para URLs de LULC MapBiomas
+def get_lulc_mapbiomas_url(year):
+    """
+    Gera a URL dos tiles para visualizar o mapa de Uso e Cobertura da Terra do MapBiomas.
+    Erros são repassados (e não memorizados no cache): a próxima chamada tenta de novo.
+    """
+    try:
+        lulc_asset_path = next((d["gee_lulc_asset"] for d in AUXILIARY_DATASETS if d["id"] == "lulc"), None)
 
-        vis_params = {
-            'min': min_class_id,
-            'max': max_class_id,
-            'palette': palette
-        }
+        if not lulc_asset_path:
+            raise ValueError("Caminho do asset LULC não encontrado em AUXILIARY_DATASETS.")
 
-        map_id_dict = ee.data.getMapId({"image": lulc_image, 'vis_params': vis_params})
-        tile_url = map_id_dict['tile_fetcher'].url_format
+        tile_url = evaluate("lulc.getMapId", _request_lulc_tile_url, lulc_asset_path, year)
         app_logger.debug(f"GEE_LULC_URL: URL do LULC para ano {year} gerada: {tile_url[:60]}...") # ADICIONADO: Log de depuração
         return tile_url
+    except GEEGovernorError:
+        raise # Falha transitória: não pode ficar memorizada no cache
     except Exception as e:
         app_logger.error(f"GEE_LULC_URL: Erro ao gerar URL do mapa LULC para ano {year}: {str(e)}", exc_info=True)
-        return ""
+        raise
+
 
+def build_land_use_history_figure(pixel_values, years, theme="light"):
+    """
+    Monta o gráfico de histórico de uso e cobertura da terra a partir dos valores de pixel
+    já obtidos do GEE ({'classification_<ano>': id_da_classe}), sobre o modelo pronto do tema.
+
+    Parâmetros:
+    - pixel_values (dict): Resultado do reduceRegion sobre as bandas classification_<ano>.
+    - years (iterable): Anos a exibir.
+    - theme (str): "light" ou "dark".
+    """
+    traces = lulc_traces(pixel_values, years)
+    if not traces:
+        app_logger.warning("PLOT_LULC_HISTORY: Histórico de uso da terra vazio após processamento.")
+    return build_figure("lulc", traces, theme)
+
+def _request_lulc_pixel_values(lulc_asset, latitude, longitude, years):
+    lulc_map = ee.Image(lulc_asset)
+    point = ee.Geometry.Point([longitude, latitude])
+    bands = [f'classification_{year}' for year in years]
+
+    return lulc_map.select(bands).reduceRegion(
+        reducer=ee.Reducer.first(),
+        geometry=point,
+        scale=30
+    ).getInfo()
 
 @functools.lru_cache(maxsize=512) # ADICIONADO: Cache para histórico de uso da terra
 def plot_land_use_history(lulc_asset, latitude, longitude, years):
@@ -249,113 +301,105 @@ def plot_land_use_history(lulc_asset, latitude, longitude, years):
     - lulc_asset (str): Caminho do asset de uso e cobertura da terra no Google Earth Engine.
     - latitude (float): Latitude do ponto de interesse.
     - longitude (float): Longitude do ponto de interesse.
-    - years (list): Lista de anos disponíveis para análise.
-    - class_info (list): Lista de dicionários contendo 'id', 'name' e 'color' para as classes de uso e cobertura da terra.
+    - years (tuple): Anos disponíveis para análise (tupla, por causa do lru_cache).
+
+    Exceções:
+    - Erros do GEE são registrados e repassados; só figuras válidas ficam memorizadas no lru_cache.
     """
     app_logger.info(f"PLOT_LULC_HISTORY: Gerando gráfico de histórico de uso da terra para {latitude}, {longitude}.")
     try:
-        lulc_map = ee.Image(lulc_asset)
-        point = ee.Geometry.Point([longitude, latitude])
-        bands = [f'classification_{year}' for year in years]
-
-        pixel_values = lulc_map.select(bands).reduceRegion(
-            reducer=ee.Reducer.first(),
-            geometry=point,
-            scale=30
-        ).getInfo()
-
-        class_info_df = pd.DataFrame(CLASS_INFO)
-
-        data = []
-        for year in years:
-            class_value = pixel_values.get(f'classification_{year}', None)
-            if class_value is not None:
-                # Encontra a classe pelo ID
-                matching_class = class_info_df[class_info_df['id'] == class_value]
-                if not matching_class.empty:
-                    class_name = matching_class['name'].iloc[0]
-                    class_color = matching_class['color'].iloc[0]
-                    data.append({
-                        'year': year,
-                        'pixel_value': class_value,
-                        'class_name': class_name,
-                        'category': str(class_value),
-                        'color': class_color
-                    })
-                else:
-                    app_logger.warning(f"PLOT_LULC_HISTORY: Classe ID {class_value} para ano {year} não encontrada em class_info.", extra={"details": {"class_id": class_value, "year": year}})
-                    data.append({
-                        'year': year,
-                        'pixel_value': class_value,
-                        'class_name': "Desconhecido",
-                        'category': str(class_value),
-                        'color': "#808080"
-                    })
-
-        df = pd.DataFrame(data)
-
-        if df.empty:
-             app_logger.warning("PLOT_LULC_HISTORY: DataFrame de histórico de uso da terra vazio após processamento.")
-             return {
-                "data": [],
-                "layout": {
-                    "title": {"text": "Histórico de Uso da Terra (Dados Ausentes)", "font": {"color": "gray"}},
-                    "xaxis": {"title": "Ano"},
-                    "yaxis": {"title": ""},
-                    "height": 180,
-                    "autosize": True,
-                    "margin": {"l": 10, "r": 10, "t": 40, "b": 10},
-                    "plot_bgcolor": "rgba(0,0,0,0)",
-                    "paper_bgcolor": "rgba(0,0,0,0)",
-                    "font": {"color": "gray"}
-                }
-            }
-
-        color_map = dict(zip(df['category'], df['color']))
-
-        fig = px.scatter(
-            df,
-            x='year',
-            y=[1] * len(df),
-            color='category',
-            hover_name="class_name",
-            color_discrete_map=color_map,
-            labels={'x': 'Ano', 'y': ''},
-            title="Histórico de Uso e Cobertura da Terra"
-        )
+        pixel_values = evaluate("lulc.reduceRegion", _request_lulc_pixel_values, lulc_asset, latitude, longitude, tuple(years))
 
-        fig.update_traces(marker=dict(size=12, symbol="square"))
-        fig.update_layout(
-            showlegend=False,
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font=dict(color="black"),
-            xaxis=dict(showticklabels=True, showgrid=False, dtick=1),
-            yaxis=dict(showticklabels=False, showgrid=False, range=[0.5, 1.5]),
-            autosize=True,
-            height=180,
-            margin=dict(l=10, r=10, t=40, b=10),
-            title=dict(
-                font=dict(color="black"),
-                x=0.5, xanchor="center",
-                y=0.95, yanchor='top'
-            )
-        )
-        app_logger.info("PLOT_LULC_HISTORY: Gráfico de histórico de uso da terra gerado com sucesso.")
-        return fig
+        return build_land_use_history_figure(pixel_values, years)
+    except GEEGovernorError:
+        raise # Falha transitória: não pode ficar memorizada no lru_cache
     except Exception as e:
         app_logger.error(f"PLOT_LULC_HISTORY: Erro ao gerar gráfico de histórico de uso da terra: {str(e)}", exc_info=True)
-        return {
-            "data": [],
-            "layout": {
-                "title": {"text": "Histórico de Uso da Terra (Dados Ausentes)", "font": {"color": "gray"}},
-                "xaxis": {"title": "Ano"},
-                "yaxis": {"title": ""},
-                "height": 180,
-                "autosize": True,
-                "margin": {"l": 10, "r": 10, "t": 40, "b": 10},
-                "plot_bgcolor": "rgba(0,0,0,0)",
-                "paper_bgcolor": "rgba(0,0,0,0)",
-                "font": {"color": "gray"}
-            }
-        }
\ No newline at end of file
+        raise
+
+def _build_sample_payload(latitude, longitude, lulc_asset, spectral_sensors, spectral_years, lulc_years, mosaic_years):
+    """
+    Monta (sem avaliar) um único ee.Dictionary com tudo que o grid precisa de uma amostra:
+    - 'spectral': {sensor: getRegion} com os índices espectrais (ver utils/gee_timeseries.py);
+    - 'lulc': {'classification_<ano>': id_da_classe} no ponto;
+    - 'mosaic_years': anos com mosaico do MapBiomas cobrindo o ponto.
+    """
+    point = ee.Geometry.Point([longitude, latitude])
+
+    # Séries espectrais (NDVI, EVI, NBR) já mascaradas por qualidade no servidor
+    spectral_regions = build_spectral_regions(point, spectral_sensors, min(spectral_years), max(spectral_years))
+
+    # Trajetória LULC. Seleciona só as bandas que existem no asset para que um ano ausente
+    # não derrube o payload inteiro.
+    lulc_map = ee.Image(lulc_asset)
+    lulc_bands = lulc_map.bandNames().filter(
+        ee.Filter.inList('item', [f'classification_{year}' for year in lulc_years])
+    )
+    lulc_values = lulc_map.select(lulc_bands).reduceRegion(
+        reducer=ee.Reducer.first(),
+        geometry=point,
+        scale=30
+    )
+
+    # Disponibilidade dos mosaicos anuais no ponto
+    mosaic_available = (
+        ee.ImageCollection(MOSAIC_COLLECTION)
+        .filter(ee.Filter.inList("year", list(mosaic_years)))
+        .filterBounds(point)
+        .aggregate_array("year")
+        .distinct()
+    )
+
+    return ee.Dictionary({
+        "spectral": spectral_regions,
+        "lulc": lulc_values,
+        "mosaic_years": mosaic_available,
+    })
+
+def _request_sample_payload(*payload_args):
+    return _build_sample_payload(*payload_args).getInfo()
+
+@functools.lru_cache(maxsize=512)
+def get_sample_payload(latitude, longitude, lulc_asset, spectral_sensors, spectral_years, lulc_years, mosaic_years):
+    """
+    Busca em uma única ida ao GEE (um getInfo) as séries espectrais, o histórico LULC e a
+    disponibilidade de mosaicos por ano de uma amostra, já decodificados.
+
+    Parâmetros:
+    - latitude, longitude (float): Ponto da amostra.
+    - lulc_asset (str): Asset LULC do MapBiomas.
+    - spectral_sensors (tuple): Sensores de SPECTRAL_SENSORS a incluir (ex: ("modis",)).
+    - spectral_years, lulc_years, mosaic_years (tuple): Anos de cada componente (tuplas, por causa do lru_cache).
+
+    Retorno:
+    - dict com 'spectral' ({sensor: arrays float32 por índice}), 'ndvi' (DataFrame ['time', 'NDVI']
+      do primeiro sensor, para plot_ndvi_series), 'lulc' (valores de pixel para
+      build_land_use_history_figure) e 'mosaic_years' (frozenset de anos disponíveis).
+      Levanta GEEGovernorError se o governador desistir da chamada e repassa os demais erros
+      do GEE; em nenhum dos casos o erro fica memorizado no lru_cache.
+    """
+    app_logger.info(f"GEE_PAYLOAD: Buscando payload combinado (índices espectrais, LULC, mosaicos) para ({latitude}, {longitude}).")
+    try:
+        payload = evaluate(
+            "sample.payload", _request_sample_payload,
+            latitude, longitude, lulc_asset, spectral_sensors, spectral_years, lulc_years, mosaic_years
+        )
+    except GEEGovernorError:
+        raise # Falha transitória: não pode ficar memorizada no lru_cache
+    except Exception as e:
+        app_logger.error(f"GEE_PAYLOAD: Erro ao buscar payload combinado para ({latitude}, {longitude}): {str(e)}", exc_info=True)
+        raise
+
+    spectral_raw = payload.get("spectral") or {}
+    spectral = {sensor: decode_spectral_region(spectral_raw.get(sensor)) for sensor in spectral_sensors}
+    result = {
+        "spectral": spectral,
+        "ndvi": spectral_series_to_dataframe(spectral.get(spectral_sensors[0]) if spectral_sensors else None, "NDVI"),
+        "lulc": payload.get("lulc") or {},
+        "mosaic_years": frozenset(int(y) for y in payload.get("mosaic_years") or []),
+    }
+    app_logger.debug(
+        f"GEE_PAYLOAD: Payload decodificado: {len(result['ndvi'])} pontos NDVI, "
+        f"{len(result['lulc'])} anos LULC, {len(result['mosaic_years'])}/{len(mosaic_years)} mosaicos disponíveis."
+    )
+    return result
@@ -0,0 +1,329 @@
+# gee_governor.py
+#
+# "Governador" das chamadas ao Google Earth Engine. Toda avaliação no GEE (getInfo,
+# getMapId, getThumbURL...) passa por evaluate(), que aplica:
+# - um limite global de chamadas simultâneas no processo (GEE_MAX_CONCURRENT);
+# - limitação de taxa por token bucket (GEE_RATE_PER_SEC, rajadas até GEE_RATE_BURST);
+# - novas tentativas com backoff exponencial e jitter quando o GEE responde 429/cota;
+# - um prazo por chamada, que inclui a espera na fila e os backoffs.
+# Também mantém contadores (fila, em andamento, throttles...) expostos em /gee/stats.
+#
+# Trabalho em segundo plano (background_scope, usado pelo prefetch) tem prioridade menor: ocupa
+# no máximo GEE_BACKGROUND_MAX_CONCURRENT das vagas globais e só consome tokens de taxa enquanto
+# sobrarem mais de GEE_BACKGROUND_MIN_TOKENS no bucket; abaixo disso a chamada é adiada
+# (GEEDeferredError) em vez de esperar, deixando a taxa para a amostra atual.
+#
+# Cancelamento: o trabalho GEE de uma requisição (ex: a amostra exibida no grid) roda sob
+# um RequestToken ligado a uma "geração" por sessão. Quando a sessão inicia uma requisição
+# mais nova no mesmo escopo (o analista clicou em Próximo de novo), o token antigo passa a
+# estar cancelado e as chamadas restantes dele são puladas em evaluate().
+#
+# Em GEE_MODE "record"/"replay" (utils/gee_replay.py), evaluate() grava/reproduz as respostas
+# usando o rótulo e os argumentos da chamada como chave. Por isso func deve receber só
+# valores simples (números, strings, tuplas) e montar os objetos ee internamente.
+#
+
+import contextlib
+import contextvars
+import itertools
+import random
+import threading
+import time
+
+from flask import jsonify
+
+from utils.constants import (
+    GEE_CALL_TIMEOUT, GEE_MAX_CONCURRENT, GEE_RATE_PER_SEC, GEE_RATE_BURST,
+    GEE_MAX_RETRIES, GEE_BACKOFF_BASE, GEE_BACKOFF_MAX, GEE_REQUEST_TIMEOUT,
+    GEE_BACKGROUND_MAX_CONCURRENT, GEE_BACKGROUND_MIN_TOKENS
+)
+from utils.logger import app_logger
+from utils.gee_replay import is_record_mode, is_replay_mode, record_fixture, replay_fixture
+
+class GEEGovernorError(Exception):
+    """Chamada ao GEE não realizada por decisão do governador (prazo ou cota)."""
+
+class GEETimeoutError(GEEGovernorError):
+    """O prazo da chamada acabou antes de ela conseguir ser feita (fila, taxa ou backoff)."""
+
+class GEEThrottledError(GEEGovernorError):
+    """O GEE continuou respondendo 429/cota excedida após todas as novas tentativas."""
+
+class GEECancelledError(GEEGovernorError):
+    """A requisição dona da chamada foi substituída por uma mais nova ou passou do prazo."""
+
+class GEEDeferredError(GEEGovernorError):
+    """Chamada em segundo plano adiada: a taxa disponível fica para as requisições em primeiro plano."""
+
+# Trechos de mensagem que indicam limitação de taxa/cota (o cliente ee converte os
+# erros HTTP em ee.EEException, então a detecção é pelo texto)
+_THROTTLE_MARKERS = (
+    "429", "too many requests", "too many concurrent", "quota exceeded",
+    "rate limit", "resource_exhausted", "resource exhausted",
+)
+
+_slots = threading.BoundedSemaphore(GEE_MAX_CONCURRENT)
+_background_slots = threading.BoundedSemaphore(GEE_BACKGROUND_MAX_CONCURRENT)
+
+_bucket_lock = threading.Lock()
+_tokens = float(GEE_RATE_BURST)
+_last_refill = time.monotonic()
+
+_stats_lock = threading.Lock()
+_stats = {
+    "queued": 0,      # Chamadas aguardando vaga ou token
+    "in_flight": 0,   # Chamadas em execução no GEE
+    "calls": 0,       # Chamadas concluídas com sucesso
+    "throttled": 0,   # Respostas 429/cota recebidas
+    "retries": 0,     # Novas tentativas após throttle
+    "timeouts": 0,    # Chamadas abandonadas por prazo
+    "failures": 0,    # Chamadas que terminaram em erro
+    "cancelled": 0,   # Chamadas puladas por pertencerem a uma requisição obsoleta
+    "deferred": 0,    # Chamadas em segundo plano adiadas por falta de taxa
+}
+
+# Geração atual de cada (sessão, escopo), quantas requisições dele ainda estão em execução e
+# token da requisição em execução na thread/contexto. As gerações vêm de um contador global
+# (nunca se repetem), e a entrada de (sessão, escopo) é removida quando a última requisição
+# dele termina: os dicts não crescem com sessões encerradas.
+_generations_lock = threading.Lock()
+_generations = {}
+_active_requests = {}
+_generation_counter = itertools.count(1)
+_current_token = contextvars.ContextVar("gee_request_token", default=None)
+_background = contextvars.ContextVar("gee_background", default=False)
+
+class RequestToken:
+    """
+    Identifica uma requisição de uma sessão. Fica cancelado quando a mesma sessão inicia
+    outra requisição no mesmo escopo ou quando o prazo da requisição acaba.
+    """
+
+    def __init__(self, key, generation, deadline):
+        self.key = key
+        self.generation = generation
+        self.deadline = deadline
+
+    @property
+    def superseded(self):
+        """A sessão já iniciou uma requisição mais nova no mesmo escopo."""
+        if self.key is None:
+            return False # Sessão ainda sem ID: nada a comparar
+        with _generations_lock:
+            current = _generations.get(self.key)
+        # Sem entrada: nenhuma requisição do escopo em execução, logo nenhuma mais nova
+        return current is not None and current != self.generation
+
+    @property
+    def cancelled(self):
+        return self.superseded or time.monotonic() >= self.deadline
+
+def begin_request(session_id, scope, timeout=GEE_REQUEST_TIMEOUT):
+    """
+    Inicia uma nova geração para (sessão, escopo), cancelando a anterior, e retorna o token dela.
+    O token deve ser usado em request_scope(), que encerra a requisição ao sair do bloco.
+    Sem session_id (store ainda não preenchido), o token só expira pelo prazo: requisições de
+    abas diferentes nunca se cancelam entre si.
+    """
+    if session_id is None:
+        return RequestToken(None, next(_generation_counter), time.monotonic() + timeout)
+    key = (session_id, scope)
+    with _generations_lock:
+        generation = next(_generation_counter)
+        _generations[key] = generation
+        _active_requests[key] = _active_requests.get(key, 0) + 1
+    return RequestToken(key, generation, time.monotonic() + timeout)
+
+def _finish_request(token):
+    """Encerra a requisição; a última do escopo a terminar remove a entrada de (sessão, escopo)."""
+    if token.key is None:
+        return
+    with _generations_lock:
+        remaining = _active_requests.get(token.key, 0) - 1
+        if remaining > 0:
+            _active_requests[token.key] = remaining
+        else:
+            _active_requests.pop(token.key, None)
+            _generations.pop(token.key, None)
+
+@contextlib.contextmanager
+def request_scope(token):
+    """
+    Executa o bloco com o token como requisição corrente das chamadas evaluate() e encerra a
+    requisição ao sair. Verifique token.superseded dentro do bloco: depois dele, a entrada do
+    escopo pode já ter sido removida.
+    """
+    reset_token = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset_token)
+        _finish_request(token)
+
+@contextlib.contextmanager
+def background_scope():
+    """Executa o bloco com as chamadas ao GEE em prioridade de segundo plano (ex: prefetch)."""
+    reset_token = _background.set(True)
+    try:
+        yield
+    finally:
+        _background.reset(reset_token)
+
+def submit_in_context(executor, func, *args, **kwargs):
+    """executor.submit que leva junto o token corrente (contextvars) para a thread do pool."""
+    return executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+
+def _check_cancelled(label):
+    token = _current_token.get()
+    if token is not None and token.cancelled:
+        _count("cancelled")
+        raise GEECancelledError(f"'{label}': requisição obsoleta, chamada ao GEE pulada.")
+
+def _count(key, delta=1):
+    with _stats_lock:
+        _stats[key] += delta
+
+def is_throttle_error(error):
+    """Indica se a exceção do GEE corresponde a limitação de taxa ou cota excedida."""
+    message = str(error).lower()
+    return any(marker in message for marker in _THROTTLE_MARKERS)
+
+def _take_token(deadline, background=False):
+    """
+    Consome um token do bucket, esperando se necessário. Retorna False se o prazo acabar antes.
+    Em segundo plano não espera: só consome se sobrarem mais de GEE_BACKGROUND_MIN_TOKENS.
+    """
+    global _tokens, _last_refill
+    reserve = GEE_BACKGROUND_MIN_TOKENS if background else 0
+    while True:
+        with _bucket_lock:
+            now = time.monotonic()
+            _tokens = min(GEE_RATE_BURST, _tokens + (now - _last_refill) * GEE_RATE_PER_SEC)
+            _last_refill = now
+            if _tokens >= 1 + reserve:
+                _tokens -= 1
+                return True
+            if background:
+                return False
+            wait_time = (1 - _tokens) / GEE_RATE_PER_SEC
+        if now + wait_time > deadline:
+            return False
+        time.sleep(wait_time)
+
+def _release(background):
+    _slots.release()
+    if background:
+        _background_slots.release()
+
+def _acquire(label, deadline, background=False):
+    """Obtém uma vaga de concorrência (e de segundo plano, se for o caso) e um token de taxa dentro do prazo."""
+    _count("queued")
+    try:
+        if background and not _background_slots.acquire(timeout=max(0, deadline - time.monotonic())):
+            raise GEETimeoutError(f"'{label}': sem vaga de segundo plano no GEE dentro do prazo.")
+        if not _slots.acquire(timeout=max(0, deadline - time.monotonic())):
+            if background:
+                _background_slots.release()
+            raise GEETimeoutError(f"'{label}': sem vaga de concorrência no GEE dentro do prazo.")
+        if not _take_token(deadline, background):
+            _release(background)
+            if background:
+                _count("deferred")
+                raise GEEDeferredError(f"'{label}': taxa do GEE reservada para o primeiro plano. Chamada em segundo plano adiada.")
+            raise GEETimeoutError(f"'{label}': limite de taxa do GEE não liberou a chamada dentro do prazo.")
+    except GEETimeoutError:
+        _count("timeouts")
+        raise
+    finally:
+        _count("queued", -1)
+
+def _invoke(label, func, args, kwargs):
+    """Executa a chamada, ou a reproduz/grava conforme GEE_MODE."""
+    key = [list(args), kwargs]
+    if is_replay_mode():
+        return replay_fixture(label, key)
+    result = func(*args, **kwargs)
+    if is_record_mode():
+        record_fixture(label, key, result)
+    return result
+
+def evaluate(label, func, *args, timeout=GEE_CALL_TIMEOUT, **kwargs):
+    """
+    Executa func(*args, **kwargs) — uma avaliação no GEE — sob o governador.
+
+    Parâmetros:
+    - label (str): Nome curto da chamada para logs (ex: "mosaic.getMapId").
+    - func (callable): Função que monta os objetos ee a partir de args/kwargs e faz a chamada
+      de rede, retornando dados simples (ex: o resultado de getInfo ou uma URL).
+    - timeout (float): Prazo total (s), contando fila, limitação de taxa e backoffs.
+
+    Retorno:
+    - O resultado de func.
+
+    Levanta GEETimeoutError/GEEThrottledError quando o governador desiste, GEECancelledError
+    quando a requisição corrente (request_scope) ficou obsoleta, GEEDeferredError quando uma
+    chamada em segundo plano (background_scope) é adiada, e repassa as demais
+    exceções do GEE sem novas tentativas.
+    """
+    deadline = time.monotonic() + timeout
+    token = _current_token.get()
+    if token is not None:
+        deadline = min(deadline, token.deadline)
+    background = _background.get()
+    attempt = 0
+    while True:
+        _check_cancelled(label)
+        _acquire(label, deadline, background)
+        try:
+            # A espera na fila pode ter durado mais que a requisição
+            _check_cancelled(label)
+        except GEECancelledError:
+            _release(background)
+            raise
+        _count("in_flight")
+        try:
+            result = _invoke(label, func, args, kwargs)
+            _count("calls")
+            return result
+        except Exception as e:
+            if not is_throttle_error(e):
+                _count("failures")
+                raise
+            _count("throttled")
+            if attempt >= GEE_MAX_RETRIES:
+                _count("failures")
+                raise GEEThrottledError(f"'{label}': GEE continua limitando após {attempt + 1} tentativas: {e}") from e
+        finally:
+            _count("in_flight", -1)
+            _release(background)
+
+        # Backoff exponencial com jitter ("full jitter") para não sincronizar os workers
+        delay = random.uniform(0, min(GEE_BACKOFF_MAX, GEE_BACKOFF_BASE * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            _count("timeouts")
+            raise GEETimeoutError(f"'{label}': prazo de {timeout}s esgotado durante o backoff após throttle do GEE.")
+        app_logger.warning(f"GEE_GOVERNOR: Throttle em '{label}' (tentativa {attempt + 1}). Nova tentativa em {delay:.2f}s. Estado: {get_governor_stats()}")
+        time.sleep(delay)
+        attempt += 1
+        _count("retries")
+
+def get_governor_stats():
+    """Retorna uma cópia dos contadores do governador (fila, em andamento, throttles, etc.)."""
+    with _stats_lock:
+        stats = dict(_stats)
+    with _bucket_lock:
+        stats["tokens"] = round(_tokens, 2)
+    stats["max_concurrent"] = GEE_MAX_CONCURRENT
+    stats["rate_per_sec"] = GEE_RATE_PER_SEC
+    return stats
+
+def register_governor_routes(server):
+    """
+    Registra no servidor Flask do Dash a rota de diagnóstico do governador.
+    """
+
+    @server.route("/gee/stats")
+    def serve_governor_stats():
+        return jsonify(get_governor_stats())
+
+    app_logger.info("GEE_GOVERNOR: Rota /gee/stats registrada.")
@@ -0,0 +1,68 @@
+# gee_replay.py
+#
+# Gravação/reprodução (record/replay) das respostas do Google Earth Engine, para rodar e
+# medir o app (grid, aba de mapa, caches) sem credenciais nem rede.
+# O modo vem da variável de ambiente GEE_MODE:
+# - "live" (padrão): chamadas normais ao GEE;
+# - "record": chamadas normais, e cada resposta é gravada em GEE_FIXTURES_DIR;
+# - "replay": nenhuma chamada ao GEE (nem ee.Initialize); as respostas vêm das fixtures,
+#   com latência sintética configurável (GEE_REPLAY_LATENCY_MS ± GEE_REPLAY_JITTER_MS).
+# As fixtures são identificadas pelo rótulo da chamada e pelos argumentos passados a
+# evaluate() (utils/gee_governor.py): tabelas de getRegion, dicionários de reduceRegion,
+# URLs de tiles/miniaturas (map ids) e payloads combinados.
+# Os tiles em si já ficam gravados no cache em disco do proxy (TILE_CACHE_DIR); em replay,
+# tiles fora do cache não são baixados.
+#
+
+import hashlib
+import json
+import os
+import random
+import time
+import uuid
+
+from utils.constants import GEE_MODE, GEE_FIXTURES_DIR, GEE_REPLAY_LATENCY_MS, GEE_REPLAY_JITTER_MS
+from utils.logger import app_logger
+
+class GEEFixtureMissingError(Exception):
+    """Não há fixture gravada para a chamada pedida em modo replay."""
+
+def is_replay_mode():
+    return GEE_MODE == "replay"
+
+def is_record_mode():
+    return GEE_MODE == "record"
+
+def _fixture_path(label, key):
+    key_json = json.dumps(key, sort_keys=True, default=str)
+    digest = hashlib.sha1(key_json.encode("utf-8")).hexdigest()
+    return os.path.join(GEE_FIXTURES_DIR, label.replace(os.sep, "_"), f"{digest}.json"), key_json
+
+def record_fixture(label, key, result):
+    """Grava a resposta de uma chamada (escrita atômica). Respostas não serializáveis são ignoradas."""
+    path, key_json = _fixture_path(label, key)
+    try:
+        content = json.dumps({"label": label, "key": json.loads(key_json), "result": result})
+    except (TypeError, ValueError) as e:
+        app_logger.warning(f"GEE_REPLAY: Resposta de '{label}' não serializável, fixture não gravada: {e}")
+        return
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        app_logger.debug(f"GEE_REPLAY: Fixture gravada para '{label}' em '{path}'.")
+    except OSError as e:
+        app_logger.warning(f"GEE_REPLAY: Erro ao gravar fixture '{path}': {e}")
+
+def replay_fixture(label, key):
+    """Retorna a resposta gravada para a chamada, após a latência sintética configurada."""
+    path, key_json = _fixture_path(label, key)
+    latency_ms = max(0.0, GEE_REPLAY_LATENCY_MS + random.uniform(-GEE_REPLAY_JITTER_MS, GEE_REPLAY_JITTER_MS))
+    time.sleep(latency_ms / 1000)
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)["result"]
+    except FileNotFoundError:
+        raise GEEFixtureMissingError(f"Sem fixture para '{label}' com argumentos {key_json} (esperada em '{path}').") from None
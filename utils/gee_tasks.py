@@ -0,0 +1,91 @@
+# gee_tasks.py
+#
+# Camada de execução paralela das buscas no Google Earth Engine.
+# As buscas de uma amostra (payload NDVI/LULC/mosaicos, URLs de mosaico por ano...) são
+# chamadas de rede independentes: em vez de uma esperar a outra, são disparadas juntas no
+# executor compartilhado (limitado a GEE_MAX_WORKERS threads) e recolhidas com um prazo
+# próprio por tarefa. A latência de uma amostra "fria" passa a ser a da busca mais lenta,
+# não a soma delas. As chamadas continuam passando pelo governador (utils/gee_governor.py),
+# e herdam o token da requisição corrente (cancelamento).
+#
+# O prazo de cada tarefa conta a partir do início da chamada: o tempo na fila do pool não o
+# consome, e a espera na fila é limitada a GEE_REQUEST_TIMEOUT.
+#
+# As tarefas não devem disparar e esperar outras tarefas no mesmo executor (ele é limitado);
+# quem precisa de um fan-out interno roda essa parte na própria thread do callback.
+#
+
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from utils.constants import GEE_MAX_WORKERS, GEE_CALL_TIMEOUT, GEE_REQUEST_TIMEOUT
+from utils.gee_governor import GEETimeoutError, submit_in_context
+from utils.logger import app_logger
+
+gee_executor = ThreadPoolExecutor(max_workers=GEE_MAX_WORKERS, thread_name_prefix="gee")
+
+# Uma busca independente: func(*args), com prazo próprio em segundos
+Task = namedtuple("Task", ["func", "args", "timeout"], defaults=[(), GEE_CALL_TIMEOUT])
+
+# Tarefa disparada: future, instante em que a chamada começou a rodar (None enquanto está
+# na fila), prazo da chamada e limite da espera na fila
+_Pending = namedtuple("_Pending", ["future", "started", "timeout", "queue_deadline"])
+
+def _run_timed(started, func, *args):
+    started.append(time.monotonic())
+    return func(*args)
+
+def start_tasks(tasks):
+    """
+    Dispara as tarefas {nome: Task} no executor compartilhado e retorna o lote em andamento,
+    a ser recolhido com collect_tasks(). O prazo de cada tarefa conta a partir do momento em
+    que ela sai da fila e começa a rodar.
+    """
+    queue_deadline = time.monotonic() + GEE_REQUEST_TIMEOUT
+    pending = {}
+    for name, task in tasks.items():
+        started = []
+        future = submit_in_context(gee_executor, _run_timed, started, task.func, *task.args)
+        pending[name] = _Pending(future, started, task.timeout, queue_deadline)
+    return pending
+
+def _wait(task):
+    """Resultado da tarefa, esperando até o prazo dela (contado do início da chamada)."""
+    while True:
+        now = time.monotonic()
+        if task.started:
+            return task.future.result(timeout=max(0, task.started[0] + task.timeout - now))
+        if now >= task.queue_deadline:
+            raise FutureTimeoutError()
+        # Ainda na fila: espera no máximo um prazo e reavalia (a chamada pode ter começado)
+        try:
+            return task.future.result(timeout=min(task.timeout, task.queue_deadline - now))
+        except FutureTimeoutError:
+            continue
+
+def collect_tasks(pending):
+    """
+    Espera cada tarefa do lote até o prazo dela.
+
+    Retorno:
+    - (resultados, erros): dicts {nome: valor} e {nome: exceção}. Tarefas que estouram o prazo
+      entram em erros como GEETimeoutError; as que continuam na fila após GEE_REQUEST_TIMEOUT
+      são canceladas sem rodar. Tarefas que já estavam rodando terminam em segundo plano
+      (o resultado fica nos caches).
+    """
+    results, errors = {}, {}
+    for name, task in pending.items():
+        try:
+            results[name] = _wait(task)
+        except FutureTimeoutError:
+            task.future.cancel()
+            errors[name] = GEETimeoutError(f"Tarefa '{name}' não terminou no prazo de {task.timeout}s.")
+            app_logger.debug(f"GEE_TASKS: Prazo de {task.timeout}s esgotado para a tarefa '{name}'.")
+        except Exception as e:
+            errors[name] = e
+    return results, errors
+
+def gather_tasks(tasks):
+    """Executa as tarefas {nome: Task} em paralelo e retorna (resultados, erros), como collect_tasks()."""
+    return collect_tasks(start_tasks(tasks))
@@ -0,0 +1,191 @@
+# gee_timeseries.py
+#
+# Motor genérico de séries temporais espectrais no Google Earth Engine.
+# Para um ponto, extrai todos os índices de SPECTRAL_INDICES (NDVI, EVI, NBR) de um ou mais
+# sensores (MODIS, Landsat, Sentinel-2) em UMA única requisição: cada sensor vira um
+# getRegion dentro de um ee.Dictionary. Pixels ruins são mascarados no servidor
+# (SummaryQA do MOD13Q1, QA_PIXEL do Landsat, SCL do Sentinel-2).
+# O resultado fica em cache como arrays numpy compactos (float32 para os índices), então
+# consultar outro índice da mesma amostra não custa nenhuma ida extra ao GEE.
+#
+# Este módulo não chama ee.Initialize: a inicialização é feita em utils/gee.py.
+#
+
+import functools
+
+import ee
+import numpy as np
+import pandas as pd
+
+from utils.constants import SPECTRAL_INDICES, SPECTRAL_SENSORS
+from utils.gee_governor import evaluate, GEEGovernorError
+from utils.logger import app_logger
+
+# Bandas de reflectância (azul, vermelho, NIR, SWIR2) de cada coleção Landsat Collection 2 L2
+_LANDSAT_REFLECTANCE_BANDS = {
+    "LANDSAT/LT05/C02/T1_L2": ["SR_B1", "SR_B3", "SR_B4", "SR_B7"],
+    "LANDSAT/LE07/C02/T1_L2": ["SR_B1", "SR_B3", "SR_B4", "SR_B7"],
+    "LANDSAT/LC08/C02/T1_L2": ["SR_B2", "SR_B4", "SR_B5", "SR_B7"],
+    "LANDSAT/LC09/C02/T1_L2": ["SR_B2", "SR_B4", "SR_B5", "SR_B7"],
+}
+_REFLECTANCE_NAMES = ["blue", "red", "nir", "swir2"]
+
+# QA_PIXEL (Landsat C2): bits 0-4 = preenchimento, nuvem dilatada, cirrus, nuvem, sombra
+_LANDSAT_QA_MASK_BITS = 0b11111
+# SCL (Sentinel-2 L2A): vegetação, solo exposto, água e não classificado
+_S2_VALID_SCL_CLASSES = [4, 5, 6, 7]
+
+def _spectral_indices(reflectance):
+    """Calcula NDVI, EVI e NBR a partir de uma imagem com as bandas blue/red/nir/swir2 em reflectância."""
+    ndvi = reflectance.normalizedDifference(["nir", "red"]).rename("NDVI")
+    evi = reflectance.expression(
+        "2.5 * (NIR - RED) / (NIR + 6 * RED - 7.5 * BLUE + 1)",
+        {"NIR": reflectance.select("nir"), "RED": reflectance.select("red"), "BLUE": reflectance.select("blue")}
+    ).rename("EVI")
+    nbr = reflectance.normalizedDifference(["nir", "swir2"]).rename("NBR")
+    return ee.Image.cat([ndvi, evi, nbr])
+
+def _prepare_modis(image):
+    # SummaryQA: 0 = bom, 1 = marginal; 2 (neve/gelo) e 3 (nuvem) são descartados
+    quality_mask = image.select("SummaryQA").lte(1)
+    vegetation = image.select(["NDVI", "EVI"]).multiply(0.0001)
+    nbr = image.normalizedDifference(["sur_refl_b02", "sur_refl_b07"]).rename("NBR")
+    return (
+        vegetation.addBands(nbr)
+        .updateMask(quality_mask)
+        .set("system:time_start", image.get("system:time_start"))
+    )
+
+def _prepare_landsat(reflectance_bands):
+    def prepare(image):
+        quality_mask = image.select("QA_PIXEL").bitwiseAnd(_LANDSAT_QA_MASK_BITS).eq(0)
+        reflectance = image.select(reflectance_bands, _REFLECTANCE_NAMES).multiply(0.0000275).add(-0.2)
+        return (
+            _spectral_indices(reflectance)
+            .updateMask(quality_mask)
+            .set("system:time_start", image.get("system:time_start"))
+        )
+    return prepare
+
+def _prepare_sentinel2(image):
+    scl = image.select("SCL")
+    quality_mask = scl.remap(_S2_VALID_SCL_CLASSES, [1] * len(_S2_VALID_SCL_CLASSES), 0)
+    reflectance = image.select(["B2", "B4", "B8", "B12"], _REFLECTANCE_NAMES).multiply(0.0001)
+    return (
+        _spectral_indices(reflectance)
+        .updateMask(quality_mask)
+        .set("system:time_start", image.get("system:time_start"))
+    )
+
+def _sensor_collection(sensor, point, start_date, end_date):
+    """Coleção do sensor já filtrada, mascarada por qualidade e com as bandas de SPECTRAL_INDICES."""
+    config = SPECTRAL_SENSORS[sensor]
+    collections = []
+    for collection_id in config["collections"]:
+        collection = ee.ImageCollection(collection_id).filterDate(start_date, end_date).filterBounds(point)
+        if sensor == "modis":
+            collection = collection.map(_prepare_modis)
+        elif sensor == "landsat":
+            collection = collection.map(_prepare_landsat(_LANDSAT_REFLECTANCE_BANDS[collection_id]))
+        elif sensor == "sentinel2":
+            collection = collection.map(_prepare_sentinel2)
+        else:
+            raise ValueError(f"Sensor espectral desconhecido: {sensor}")
+        collections.append(collection)
+
+    merged = collections[0]
+    for collection in collections[1:]:
+        merged = merged.merge(collection)
+    return merged.select(SPECTRAL_INDICES)
+
+def build_spectral_regions(point, sensors, start_year, end_year):
+    """
+    Monta (sem avaliar) um ee.Dictionary {sensor: getRegion} com os índices de todos os
+    sensores pedidos para o ponto. Sensores sem imagens no período retornam lista vazia
+    (checagem feita no servidor, sem size().getInfo() separado).
+    """
+    regions = {}
+    for sensor in sensors:
+        config = SPECTRAL_SENSORS[sensor]
+        sensor_start = max(start_year, config["first_year"])
+        if sensor_start > end_year:
+            regions[sensor] = ee.List([])
+            continue
+        collection = _sensor_collection(sensor, point, f"{sensor_start}-01-01", f"{end_year}-12-31")
+        regions[sensor] = ee.Algorithms.If(
+            collection.size().gt(0),
+            collection.getRegion(point, config["scale"]),
+            ee.List([])
+        )
+    return ee.Dictionary(regions)
+
+def decode_spectral_region(region_raw):
+    """
+    Converte a saída de getRegion (cabeçalho + linhas) em arrays compactos:
+    {'time': datetime64[ms], '<índice>': float32 (NaN onde mascarado)}, ordenados por data.
+    Observações sem nenhum índice válido (totalmente mascaradas) são descartadas.
+    """
+    series = {"time": np.array([], dtype="datetime64[ms]")}
+    series.update({index: np.array([], dtype=np.float32) for index in SPECTRAL_INDICES})
+    if not region_raw or len(region_raw) <= 1:
+        return series
+
+    header = region_raw[0]
+    rows = region_raw[1:]
+    time_column = header.index("time")
+    index_columns = [header.index(index) for index in SPECTRAL_INDICES]
+    times = np.array([row[time_column] for row in rows], dtype="int64")
+    values = np.array(
+        [[np.nan if row[column] is None else row[column] for column in index_columns] for row in rows],
+        dtype=np.float32
+    )
+
+    valid = ~np.isnan(values).all(axis=1)
+    order = np.argsort(times[valid], kind="stable")
+    series["time"] = times[valid][order].astype("datetime64[ms]")
+    for column, index in enumerate(SPECTRAL_INDICES):
+        series[index] = values[valid, column][order]
+
+    # Os arrays ficam compartilhados no cache: impede alteração acidental por quem os consome
+    for array in series.values():
+        array.flags.writeable = False
+    return series
+
+def spectral_series_to_dataframe(series, index="NDVI"):
+    """DataFrame ['time', <índice>] sem NaNs, no formato esperado por plot_ndvi_series."""
+    if not series or index not in series or len(series["time"]) == 0:
+        return pd.DataFrame(columns=["time", index])
+    df = pd.DataFrame({"time": pd.to_datetime(series["time"]), index: series[index].astype(float)})
+    return df.dropna(subset=[index]).reset_index(drop=True)
+
+def _request_spectral_regions(latitude, longitude, sensors, start_year, end_year):
+    point = ee.Geometry.Point([longitude, latitude])
+    return build_spectral_regions(point, sensors, start_year, end_year).getInfo()
+
+@functools.lru_cache(maxsize=512)
+def get_spectral_series(latitude, longitude, sensors=("modis",), start_year=2000, end_year=2023):
+    """
+    Séries temporais de todos os índices espectrais de um ponto, em uma única ida ao GEE.
+
+    Parâmetros:
+    - latitude, longitude (float): Ponto de interesse.
+    - sensors (tuple): Chaves de SPECTRAL_SENSORS (ex: ("modis", "landsat")).
+    - start_year, end_year (int): Período (cada sensor é limitado ao seu primeiro ano).
+
+    Retorno:
+    - dict {sensor: {'time': datetime64[ms], 'NDVI': float32, 'EVI': float32, 'NBR': float32}}.
+      Levanta GEEGovernorError se o governador desistir da chamada e repassa os demais erros
+      do GEE: só resultados válidos ficam memorizados no lru_cache.
+    """
+    app_logger.info(f"GEE_SPECTRAL: Buscando séries {SPECTRAL_INDICES} de {list(sensors)} para ({latitude}, {longitude}), {start_year}-{end_year}.")
+    try:
+        regions = evaluate("spectral.getRegion", _request_spectral_regions, latitude, longitude, sensors, start_year, end_year)
+    except GEEGovernorError:
+        raise # Falha transitória: não pode ficar memorizada no lru_cache
+    except Exception as e:
+        app_logger.error(f"GEE_SPECTRAL: Erro ao buscar séries espectrais para ({latitude}, {longitude}): {str(e)}", exc_info=True)
+        raise
+
+    result = {sensor: decode_spectral_region(regions.get(sensor)) for sensor in sensors}
+    app_logger.debug(f"GEE_SPECTRAL: Observações válidas por sensor: { {sensor: len(s['time']) for sensor, s in result.items()} }")
+    return result
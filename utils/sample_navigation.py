@@ -0,0 +1,104 @@
+# sample_navigation.py
+#
+# Índice de navegação de uma versão da tabela de amostras (ver utils/sample_store.py).
+# Guarda os IDs ordenados, os IDs não validados (modo "Apenas não validadas") e os IDs
+# PENDING (avanço automático após validar) em listas ordenadas: Próximo, Anterior e a
+# próxima pendente são buscas binárias (bisect), O(log n), sem montar DataFrames nem
+# ordenar a tabela a cada clique. Quando uma validação muda o status de uma amostra, a nova
+# versão recebe um índice derivado do anterior (with_status): só a amostra alterada entra
+# ou sai das listas, sem reordenar nada. As versões antigas continuam válidas para quem
+# ainda tem o identificador delas.
+#
+
+from bisect import bisect_left, bisect_right, insort
+
+VALIDATED_STATUS = "VALIDATED"
+PENDING_STATUS = "PENDING"
+
+def _moved(ids, sample_id, was_in, is_in):
+    """Cópia da lista ordenada com sample_id incluído/removido, ou a própria lista se nada muda."""
+    if was_in == is_in:
+        return ids
+    ids = list(ids)
+    if is_in:
+        insort(ids, sample_id)
+    else:
+        position = bisect_left(ids, sample_id)
+        if position < len(ids) and ids[position] == sample_id:
+            del ids[position]
+    return ids
+
+class NavigationIndex:
+    __slots__ = ("ids", "unvalidated", "pending")
+
+    def __init__(self, ids, unvalidated, pending):
+        self.ids = ids
+        self.unvalidated = unvalidated
+        self.pending = pending
+
+    @classmethod
+    def from_table(cls, table):
+        """Monta o índice a partir de uma versão da tabela (SampleTable), por máscaras da coluna status."""
+        validated = table.mask("status", VALIDATED_STATUS)
+        return cls(table.ids(), table.ids(~validated), table.ids(table.mask("status", PENDING_STATUS)))
+
+    def _ordered(self, only_unvalidated):
+        return self.unvalidated if only_unvalidated else self.ids
+
+    def next_id(self, current_id, only_unvalidated=False):
+        """
+        ID seguinte na ordem de navegação. Se current_id for o último ou não estiver na lista
+        (ex: acabou de ser validado no modo "Apenas não validadas"), volta para o primeiro.
+        Retorna current_id se a lista estiver vazia.
+        """
+        ids = self._ordered(only_unvalidated)
+        if not ids:
+            return current_id
+        if current_id is not None:
+            position = bisect_left(ids, current_id)
+            if position + 1 < len(ids) and ids[position] == current_id:
+                return ids[position + 1]
+        return ids[0]
+
+    def previous_id(self, current_id, only_unvalidated=False):
+        """ID anterior na ordem de navegação; do primeiro (ou de um ID fora da lista) vai para o último."""
+        ids = self._ordered(only_unvalidated)
+        if not ids:
+            return current_id
+        if current_id is not None:
+            position = bisect_left(ids, current_id)
+            if 0 < position < len(ids) and ids[position] == current_id:
+                return ids[position - 1]
+        return ids[-1]
+
+    def next_pending(self, current_id):
+        """Primeira amostra PENDING com ID maior que current_id (com wrap-around), ou None se não houver."""
+        if not self.pending:
+            return None
+        if current_id is None:
+            return self.pending[0]
+        position = bisect_right(self.pending, current_id)
+        return self.pending[position] if position < len(self.pending) else self.pending[0]
+
+    def following(self, current_id, n, only_unvalidated=False):
+        """Até n IDs depois de current_id na ordem de navegação, com wrap-around, sem o próprio current_id."""
+        ids = self._ordered(only_unvalidated)
+        if not ids or n <= 0:
+            return []
+        start = bisect_right(ids, current_id) if current_id is not None else 0
+        following = []
+        for offset in range(len(ids)):
+            if len(following) >= n:
+                break
+            sample_id = ids[(start + offset) % len(ids)]
+            if sample_id != current_id:
+                following.append(sample_id)
+        return following
+
+    def with_status(self, sample_id, old_status, new_status):
+        """Novo índice com o status de uma amostra alterado (as listas sem mudança são compartilhadas)."""
+        return NavigationIndex(
+            self.ids,
+            _moved(self.unvalidated, sample_id, old_status != VALIDATED_STATUS, new_status != VALIDATED_STATUS),
+            _moved(self.pending, sample_id, old_status == PENDING_STATUS, new_status == PENDING_STATUS),
+        )
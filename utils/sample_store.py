@@ -0,0 +1,308 @@
+# sample_store.py
+#
+# Tabela de amostras da versão de validação ativa, mantida no servidor.
+# O dcc.Store "sample-table-store" guarda só um identificador pequeno
+# ({"table_id", "version", "count"}); a tabela fica aqui. Cada carga da tabela gera uma
+# nova versão, gravada em memória (últimas SAMPLE_STORE_MEMORY_VERSIONS) e em disco, em
+# SAMPLE_STORE_DIR (compartilhado pelos workers e separado do cache de tiles, cujo limite de
+# bytes não apaga tabelas). O arquivo de cada versão é um .npz lido sem pickle
+# (SampleTable.save/load); por tabela ficam os SAMPLE_STORE_DISK_VERSIONS mais recentes.
+# Um worker que ainda não viu a versão a lê do disco. Se ela já não existe em lugar nenhum
+# (ex: apagada do disco), a tabela é recarregada do BigQuery em uma versão NOVA, e a antiga
+# passa a apontar para ela (arquivo .alias): um identificador nunca muda de conteúdo e os
+# demais workers seguem a mesma versão em vez de recarregar de novo.
+# Assim o tamanho das requisições de cada clique não depende do tamanho da tabela.
+# Cada versão é uma SampleTable (utils/sample_table.py), orientada a colunas: IDs e pontos em
+# arrays numéricos e colunas categóricas codificadas, com busca por sample_id em O(log n),
+# mais o índice de navegação (utils/sample_navigation.py) para Próximo/Anterior/próxima pendente.
+# Validar ou resetar uma amostra gera uma nova versão derivada da atual (apply_sample_update),
+# sem recarregar a tabela do BigQuery. Em disco, a versão derivada é só a linha alterada
+# (<versão>.json, com a versão de origem); a cada SAMPLE_STORE_MAX_DELTAS derivações seguidas
+# grava-se de novo uma cópia completa (.npz), limitando a cadeia que um worker reaplica.
+# O identificador também leva o instante da última modificação da tabela no BigQuery visto
+# por esta sessão ("modified"), usado para detectar alterações feitas por outros validadores.
+#
+
+import json
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict, namedtuple
+
+from utils.bigquery import get_dataset_table
+from utils.constants import SAMPLE_STORE_MEMORY_VERSIONS, SAMPLE_STORE_DIR, SAMPLE_STORE_DISK_VERSIONS, SAMPLE_STORE_MAX_DELTAS
+from utils.logger import app_logger
+from utils.sample_navigation import NavigationIndex
+from utils.sample_table import SampleTable
+
+_lock = threading.Lock()
+_tables = OrderedDict() # {(table_id, versão): TableVersion}, do menos para o mais recentemente usado
+_aliases = {} # {(table_id, versão ausente): versão recarregada do BigQuery}
+
+# Uma versão em memória: tabela (SampleTable), índice de navegação e quantas versões derivadas
+# (gravadas só como a linha alterada) a separam da última cópia completa em disco
+TableVersion = namedtuple("TableVersion", ["table", "navigation", "depth"], defaults=[0])
+_EMPTY_ENTRY = TableVersion(SampleTable.empty(), NavigationIndex([], [], []))
+
+# O identificador vem do navegador: a versão só é usada como nome de arquivo se tiver o formato gerado aqui
+_VERSION_PATTERN = re.compile(r"[0-9a-f]{12}")
+
+def _new_version():
+    return uuid.uuid4().hex[:12]
+
+def _table_dir(table_id):
+    return os.path.join(SAMPLE_STORE_DIR, str(table_id).replace(os.sep, "_").replace("..", "_"))
+
+def _version_path(table_id, version, ext):
+    return os.path.join(_table_dir(table_id), f"{version}.{ext}")
+
+def _write_file(path, write):
+    """Escrita atômica: grava em um arquivo temporário e o renomeia."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+def _prune_disk(table_id):
+    """Mantém em disco só os SAMPLE_STORE_DISK_VERSIONS arquivos mais recentes da tabela."""
+    table_dir = _table_dir(table_id)
+    try:
+        entries = []
+        for name in os.listdir(table_dir):
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(table_dir, name)
+            entries.append((os.stat(path).st_mtime, path))
+    except OSError:
+        return
+    entries.sort(reverse=True)
+    for _mtime, path in entries[SAMPLE_STORE_DISK_VERSIONS:]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass # Outro worker já removeu
+        except OSError as e:
+            app_logger.warning(f"SAMPLE_STORE: Não foi possível remover '{path}': {e}")
+
+def _build_entry(table):
+    return TableVersion(table, NavigationIndex.from_table(table))
+
+def _remember(table_id, version, entry):
+    with _lock:
+        _tables[(table_id, version)] = entry
+        _tables.move_to_end((table_id, version))
+        while len(_tables) > SAMPLE_STORE_MEMORY_VERSIONS:
+            _tables.popitem(last=False)
+    return entry
+
+def _store(table_id, version, table, entry=None):
+    try:
+        _write_file(_version_path(table_id, version, "npz"), table.save)
+        _prune_disk(table_id)
+    except OSError as e:
+        # Sem o arquivo, outros workers recarregam a tabela do BigQuery em uma versão nova
+        app_logger.warning(f"SAMPLE_STORE: Erro ao gravar a versão {version} da tabela '{table_id}' em disco: {e}")
+    return _remember(table_id, version, entry or _build_entry(table))
+
+def _store_delta(table_id, version, parent_version, sample_id, values, entry):
+    """Grava a versão derivada só como a linha alterada e a versão de origem."""
+    delta = {"parent": parent_version, "sample_id": int(sample_id), "values": values}
+    try:
+        _write_file(_version_path(table_id, version, "json"), lambda f: f.write(json.dumps(delta).encode("utf-8")))
+        _prune_disk(table_id)
+    except OSError as e:
+        app_logger.warning(f"SAMPLE_STORE: Erro ao gravar a versão {version} da tabela '{table_id}' em disco: {e}")
+    return _remember(table_id, version, entry)
+
+def _derive(entry, sample_id, values):
+    """Versão derivada de entry com os valores da amostra trocados, ou None se ela não estiver na tabela."""
+    position = entry.table.position(sample_id)
+    if position is None:
+        return None
+    old_status = entry.table.value("status", position)
+    table = entry.table.with_values(position, **values)
+    return TableVersion(table, entry.navigation.with_status(sample_id, old_status, values["status"]), entry.depth + 1)
+
+def _handle(table_id, version, table, modified=None):
+    return {"table_id": table_id, "version": version, "count": len(table), "modified": modified}
+
+def _parse_handle(handle):
+    """(table_id, versão) do identificador do "sample-table-store", ou None se ele for inválido."""
+    if not handle or not isinstance(handle, dict):
+        return None
+    table_id, version = handle.get("table_id"), handle.get("version")
+    if not table_id or not isinstance(version, str) or not _VERSION_PATTERN.fullmatch(version):
+        app_logger.warning(f"SAMPLE_STORE: Identificador de tabela inválido: {handle}")
+        return None
+    return table_id, version
+
+def publish_table(table_id, df, modified=None):
+    """
+    Guarda uma carga da tabela (DataFrame do BigQuery) como uma nova versão.
+
+    Parâmetros:
+    - modified (str|None): Última modificação da tabela no BigQuery lida antes da carga
+      (get_table_modified), guardada no identificador.
+
+    Retorno:
+    - dict: Identificador a ser gravado no "sample-table-store".
+    """
+    table = SampleTable.from_dataframe(df)
+    version = _new_version()
+    _store(table_id, version, table)
+    app_logger.info(f"SAMPLE_STORE: Tabela '{table_id}' publicada na versão {version} ({len(table)} registros).")
+    return _handle(table_id, version, table, modified)
+
+def apply_sample_update(handle, sample_id, definition, reason, status, modified=None):
+    """
+    Registra a validação/reset de uma amostra (já gravada no BigQuery) como uma nova versão
+    derivada da atual: só as colunas alteradas são copiadas, o índice de navegação é
+    atualizado incrementalmente e o disco recebe só a linha alterada.
+
+    Parâmetros:
+    - modified (str|None): Última modificação da tabela no BigQuery após a gravação; se
+      omitido, o identificador mantém o valor anterior.
+
+    Retorno:
+    - dict: Identificador da nova versão, ou None se a amostra não estiver na versão atual.
+    """
+    parsed = _parse_handle(handle)
+    if parsed is None:
+        return None
+    table_id = parsed[0]
+    try:
+        parent_version, current = _resolve_version(*parsed)
+    except Exception as e:
+        app_logger.error(f"SAMPLE_STORE: Erro ao recarregar a tabela '{table_id}': {e}", exc_info=True)
+        return None
+
+    values = {"definition": definition, "reason": reason, "status": status}
+    entry = _derive(current, sample_id, values)
+    if entry is None:
+        return None
+
+    version = _new_version()
+    if entry.depth > SAMPLE_STORE_MAX_DELTAS:
+        _store(table_id, version, entry.table, entry._replace(depth=0))
+    else:
+        _store_delta(table_id, version, parent_version, sample_id, values, entry)
+    app_logger.info(f"SAMPLE_STORE: Amostra {sample_id} atualizada ({status}) na versão {version} da tabela '{table_id}'.")
+    return _handle(table_id, version, entry.table, modified if modified is not None else handle.get("modified"))
+
+def _read_json(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _lookup(table_id, version):
+    """
+    Versão em memória ou no disco (sem ir ao BigQuery), ou None. Uma versão derivada é
+    reconstruída a partir da versão mais próxima disponível, reaplicando as linhas alteradas.
+    """
+    with _lock:
+        entry = _tables.get((table_id, version))
+        if entry is not None:
+            _tables.move_to_end((table_id, version))
+            return entry
+
+    deltas = [] # Da versão pedida para trás, até uma versão em memória ou uma cópia completa
+    current = version
+    try:
+        while entry is None:
+            with _lock:
+                entry = _tables.get((table_id, current))
+            if entry is not None:
+                break
+            npz_path = _version_path(table_id, current, "npz")
+            if os.path.exists(npz_path):
+                entry = _build_entry(SampleTable.load(npz_path))
+                break
+            delta_path = _version_path(table_id, current, "json")
+            if not os.path.exists(delta_path) or len(deltas) > SAMPLE_STORE_DISK_VERSIONS:
+                return None
+            delta = _read_json(delta_path)
+            deltas.append(delta)
+            current = delta["parent"]
+            if not isinstance(current, str) or not _VERSION_PATTERN.fullmatch(current):
+                raise ValueError(f"versão de origem inválida: {current!r}")
+
+        for delta in reversed(deltas):
+            entry = _derive(entry, delta["sample_id"], delta["values"])
+            if entry is None:
+                raise ValueError(f"amostra {delta['sample_id']} ausente da versão de origem")
+    except FileNotFoundError:
+        return None # Apagado por outro worker durante a leitura
+    except Exception as e:
+        app_logger.warning(f"SAMPLE_STORE: Arquivo inválido para a versão {version} da tabela '{table_id}': {e}")
+        return None
+    app_logger.debug(f"SAMPLE_STORE: Versão {version} da tabela '{table_id}' lida do disco ({len(deltas)} alterações reaplicadas).")
+    return _remember(table_id, version, entry)
+
+def _read_alias(table_id, version):
+    with _lock:
+        alias = _aliases.get((table_id, version))
+    if alias is not None:
+        return alias
+    try:
+        with open(_version_path(table_id, version, "alias"), encoding="ascii") as f:
+            alias = f.read().strip()
+    except (OSError, ValueError):
+        return None
+    return alias if _VERSION_PATTERN.fullmatch(alias) else None
+
+def _reload(table_id, version):
+    """Recarrega a tabela do BigQuery em uma versão nova e faz a versão ausente apontar para ela."""
+    app_logger.info(f"SAMPLE_STORE: Versão {version} da tabela '{table_id}' fora da memória e do disco. Recarregando do BigQuery em uma nova versão.")
+    table = SampleTable.from_dataframe(get_dataset_table(table_id))
+    new_version = _new_version()
+    entry = _store(table_id, new_version, table)
+    with _lock:
+        _aliases[(table_id, version)] = new_version
+    try:
+        _write_file(_version_path(table_id, version, "alias"), lambda f: f.write(new_version.encode("ascii")))
+    except OSError as e:
+        app_logger.warning(f"SAMPLE_STORE: Erro ao gravar o apontamento da versão {version} da tabela '{table_id}': {e}")
+    return new_version, entry
+
+def _resolve_version(table_id, version):
+    """(versão efetiva, TableVersion) do identificador, seguindo apontamentos de versões recarregadas."""
+    entry = _lookup(table_id, version)
+    if entry is not None:
+        return version, entry
+
+    alias = _read_alias(table_id, version)
+    if alias is not None:
+        entry = _lookup(table_id, alias)
+        if entry is not None:
+            return alias, entry
+    return _reload(table_id, version)
+
+def _resolve(handle):
+    """Retorna (tabela, índice de navegação) da versão indicada pelo identificador do "sample-table-store"."""
+    parsed = _parse_handle(handle)
+    if parsed is None:
+        return _EMPTY_ENTRY
+    table_id = parsed[0]
+    try:
+        return _resolve_version(*parsed)[1]
+    except Exception as e:
+        app_logger.error(f"SAMPLE_STORE: Erro ao recarregar a tabela '{table_id}': {e}", exc_info=True)
+        return _EMPTY_ENTRY
+
+def get_table(handle):
+    """
+    Resolve o identificador do "sample-table-store" para a tabela (SampleTable).
+    Retorna uma tabela vazia se não houver tabela carregada.
+    """
+    return _resolve(handle).table
+
+def get_navigation(handle):
+    """Índice de navegação (NavigationIndex) da versão indicada; vazio se não houver tabela."""
+    return _resolve(handle).navigation
+
+def get_sample(handle, sample_id):
+    """Retorna a linha (dict) da amostra na versão indicada, ou None."""
+    if sample_id is None:
+        return None
+    return _resolve(handle).table.get(sample_id)
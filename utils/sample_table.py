@@ -0,0 +1,180 @@
+# sample_table.py
+#
+# Representação em memória de uma versão da tabela de amostras, orientada a colunas
+# (ver utils/sample_store.py). Em vez de uma lista de dicts por linha:
+# - sample_id: array int64, com a ordem crescente pré-calculada (busca binária em lookup);
+# - lat/lon: arrays float64, decodificados da geometria WKT uma única vez, na carga
+#   (shapely.from_wkt vetorizado); NaN onde não há ponto válido;
+# - colunas categóricas (SAMPLE_CATEGORICAL_COLUMNS): pd.Categorical, um código inteiro
+#   pequeno por linha e a lista de valores distintos uma única vez;
+# - geometry: o WKT original do BigQuery (array de objetos, None onde ausente), exibido na
+#   tabela como veio, sem ser remontado a partir de lat/lon.
+# Uma versão derivada (with_values) troca só as colunas alteradas; as demais são
+# compartilhadas com a versão de origem.
+# save/load gravam e leem a tabela em .npz só com arrays numéricos e JSON (sem pickle).
+#
+
+import json
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from utils.constants import VISIBLE_COLUMNS, SAMPLE_CATEGORICAL_COLUMNS
+
+def _points_from_wkt(geometries):
+    """Decodifica uma coluna de WKT de uma vez: arrays float64 (lat, lon), NaN onde não há ponto válido."""
+    points = shapely.from_wkt(_geometry_column(geometries), on_invalid="ignore")
+    return shapely.get_y(points), shapely.get_x(points)
+
+def _geometry_column(geometries):
+    """WKT como array de objetos, None onde não há geometria."""
+    values = np.asarray(geometries, dtype=object)
+    return np.where(pd.notna(values), values, None)
+
+def _float_or_none(value):
+    return None if np.isnan(value) else float(value)
+
+class SampleTable:
+    __slots__ = ("sample_ids", "lat", "lon", "geometry", "categoricals", "_order", "_sorted_ids")
+
+    def __init__(self, sample_ids, lat, lon, geometry, categoricals, order=None, sorted_ids=None):
+        self.sample_ids = sample_ids
+        self.lat = lat
+        self.lon = lon
+        self.geometry = geometry
+        self.categoricals = categoricals
+        # A tabela chega ordenada por sample_id (ORDER BY do BigQuery), mas a busca não depende disso
+        self._order = np.argsort(sample_ids, kind="stable") if order is None else order
+        self._sorted_ids = sample_ids[self._order] if sorted_ids is None else sorted_ids
+
+    @classmethod
+    def empty(cls):
+        return cls(
+            np.empty(0, dtype=np.int64), np.empty(0), np.empty(0), np.empty(0, dtype=object),
+            {column: pd.Categorical([]) for column in SAMPLE_CATEGORICAL_COLUMNS}
+        )
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """Monta a tabela a partir do DataFrame do BigQuery (colunas de VISIBLE_COLUMNS)."""
+        missing_cols = [col for col in VISIBLE_COLUMNS if col not in df.columns]
+        if missing_cols:
+            raise ValueError(f"Colunas esperadas ausentes no DataFrame do BigQuery: {missing_cols}. Verifique VISIBLE_COLUMNS e o esquema da tabela.")
+        lat, lon = _points_from_wkt(df["geometry"])
+        return cls(
+            df["sample_id"].to_numpy(dtype=np.int64),
+            lat,
+            lon,
+            _geometry_column(df["geometry"]),
+            {column: pd.Categorical(df[column].to_numpy(dtype=object)) for column in SAMPLE_CATEGORICAL_COLUMNS},
+        )
+
+    def __len__(self):
+        return len(self.sample_ids)
+
+    def position(self, sample_id):
+        """Posição (linha) da amostra na tabela, ou None. Busca binária nos IDs ordenados."""
+        if sample_id is None or not len(self.sample_ids):
+            return None
+        try:
+            sample_id = int(sample_id)
+        except (TypeError, ValueError):
+            return None
+        index = int(np.searchsorted(self._sorted_ids, sample_id))
+        if index < len(self._sorted_ids) and self._sorted_ids[index] == sample_id:
+            return int(self._order[index])
+        return None
+
+    def value(self, column, position):
+        """Valor de uma coluna categórica em uma linha (None se ausente)."""
+        categorical = self.categoricals[column]
+        code = categorical.codes[position]
+        return categorical.categories[code] if code >= 0 else None
+
+    def row(self, position):
+        """Linha como dict: sample_id, colunas categóricas, lat/lon e o WKT original."""
+        row = {"sample_id": int(self.sample_ids[position])}
+        for column in SAMPLE_CATEGORICAL_COLUMNS:
+            row[column] = self.value(column, position)
+        row["lat"] = _float_or_none(self.lat[position])
+        row["lon"] = _float_or_none(self.lon[position])
+        row["geometry"] = self.geometry[position]
+        return row
+
+    def get(self, sample_id):
+        """Linha (dict) da amostra, ou None se ela não estiver na tabela."""
+        position = self.position(sample_id)
+        return self.row(position) if position is not None else None
+
+    def first_id(self):
+        """sample_id da primeira linha (ordem da tabela), ou None se a tabela estiver vazia."""
+        return int(self.sample_ids[0]) if len(self.sample_ids) else None
+
+    def has_point(self):
+        """Máscara booleana das linhas com ponto válido (lat/lon)."""
+        return ~(np.isnan(self.lat) | np.isnan(self.lon))
+
+    def mask(self, column, *values):
+        """Máscara booleana das linhas cuja coluna categórica tem um dos valores (None = ausente)."""
+        categorical = self.categoricals[column]
+        codes = [categorical.categories.get_loc(value) for value in values if value is not None and value in categorical.categories]
+        if None in values:
+            codes.append(-1)
+        return np.isin(categorical.codes, codes)
+
+    def ids(self, mask=None):
+        """sample_ids em ordem crescente (lista de int), opcionalmente só das linhas da máscara."""
+        if mask is None:
+            return self._sorted_ids.tolist()
+        return np.sort(self.sample_ids[mask]).tolist()
+
+    def filter(self, mask):
+        """Nova tabela só com as linhas da máscara."""
+        return SampleTable(
+            self.sample_ids[mask], self.lat[mask], self.lon[mask], self.geometry[mask],
+            {column: categorical[mask] for column, categorical in self.categoricals.items()},
+        )
+
+    def save(self, file):
+        """Grava a tabela em formato .npz: arrays numéricos, o WKT como texto ("" onde ausente) e os valores das categorias em JSON."""
+        arrays = {
+            "sample_ids": self.sample_ids, "lat": self.lat, "lon": self.lon,
+            "geometry": np.array(["" if value is None else value for value in self.geometry], dtype=str),
+        }
+        categories = {}
+        for column, categorical in self.categoricals.items():
+            arrays[f"codes_{column}"] = categorical.codes
+            categories[column] = categorical.categories.tolist()
+        arrays["categories"] = np.array(json.dumps(categories))
+        np.savez(file, **arrays)
+
+    @classmethod
+    def load(cls, file):
+        """Lê uma tabela gravada por save (sem pickle: allow_pickle=False)."""
+        with np.load(file, allow_pickle=False) as data:
+            categories = json.loads(str(data["categories"]))
+            geometry = data["geometry"].astype(object)
+            geometry[geometry == ""] = None
+            return cls(
+                data["sample_ids"].astype(np.int64, copy=False),
+                data["lat"],
+                data["lon"],
+                geometry,
+                {column: pd.Categorical.from_codes(data[f"codes_{column}"], categories=values) for column, values in categories.items()},
+            )
+
+    def with_values(self, position, **values):
+        """
+        Nova tabela com valores categóricos de uma linha trocados (ex: status=..., definition=...).
+        Só as colunas alteradas são copiadas; IDs, pontos e índice de busca são compartilhados.
+        """
+        categoricals = dict(self.categoricals)
+        for column, value in values.items():
+            categorical = categoricals[column]
+            if value is not None and value not in categorical.categories:
+                categorical = categorical.add_categories([value])
+            codes = categorical.codes.astype(np.int32) # Cópia com espaço para um novo código
+            codes[position] = categorical.categories.get_loc(value) if value is not None else -1
+            categoricals[column] = pd.Categorical.from_codes(codes, dtype=categorical.dtype)
+        return SampleTable(self.sample_ids, self.lat, self.lon, self.geometry, categoricals, self._order, self._sorted_ids)
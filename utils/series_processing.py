@@ -0,0 +1,167 @@
+# series_processing.py
+#
+# Processamento das séries temporais de índices (NDVI etc.) entre a busca no GEE e o gráfico:
+# redução do número de pontos por LTTB (Largest-Triangle-Three-Buckets) e, quando o analista
+# pede, remoção de outliers (ruído de nuvem) e suavização (Savitzky–Golay ou Whittaker), com
+# NumPy (e o solver em banda do SciPy no Whittaker). Menos pontos no JSON da figura e redesenho
+# mais rápido, preservando a tendência e as quedas bruscas que o analista procura.
+# Os dois suavizadores supõem observações igualmente espaçadas: a série é interpolada em uma
+# grade regular (passo = intervalo mediano entre observações), suavizada e lida de volta nas
+# datas originais.
+#
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.linalg import solveh_banded
+
+from utils.constants import (
+    NDVI_SG_WINDOW, NDVI_SG_ORDER, NDVI_WHITTAKER_LAMBDA,
+    NDVI_OUTLIER_WINDOW, NDVI_OUTLIER_K, NDVI_MAX_POINTS
+)
+from utils.logger import app_logger
+
+def _reflect_pad(values, half_window):
+    """Espelha as bordas para que filtros de janela não encolham a série."""
+    return np.pad(values, half_window, mode="reflect") if len(values) > half_window else np.pad(values, half_window, mode="edge")
+
+def outlier_mask(values, window=NDVI_OUTLIER_WINDOW, k=NDVI_OUTLIER_K):
+    """
+    Retorna uma máscara booleana (True = manter) que descarta observações cujo desvio em
+    relação à mediana móvel passa de k desvios robustos (MAD). Pega os "vales" isolados
+    causados por nuvem sem apagar mudanças persistentes (várias observações seguidas).
+    """
+    n = len(values)
+    if n < window:
+        return np.ones(n, dtype=bool)
+
+    half = window // 2
+    rolling_median = np.median(sliding_window_view(_reflect_pad(values, half), window), axis=1)
+    residuals = values - rolling_median
+    mad = 1.4826 * np.median(np.abs(residuals - np.median(residuals)))
+    if mad == 0:
+        return np.ones(n, dtype=bool)
+    return np.abs(residuals) <= k * mad
+
+def savitzky_golay(values, window=NDVI_SG_WINDOW, order=NDVI_SG_ORDER):
+    """Suavização Savitzky–Golay (ajuste polinomial local por mínimos quadrados)."""
+    window = int(window) | 1 # Janela ímpar
+    if len(values) < window or order >= window:
+        return values.copy()
+
+    half = window // 2
+    # Coeficientes do filtro: linha 0 da pseudo-inversa da matriz de Vandermonde da janela
+    offsets = np.arange(-half, half + 1)
+    vandermonde = np.vander(offsets, order + 1, increasing=True)
+    coefficients = np.linalg.pinv(vandermonde)[0]
+    return sliding_window_view(_reflect_pad(values, half), window) @ coefficients
+
+def whittaker(values, lam=NDVI_WHITTAKER_LAMBDA):
+    """
+    Suavização de Whittaker (penalidade de segunda diferença): resolve (I + λ·DᵀD)·z = y.
+    A matriz é simétrica, positiva definida e pentadiagonal: só as três diagonais superiores
+    são montadas e o sistema é resolvido por Cholesky em banda, em O(n).
+    """
+    n = len(values)
+    if n < 3:
+        return values.copy()
+    # Diagonais de DᵀD (D = segunda diferença, linhas [1, -2, 1]) no formato de solveh_banded
+    bands = np.zeros((3, n))
+    bands[0, 2:] = lam
+    bands[1, 1:-1] -= 2 * lam
+    bands[1, 2:] -= 2 * lam
+    bands[2, :-2] += lam
+    bands[2, 1:-1] += 4 * lam
+    bands[2, 2:] += lam
+    bands[2] += 1
+    return solveh_banded(bands, values)
+
+def smooth_on_regular_grid(x, values, smoother):
+    """
+    Aplica um suavizador que supõe espaçamento uniforme a uma série de tempos x (números
+    crescentes) possivelmente irregulares: interpola em uma grade regular com o passo mediano
+    (no máximo 4x o número de observações), suaviza e interpola de volta nos tempos originais.
+    """
+    n = len(values)
+    if n < 3:
+        return smoother(values)
+    span = x[-1] - x[0]
+    step = np.median(np.diff(x))
+    if span <= 0 or step <= 0:
+        return smoother(values)
+    step = max(step, span / (4 * n))
+    grid = np.linspace(x[0], x[-1], int(round(span / step)) + 1)
+    return np.interp(x, grid, smoother(np.interp(grid, x, values)))
+
+def lttb_indices(x, y, threshold=NDVI_MAX_POINTS):
+    """
+    Índices dos pontos escolhidos pelo LTTB para representar a série com até `threshold`
+    pontos. O primeiro e o último ponto são sempre mantidos; em cada balde é escolhido o
+    ponto que forma o maior triângulo com o ponto anterior escolhido e a média do próximo balde.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Limites dos baldes (sem o primeiro e o último ponto)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    # Média de cada balde de uma vez; o "próximo balde" do último é o ponto final
+    counts = np.diff(edges)
+    next_means_x = np.append(np.add.reduceat(x[:edges[-1]], edges[:-1])[1:] / counts[1:], x[-1])
+    next_means_y = np.append(np.add.reduceat(y[:edges[-1]], edges[:-1])[1:] / counts[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    previous = 0
+    for bucket in range(len(edges) - 1):
+        start, end = edges[bucket], edges[bucket + 1]
+        bucket_x, bucket_y = x[start:end], y[start:end]
+        areas = np.abs(
+            (x[previous] - next_means_x[bucket]) * (bucket_y - y[previous])
+            - (x[previous] - bucket_x) * (next_means_y[bucket] - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    selected[-1] = n - 1
+    return selected
+
+def process_series(df, value_column="NDVI", smoothing=None, remove_outliers=False, max_points=NDVI_MAX_POINTS):
+    """
+    Prepara uma série ['time', value_column] para plotagem. Por padrão só reduz os pontos (LTTB),
+    mantendo os valores observados.
+
+    Parâmetros:
+    - df (DataFrame): Série ordenável por 'time'.
+    - value_column (str): Coluna do índice.
+    - smoothing (str|None): "savgol", "whittaker" ou None (sem suavização). Aplicada sobre uma
+      grade regular (smooth_on_regular_grid).
+    - remove_outliers (bool): Remove vales/picos isolados (mediana móvel + MAD).
+    - max_points (int|None): Limite de pontos (LTTB). None mantém todos.
+
+    Retorno:
+    - DataFrame ['time', value_column] processado (o original não é alterado).
+    """
+    if df is None or df.empty or 'time' not in df.columns or value_column not in df.columns:
+        return df
+
+    df = df[['time', value_column]].dropna(subset=[value_column]).sort_values('time')
+    times = pd.to_datetime(df['time']).to_numpy()
+    values = df[value_column].to_numpy(dtype=np.float64)
+    original_count = len(values)
+
+    if remove_outliers:
+        keep = outlier_mask(values)
+        times, values = times[keep], values[keep]
+
+    x = times.astype("int64").astype(np.float64)
+    if smoothing == "savgol":
+        values = smooth_on_regular_grid(x, values, savitzky_golay)
+    elif smoothing == "whittaker":
+        values = smooth_on_regular_grid(x, values, whittaker)
+
+    if max_points:
+        selected = lttb_indices(x, values, max_points)
+        times, values = times[selected], values[selected]
+
+    app_logger.debug(f"SERIES_PROCESSING: Série '{value_column}' processada: {original_count} -> {len(values)} pontos (suavização: {smoothing}).")
+    return pd.DataFrame({'time': times, value_column: values})
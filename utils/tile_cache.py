@@ -0,0 +1,115 @@
+# tile_cache.py
+#
+# Cache LRU em disco para imagens servidas pelo proxy de tiles (utils/tile_proxy.py).
+# Cada entrada é identificada por uma chave (ex: (camada, ano, z, x, y)) e gravada como
+# um arquivo em TILE_CACHE_DIR. O tamanho total é limitado por TILE_CACHE_MAX_BYTES:
+# quando o limite é ultrapassado, os arquivos acessados há mais tempo são removidos.
+#
+
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+from utils.constants import TILE_CACHE_DIR, TILE_CACHE_MAX_BYTES
+from utils.logger import app_logger
+
+_lock = threading.Lock()
+_index = None # OrderedDict {caminho: tamanho}, do menos para o mais recentemente usado
+_total_bytes = 0
+
+def _key_to_path(key, ext):
+    parts = [str(p).replace(os.sep, "_").replace("..", "_") for p in key]
+    return os.path.join(TILE_CACHE_DIR, *parts[:-1], f"{parts[-1]}.{ext}")
+
+def _load_index():
+    """Varre o diretório do cache uma única vez por processo, ordenando por último acesso (mtime)."""
+    global _index, _total_bytes
+    if _index is not None:
+        return
+
+    entries = []
+    for root, _dirs, files in os.walk(TILE_CACHE_DIR):
+        for name in files:
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+                entries.append((st.st_mtime, path, st.st_size))
+            except OSError:
+                continue
+
+    entries.sort()
+    _index = OrderedDict((path, size) for _mtime, path, size in entries)
+    _total_bytes = sum(size for _mtime, _path, size in entries)
+    app_logger.info(f"TILE_CACHE: Índice carregado de '{TILE_CACHE_DIR}': {len(_index)} arquivos, {_total_bytes / 1e6:.1f} MB.")
+
+def _evict():
+    """Remove as entradas menos usadas até o cache voltar ao limite. Chamar com _lock adquirido."""
+    global _total_bytes
+    while _total_bytes > TILE_CACHE_MAX_BYTES and _index:
+        path, size = _index.popitem(last=False)
+        _total_bytes -= size
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass # Outro worker já removeu
+        except OSError as e:
+            app_logger.warning(f"TILE_CACHE: Não foi possível remover '{path}': {e}")
+
+def get_cached(key, ext="png"):
+    """
+    Retorna o conteúdo (bytes) associado à chave, ou None se não estiver no cache.
+    Um acerto marca a entrada como recentemente usada.
+    """
+    global _total_bytes
+    path = _key_to_path(key, ext)
+    try:
+        with open(path, "rb") as f:
+            content = f.read()
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        app_logger.warning(f"TILE_CACHE: Erro ao ler '{path}': {e}")
+        return None
+
+    with _lock:
+        _load_index()
+        if path in _index:
+            _index.move_to_end(path)
+        else: # Gravado por outro worker
+            _index[path] = len(content)
+            _total_bytes += len(content)
+    try:
+        os.utime(path) # Mantém a ordem LRU entre reinícios e entre workers
+    except OSError:
+        pass
+    return content
+
+def put_cached(key, content, ext="png"):
+    """Grava o conteúdo no cache (escrita atômica) e aplica o limite de tamanho."""
+    global _total_bytes
+    path = _key_to_path(key, ext)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        app_logger.warning(f"TILE_CACHE: Erro ao gravar '{path}': {e}")
+        return
+
+    with _lock:
+        _load_index()
+        _total_bytes -= _index.pop(path, 0)
+        _index[path] = len(content)
+        _total_bytes += len(content)
+        _evict()
+
+def get_cache_stats():
+    """Retorna número de arquivos e bytes ocupados pelo cache neste processo."""
+    with _lock:
+        _load_index()
+        return {"files": len(_index), "bytes": _total_bytes, "max_bytes": TILE_CACHE_MAX_BYTES}
@@ -0,0 +1,234 @@
+# tile_proxy.py
+#
+# Proxy de tiles do Google Earth Engine servido pelo próprio Flask do Dash (app.server).
+# Os mapas do app apontam para /tiles/<camada>/<ano>/{z}/{x}/{y}.png; o proxy resolve a URL
+# real do GEE (get_mosaic_url / get_lulc_mapbiomas_url), baixa o tile uma única vez e
+# o guarda no cache LRU em disco (utils/tile_cache.py). Visitas repetidas e amostras
+# vizinhas passam a ser servidas do disco local.
+# Também serve as miniaturas por ano (/chips/...) do modo "filmstrip" do grid e as animações
+# (/timelapse/...) do modo time-lapse, uma por amostra e recorte de anos.
+#
+
+import math
+import urllib.error
+import urllib.request
+
+from flask import Response
+
+from utils.constants import TILE_CACHE_MAX_AGE, TILE_FETCH_TIMEOUT, TIMELAPSE_FETCH_TIMEOUT, TIMELAPSE_MAX_FRAMES, YEARS_RANGE
+from utils.gee import get_mosaic_url, get_lulc_mapbiomas_url, get_mosaic_chip_url, get_mosaic_timelapse_url
+from utils.gee_governor import GEEGovernorError
+from utils.gee_replay import is_replay_mode
+from utils.logger import app_logger
+from utils.tile_cache import get_cached, put_cached
+
+# Camadas servidas pelo proxy e a função que gera a URL de tiles do GEE para cada ano
+TILE_LAYERS = {
+    "mosaic": get_mosaic_url,
+    "lulc": get_lulc_mapbiomas_url,
+}
+
+def tile_proxy_url(layer, year):
+    """URL (template Leaflet) dos tiles de uma camada/ano servidos pelo proxy local."""
+    return f"/tiles/{layer}/{year}/{{z}}/{{x}}/{{y}}.png"
+
+def chip_proxy_url(year, latitude, longitude):
+    """URL da miniatura (filmstrip) do mosaico de um ano centrada na amostra, servida pelo proxy."""
+    return f"/chips/mosaic/{year}/{_round_coord(latitude)}/{_round_coord(longitude)}.png"
+
+def timelapse_proxy_url(years, latitude, longitude):
+    """URL da animação (time-lapse) dos mosaicos dos anos informados, servida pelo proxy."""
+    years_key = ",".join(str(year) for year in years)
+    return f"/timelapse/mosaic/{_round_coord(latitude)}/{_round_coord(longitude)}/{years_key}.gif"
+
+def tiles_around_point(latitude, longitude, zoom, size_px):
+    """
+    Retorna os índices (x, y) dos tiles (esquema XYZ/Web Mercator) que cobrem um mapa de
+    size_px x size_px pixels centrado no ponto, no zoom indicado. Usado para aquecer o cache.
+    """
+    n = 2 ** zoom
+    lat_rad = math.radians(latitude)
+    # Posição do ponto em "pixels de mundo" (tiles de 256 px)
+    px = (longitude + 180.0) / 360.0 * n * 256
+    py = (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n * 256
+    half = size_px / 2
+
+    x_min, x_max = int((px - half) // 256), int((px + half) // 256)
+    y_min, y_max = max(0, int((py - half) // 256)), min(n - 1, int((py + half) // 256))
+    return [(x % n, y) for x in range(x_min, x_max + 1) for y in range(y_min, y_max + 1)]
+
+def _round_coord(value):
+    # 5 casas decimais (~1 m) bastam para identificar a amostra e estabilizam a chave do cache
+    return f"{float(value):.5f}"
+
+def _download(url, timeout=TILE_FETCH_TIMEOUT):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.read()
+
+def fetch_tile(layer, year, z, x, y):
+    """
+    Retorna os bytes PNG do tile, do cache em disco ou baixando do GEE.
+    Retorna None se o tile não puder ser obtido.
+    """
+    key = (layer, year, z, x, y)
+    content = get_cached(key)
+    if content is not None:
+        return content
+
+    if is_replay_mode():
+        # Offline: só os tiles já gravados no cache em disco são servidos
+        return None
+
+    url_function = TILE_LAYERS[layer]
+    try:
+        url_template = url_function(year)
+    except GEEGovernorError as e:
+        app_logger.warning(f"TILE_PROXY: GEE sobrecarregado ao gerar URL da camada '{layer}' ano {year}: {e}")
+        return None
+    except Exception as e:
+        app_logger.warning(f"TILE_PROXY: URL de tiles indisponível para camada '{layer}' ano {year}: {e}")
+        return None
+
+    try:
+        content = _download(url_template.format(z=z, x=x, y=y))
+    except urllib.error.HTTPError as e:
+        if e.code not in (400, 403, 404):
+            app_logger.error(f"TILE_PROXY: Erro HTTP {e.code} ao baixar tile {key}.")
+            return None
+        # O mapid em cache pode ter expirado no GEE: gera uma URL nova e tenta mais uma vez
+        app_logger.info(f"TILE_PROXY: HTTP {e.code} para tile {key}. Renovando URL da camada '{layer}' ano {year}.")
+        url_function.evict(year)
+        try:
+            url_template = url_function(year)
+            content = _download(url_template.format(z=z, x=x, y=y))
+        except Exception as retry_e:
+            app_logger.error(f"TILE_PROXY: Falha ao baixar tile {key} após renovar a URL: {retry_e}")
+            return None
+    except Exception as e:
+        app_logger.error(f"TILE_PROXY: Erro ao baixar tile {key}: {e}")
+        return None
+
+    put_cached(key, content)
+    return content
+
+def fetch_chip(year, latitude, longitude):
+    """
+    Retorna os bytes PNG da miniatura do mosaico de um ano para o ponto, do cache em disco
+    ou gerando via getThumbURL. Retorna None se a miniatura não puder ser obtida.
+    """
+    lat_key, lon_key = _round_coord(latitude), _round_coord(longitude)
+    key = ("chip", "mosaic", year, lat_key, lon_key)
+    content = get_cached(key)
+    if content is not None:
+        return content
+
+    if is_replay_mode():
+        return None
+
+    try:
+        thumb_url = get_mosaic_chip_url(year, float(lat_key), float(lon_key))
+    except GEEGovernorError as e:
+        app_logger.warning(f"TILE_PROXY: GEE sobrecarregado ao gerar miniatura {key}: {e}")
+        return None
+    except Exception as e:
+        app_logger.warning(f"TILE_PROXY: Miniatura {key} indisponível: {e}")
+        return None
+
+    try:
+        content = _download(thumb_url)
+    except Exception as e:
+        app_logger.error(f"TILE_PROXY: Erro ao baixar miniatura {key}: {e}")
+        get_mosaic_chip_url.evict(year, float(lat_key), float(lon_key)) # A URL pode ter expirado; a próxima tentativa gera outra
+        return None
+
+    put_cached(key, content)
+    return content
+
+def fetch_timelapse(years, latitude, longitude):
+    """
+    Retorna os bytes GIF do time-lapse dos mosaicos para o ponto, do cache em disco ou
+    gerando via getVideoThumbURL. Retorna None se a animação não puder ser obtida.
+    """
+    years = tuple(int(year) for year in years)
+    lat_key, lon_key = _round_coord(latitude), _round_coord(longitude)
+    key = ("timelapse", "mosaic", ",".join(str(year) for year in years), lat_key, lon_key)
+    content = get_cached(key, ext="gif")
+    if content is not None:
+        return content
+
+    if is_replay_mode() or not years:
+        return None
+
+    try:
+        video_url = get_mosaic_timelapse_url(years, float(lat_key), float(lon_key))
+    except GEEGovernorError as e:
+        app_logger.warning(f"TILE_PROXY: GEE sobrecarregado ao gerar time-lapse {key}: {e}")
+        return None
+    except Exception as e:
+        app_logger.warning(f"TILE_PROXY: Time-lapse {key} indisponível: {e}")
+        return None
+
+    try:
+        content = _download(video_url, timeout=TIMELAPSE_FETCH_TIMEOUT)
+    except Exception as e:
+        app_logger.error(f"TILE_PROXY: Erro ao baixar time-lapse {key}: {e}")
+        get_mosaic_timelapse_url.evict(years, float(lat_key), float(lon_key)) # A URL pode ter expirado; a próxima tentativa gera outra
+        return None
+
+    put_cached(key, content, ext="gif")
+    return content
+
+def parse_timelapse_years(years_key):
+    """
+    Anos da rota /timelapse ("1985,1990,..."), ou None se o recorte for inválido: anos fora de
+    YEARS_RANGE, repetidos, vazio ou com mais de TIMELAPSE_MAX_FRAMES quadros. Cada combinação
+    de anos gera uma animação (e uma chamada getVideoThumbURL) diferente.
+    """
+    try:
+        years = [int(year) for year in years_key.split(",")]
+    except ValueError:
+        return None
+    if not years or len(years) > TIMELAPSE_MAX_FRAMES or len(set(years)) != len(years):
+        return None
+    if any(year not in YEARS_RANGE for year in years):
+        return None
+    return years
+
+def _image_response(content, mimetype="image/png"):
+    response = Response(content, mimetype=mimetype)
+    response.headers["Cache-Control"] = f"public, max-age={TILE_CACHE_MAX_AGE}, immutable"
+    return response
+
+def register_tile_routes(server):
+    """
+    Registra as rotas do proxy de tiles no servidor Flask do Dash.
+    """
+
+    @server.route("/tiles/<layer>/<int:year>/<int:z>/<int:x>/<int:y>.png")
+    def serve_tile(layer, year, z, x, y):
+        if layer not in TILE_LAYERS:
+            return Response(status=404)
+
+        content = fetch_tile(layer, year, z, x, y)
+        if content is None:
+            return Response(status=502)
+        return _image_response(content)
+
+    @server.route("/chips/mosaic/<int:year>/<float(signed=True):latitude>/<float(signed=True):longitude>.png")
+    def serve_chip(year, latitude, longitude):
+        content = fetch_chip(year, latitude, longitude)
+        if content is None:
+            return Response(status=502)
+        return _image_response(content)
+
+    @server.route("/timelapse/mosaic/<float(signed=True):latitude>/<float(signed=True):longitude>/<years>.gif")
+    def serve_timelapse(latitude, longitude, years):
+        years = parse_timelapse_years(years)
+        if years is None:
+            return Response(status=400)
+        content = fetch_timelapse(years, latitude, longitude)
+        if content is None:
+            return Response(status=502)
+        return _image_response(content, mimetype="image/gif")
+
+    app_logger.info("TILE_PROXY: Rotas do proxy de tiles registradas.")
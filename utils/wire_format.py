@@ -0,0 +1,73 @@
+# wire_format.py
+#
+# Formato compacto da tabela de amostras enviado ao navegador ("sample-table-wire-store"),
+# decodificado por assets/sample_wire.js para o AgGrid e para os marcadores do mapa principal.
+# Em vez de uma lista de objetos JSON com os nomes de bioma/classe repetidos em cada linha,
+# a tabela vai por colunas:
+# - sample_id como lista de inteiros;
+# - o ponto como números (lat/lon, decodificados na carga da tabela) e a geometria WKT
+#   original, exibida na tabela como veio do BigQuery;
+# - as colunas categóricas (SAMPLE_CATEGORICAL_COLUMNS) codificadas por dicionário: a lista de
+#   valores distintos uma única vez e um código inteiro por linha. São os próprios códigos
+#   da SampleTable (utils/sample_table.py) deslocados de 1: o valor 0 é o null, de modo que
+#   categorias novas (with_values) entram no fim da lista sem mudar os códigos existentes.
+# Após validar/resetar, o formato enviado é atualizado por um Patch só da linha alterada
+# (encode_row_patch), mantendo-o igual ao que encode_table produziria para a nova versão.
+#
+
+import numpy as np
+from dash import Patch
+
+from utils.constants import SAMPLE_CATEGORICAL_COLUMNS
+
+WIRE_FORMAT_VERSION = 2
+
+def _dictionary_column(categorical):
+    """{"values": [null] + valores distintos, "codes": índice de cada linha em values (0 = ausente)}."""
+    return {"values": [None] + categorical.categories.tolist(), "codes": (categorical.codes.astype(np.int64) + 1).tolist()}
+
+def _number_column(values):
+    return np.where(np.isnan(values), None, values).tolist()
+
+def encode_row(table, position):
+    """
+    Uma linha da tabela como objeto, igual ao que o decodificador do navegador produz
+    (inclui o WKT original). Usada nas transações do AgGrid após validar/resetar.
+    """
+    return table.row(position)
+
+def encode_row_patch(previous_table, table, position, version):
+    """
+    Patch do formato compacto da versão anterior (previous_table) para a nova (table, derivada
+    por with_values), que difere só na linha indicada: troca os códigos dessa linha e acrescenta
+    as categorias novas. "updated" e "revision" permitem ao decodificador do navegador
+    atualizar só essa linha.
+    """
+    patch = Patch()
+    for column in SAMPLE_CATEGORICAL_COLUMNS:
+        previous, current = previous_table.categoricals[column], table.categoricals[column]
+        added = current.categories[len(previous.categories):].tolist()
+        if added:
+            patch["columns"][column]["values"].extend(added)
+        if added or current.codes[position] != previous.codes[position]:
+            patch["columns"][column]["codes"][position] = int(current.codes[position]) + 1
+    patch["updated"] = position
+    patch["revision"] = version
+    return patch
+
+def encode_table(table, version=None):
+    """
+    Codifica uma versão da tabela (SampleTable) no formato colunar do navegador.
+
+    Retorno:
+    - dict: {"format", "length", "base", "revision", "columns": {coluna: lista | {"values", "codes"}}}.
+    """
+    columns = {
+        "sample_id": table.sample_ids.tolist(),
+        "lat": _number_column(table.lat),
+        "lon": _number_column(table.lon),
+        "geometry": table.geometry.tolist(),
+    }
+    for column in SAMPLE_CATEGORICAL_COLUMNS:
+        columns[column] = _dictionary_column(table.categoricals[column])
+    return {"format": WIRE_FORMAT_VERSION, "length": len(table), "base": version, "revision": version, "columns": columns}